@@ -0,0 +1,423 @@
+"""
+Pack AqSolDB into compressed, sharded lookup indexes, and read them back.
+
+public/data/aqsoldb.json is 2.4 MB of row-oriented JSON that has to be
+downloaded and parsed in full before a single compound can be looked up.
+This packer writes one file per lookup key instead (normalized name, SMILES,
+InChIKey). The records in each file are sorted by that key and split into
+zlib-compressed columnar blocks of about --block-rows rows. A run of equal
+keys is never split across blocks.
+
+A fence table holds each block's first key and byte range. It sits at the
+start of each .pack file and is repeated in manifest.json. A lookup is then
+a binary search over the fences, one block read (an HTTP Range request in
+the browser), and a binary search inside the block, without touching the
+rest of the data. prefixes.json.gz lists the shortest matching names for
+every one- and two-character name prefix, for autocomplete. Longer prefixes
+read the single name block they fall in.
+
+Pack layout (little-endian):
+    b"AQSPACK1", u32 block count, u32 row count, u32 JSON length, JSON column names
+    per block: u64 offset, u32 compressed length, u32 rows, u32 fence offset, u32 fence length
+    fence keys (UTF-8), then the blocks: zlib({"key": [...], <column>: [...]} as JSON)
+
+Usage:
+    python scripts/aqsoldb_pack.py                                   # AqSolDB_v1.0_min.csv
+    python scripts/aqsoldb_pack.py data_curated.csv --block-rows 128
+    python scripts/aqsoldb_pack.py --lookup "4-chlorobenzaldehyde"   # query an existing pack
+
+Output:
+    public/data/aqsoldb/manifest.json
+    public/data/aqsoldb/{name,smiles,inchikey}.pack
+    public/data/aqsoldb/prefixes.json.gz
+"""
+
+import argparse
+import bisect
+import csv
+import gzip
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import time
+import zlib
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_INPUT = os.path.join(SCRIPT_DIR, "..", "AqSolDB_v1.0_min.csv")
+DEFAULT_OUTPUT_DIR = os.path.join(SCRIPT_DIR, "..", "public", "data", "aqsoldb")
+DEFAULT_JSON = os.path.join(SCRIPT_DIR, "..", "public", "data", "aqsoldb.json")
+
+MAGIC = b"AQSPACK1"
+HEADER = struct.Struct("<8sIII")
+BLOCK_ENTRY = struct.Struct("<QIIII")
+
+INDEXES = ("name", "smiles", "inchikey")
+PREFIX_LENGTHS = (1, 2)
+PREFIX_SUGGESTIONS = 8
+
+# CSV column -> pack column; MolWt and MolLogP are only in the full AqSolDB export
+COLUMNS = OrderedDict([
+    ("ID", "id"),
+    ("Name", "name"),
+    ("SMILES", "smiles"),
+    ("InChIKey", "inchikey"),
+    ("Solubility", "logS"),
+    ("MolWt", "molWt"),
+    ("MolLogP", "molLogP"),
+])
+
+
+def normalize_name(name: str) -> str:
+    """Same normalization as the web app's AqSolDB name lookup"""
+    return re.sub(r"[^a-z0-9]", "", name.lower())
+
+
+def index_key(index: str, value: str) -> str:
+    if index == "name":
+        return normalize_name(value)
+    if index == "inchikey":
+        return value.strip().upper()
+    return value.strip()
+
+
+def read_records(path: str) -> Tuple[List[str], List[dict]]:
+    """
+    The pack columns, taken from the CSV header, and the AqSolDB rows with a
+    SMILES and a numeric LogS (with solubilityGL where MolWt is known)
+    """
+    records = []
+    with open(path, newline="") as f:
+        reader = csv.DictReader(f)
+        present = [(source, column) for source, column in COLUMNS.items() if source in (reader.fieldnames or [])]
+        columns = [column for _, column in present]
+        if "molWt" in columns:
+            columns.append("solubilityGL")
+        for row in reader:
+            record = {column: (row[source] or "").strip() for source, column in present}
+            try:
+                record["logS"] = round(float(record["logS"]), 4)
+            except (KeyError, ValueError):
+                continue
+            if not record.get("smiles"):
+                continue
+            # Blank or malformed optional descriptors are stored as null, keeping the row
+            for column in ("molWt", "molLogP"):
+                if column in record:
+                    try:
+                        record[column] = round(float(record[column]), 2)
+                    except ValueError:
+                        record[column] = None
+            if record.get("molWt") is not None:
+                record["solubilityGL"] = round(10 ** record["logS"] * record["molWt"], 6)
+            records.append(record)
+    return columns, records
+
+
+def build_blocks(keyed: List[tuple], block_rows: int) -> List[List[tuple]]:
+    """Split sorted (key, record) pairs into blocks, never splitting equal keys"""
+    blocks, current = [], []
+    for key, record in keyed:
+        if len(current) >= block_rows and key != current[-1][0]:
+            blocks.append(current)
+            current = []
+        current.append((key, record))
+    if current:
+        blocks.append(current)
+    return blocks
+
+
+def write_pack(path: str, keyed: List[tuple], columns: List[str], block_rows: int) -> List[dict]:
+    """Write one sorted index as a pack file; returns its fence table"""
+    blocks = build_blocks(keyed, block_rows)
+    payloads = []
+    for block in blocks:
+        body = {"key": [key for key, _ in block]}
+        for column in columns:
+            body[column] = [record.get(column) for _, record in block]
+        payloads.append(zlib.compress(json.dumps(body, separators=(",", ":")).encode(), 9))
+
+    column_json = json.dumps(columns).encode()
+    fences = [block[0][0].encode() for block in blocks]
+    table_end = HEADER.size + len(column_json) + BLOCK_ENTRY.size * len(blocks)
+    data_start = table_end + sum(len(fence) for fence in fences)
+
+    entries, table = [], []
+    offset, fence_offset = data_start, table_end
+    for block, payload, fence in zip(blocks, payloads, fences):
+        entries.append(BLOCK_ENTRY.pack(offset, len(payload), len(block), fence_offset, len(fence)))
+        table.append({"first": block[0][0], "offset": offset, "length": len(payload), "rows": len(block)})
+        offset += len(payload)
+        fence_offset += len(fence)
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(blocks), len(keyed), len(column_json)))
+        f.write(column_json)
+        f.write(b"".join(entries))
+        f.write(b"".join(fences))
+        f.write(b"".join(payloads))
+    os.replace(tmp, path)
+    return table
+
+
+def build_prefixes(records: List[dict]) -> Dict[str, List[str]]:
+    """Shortest distinct names for each short normalized prefix"""
+    names = {}
+    for record in records:
+        key = normalize_name(record.get("name", ""))
+        if key:
+            names.setdefault(key, record["name"])
+    ordered = sorted(names, key=lambda key: (len(key), key))
+    prefixes: Dict[str, List[str]] = {}
+    for key in ordered:
+        for length in PREFIX_LENGTHS:
+            if len(key) >= length:
+                suggestions = prefixes.setdefault(key[:length], [])
+                if len(suggestions) < PREFIX_SUGGESTIONS:
+                    suggestions.append(names[key])
+    return dict(sorted(prefixes.items()))
+
+
+def pack(input_path: str, output_dir: str, block_rows: int) -> dict:
+    columns, records = read_records(input_path)
+    if not records:
+        raise ValueError(f"No rows with a SMILES and a numeric Solubility in {input_path}")
+    os.makedirs(output_dir, exist_ok=True)
+
+    manifest = {
+        "version": "1.0",
+        "source": "AqSolDB v1.0 (https://doi.org/10.1038/s41597-019-0151-1)",
+        "count": len(records),
+        "columns": columns,
+        "compression": "zlib",
+        "indexes": {},
+    }
+    for index in INDEXES:
+        keyed = sorted(
+            ((index_key(index, record.get(index, "")), record) for record in records if record.get(index)),
+            key=lambda pair: pair[0],
+        )
+        keyed = [(key, record) for key, record in keyed if key]
+        path = os.path.join(output_dir, f"{index}.pack")
+        manifest["indexes"][index] = {"file": f"{index}.pack", "blocks": write_pack(path, keyed, columns, block_rows)}
+
+    with gzip.open(os.path.join(output_dir, "prefixes.json.gz"), "wt") as f:
+        json.dump(build_prefixes(records), f, separators=(",", ":"))
+    with open(os.path.join(output_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, separators=(",", ":"))
+    return manifest
+
+
+class PackIndex:
+    """One memory-mapped .pack file: binary search over fences, then within one block"""
+
+    def __init__(self, path: str, cached_blocks: int = 8):
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.block_count, self.rows, column_length = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an AqSolDB pack file")
+        self.columns = json.loads(self.map[HEADER.size:HEADER.size + column_length])
+        self.table_offset = HEADER.size + column_length
+        self.cached_blocks = cached_blocks
+        self.cache: "OrderedDict[int, dict]" = OrderedDict()
+
+    def entry(self, i: int):
+        return BLOCK_ENTRY.unpack_from(self.map, self.table_offset + i * BLOCK_ENTRY.size)
+
+    def fence(self, i: int) -> str:
+        _, _, _, offset, length = self.entry(i)
+        return self.map[offset:offset + length].decode()
+
+    def block(self, i: int) -> dict:
+        if i in self.cache:
+            self.cache.move_to_end(i)
+            return self.cache[i]
+        offset, length, _, _, _ = self.entry(i)
+        block = json.loads(zlib.decompress(self.map[offset:offset + length]))
+        self.cache[i] = block
+        if len(self.cache) > self.cached_blocks:
+            self.cache.popitem(last=False)
+        return block
+
+    def find_block(self, key: str) -> int:
+        """Last block whose first key is <= key (-1 when key sorts before every block)"""
+        lo, hi = 0, self.block_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.fence(mid) <= key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo - 1
+
+    def record(self, block: dict, j: int) -> dict:
+        return {column: block[column][j] for column in self.columns}
+
+    def get_all(self, key: str) -> List[dict]:
+        i = self.find_block(key)
+        if i < 0:
+            return []
+        block = self.block(i)
+        start = bisect.bisect_left(block["key"], key)
+        end = bisect.bisect_right(block["key"], key)
+        return [self.record(block, j) for j in range(start, end)]
+
+    def prefix(self, prefix: str, limit: int) -> List[dict]:
+        """Records whose key starts with prefix, in key order"""
+        i = max(self.find_block(prefix), 0)
+        results = []
+        while i < self.block_count and len(results) < limit:
+            block = self.block(i)
+            j = bisect.bisect_left(block["key"], prefix)
+            while j < len(block["key"]) and len(results) < limit:
+                if not block["key"][j].startswith(prefix):
+                    return results
+                results.append(self.record(block, j))
+                j += 1
+            i += 1
+        return results
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+
+class AqSolDBPack:
+    """Reader for a packed AqSolDB directory"""
+
+    def __init__(self, directory: str = DEFAULT_OUTPUT_DIR):
+        self.directory = directory
+        self.indexes = {index: PackIndex(os.path.join(directory, f"{index}.pack")) for index in INDEXES}
+        self._prefixes: Optional[Dict[str, List[str]]] = None
+
+    def lookup_by_name(self, name: str) -> Optional[dict]:
+        matches = self.indexes["name"].get_all(normalize_name(name))
+        return matches[0] if matches else None
+
+    def lookup_by_smiles(self, smiles: str) -> Optional[dict]:
+        matches = self.indexes["smiles"].get_all(smiles.strip())
+        return matches[0] if matches else None
+
+    def lookup_by_inchikey(self, inchikey: str) -> Optional[dict]:
+        matches = self.indexes["inchikey"].get_all(inchikey.strip().upper())
+        return matches[0] if matches else None
+
+    def lookup(self, query: str) -> Optional[dict]:
+        """Try InChIKey, then SMILES, then name, like the web app's search box"""
+        return self.lookup_by_inchikey(query) or self.lookup_by_smiles(query) or self.lookup_by_name(query)
+
+    def suggest(self, prefix: str, limit: int = PREFIX_SUGGESTIONS) -> List[str]:
+        """Compound names starting with a (normalized) prefix, for autocomplete"""
+        key = normalize_name(prefix)
+        if not key:
+            return []
+        if len(key) <= max(PREFIX_LENGTHS) and limit <= PREFIX_SUGGESTIONS:
+            if self._prefixes is None:
+                with gzip.open(os.path.join(self.directory, "prefixes.json.gz"), "rt") as f:
+                    self._prefixes = json.load(f)
+            return self._prefixes.get(key, [])[:limit]
+        return [record["name"] for record in self.indexes["name"].prefix(key, limit)]
+
+    def close(self):
+        for index in self.indexes.values():
+            index.close()
+
+
+def report(manifest: dict, output_dir: str, json_path: str, samples: List[dict]):
+    """Payload sizes and time-to-first-lookup against the JSON database"""
+    print("\nPayload:")
+    total = 0
+    for name in sorted(os.listdir(output_dir)):
+        size = os.path.getsize(os.path.join(output_dir, name))
+        total += size
+        print(f"  {name:<20}{size / 1024:10.1f} KB")
+    print(f"  {'total':<20}{total / 1024:10.1f} KB")
+    largest = max((b["length"] for index in manifest["indexes"].values() for b in index["blocks"]), default=0)
+    manifest_size = os.path.getsize(os.path.join(output_dir, "manifest.json"))
+    print(f"  Largest block: {largest / 1024:.1f} KB; one lookup fetches at most "
+          f"{(manifest_size + largest) / 1024:.1f} KB (manifest + one block)")
+    if os.path.exists(json_path):
+        print(f"  {os.path.basename(json_path)}: {os.path.getsize(json_path) / 1024:.1f} KB, all needed for any lookup")
+
+    print("\nTime to first lookup:")
+    start = time.perf_counter()
+    reader = AqSolDBPack(output_dir)
+    found = reader.lookup_by_name(samples[0]["name"]) if samples else None
+    pack_seconds = time.perf_counter() - start
+    print(f"  Packed: {pack_seconds * 1000:.2f} ms (found: {bool(found)})")
+    if os.path.exists(json_path):
+        start = time.perf_counter()
+        with open(json_path) as f:
+            data = json.load(f)
+        data["indices"]["byName"].get(normalize_name(samples[0]["name"]) if samples else "")
+        print(f"  JSON:   {(time.perf_counter() - start) * 1000:.2f} ms")
+
+    # Every sampled record must come back from every index
+    missing = 0
+    for record in samples:
+        for index, method in (("name", reader.lookup_by_name), ("smiles", reader.lookup_by_smiles),
+                              ("inchikey", reader.lookup_by_inchikey)):
+            if record.get(index) and index_key(index, record[index]) and method(record[index]) is None:
+                missing += 1
+    reader.close()
+    return missing
+
+
+def run(args) -> bool:
+    if args.lookup:
+        reader = AqSolDBPack(args.output_dir)
+        start = time.perf_counter()
+        record = reader.lookup(args.lookup)
+        elapsed = time.perf_counter() - start
+        print(json.dumps(record, indent=2) if record else f"⚠ {args.lookup!r} not found")
+        print(f"Suggestions: {', '.join(reader.suggest(args.lookup)) or '-'}")
+        print(f"Lookup took {elapsed * 1000:.2f} ms")
+        reader.close()
+        return record is not None
+
+    print("=" * 60)
+    print("AqSolDB Packer")
+    print("=" * 60)
+    print(f"\nInput: {args.input}")
+    start = time.perf_counter()
+    try:
+        manifest = pack(args.input, args.output_dir, args.block_rows)
+    except ValueError as e:
+        print(f"⚠ {e}")
+        return False
+    print(f"Packed {manifest['count']} compounds ({', '.join(manifest['columns'])}) "
+          f"in {time.perf_counter() - start:.2f} s")
+    for index, info in manifest["indexes"].items():
+        rows = sum(b["rows"] for b in info["blocks"])
+        print(f"  {index:<9}{rows:6d} keys in {len(info['blocks'])} blocks "
+              f"(~{math.ceil(math.log2(max(rows, 2)))} comparisons per lookup)")
+
+    samples = read_records(args.input)[1][::max(1, manifest["count"] // 200)]
+    missing = report(manifest, args.output_dir, args.json, samples)
+
+    print("\n" + "=" * 60)
+    if missing:
+        print(f"⚠ {missing} sampled lookups failed")
+    else:
+        print(f"✓ Pack written to {args.output_dir} ({len(samples)} sampled records verified)")
+    print("=" * 60)
+    return not missing
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("input", nargs="?", default=DEFAULT_INPUT, help="AqSolDB CSV file")
+    parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument("--block-rows", type=int, default=256, help="Target records per compressed block")
+    parser.add_argument("--json", default=DEFAULT_JSON, help="JSON database to compare payload and load time with")
+    parser.add_argument("--lookup", help="Look up a name, SMILES or InChIKey in an existing pack and exit")
+    args = parser.parse_args()
+
+    success = run(args)
+    exit(0 if success else 1)
@@ -0,0 +1,376 @@
+"""
+Benchmark the codon optimization server hot paths and end-to-end throughput.
+
+Runs offline: a stub model stands in for BigBirdForMaskedLM, returning a
+back-translated sequence after a simulated forward pass whose cost grows
+with batch size and protein length. Two suites:
+
+    micro - translate_dna, reverse_complement, check_restriction_sites and
+            avoid_restriction_sites_in_dna on synthetic sequences of 100 to
+            10,000 residues against 1 to 30 enzymes
+    load  - a load generator driving the FastAPI app (in process, or a live
+            server with --url) at fixed concurrency levels, reporting
+            p50/p95/p99 latency and requests per second
+
+Results are written as JSON. Pass --compare with an earlier result file to
+flag regressions beyond --threshold; the exit status is 1 if any are found.
+
+Usage:
+    python scripts/benchmark_codon_api.py
+    python scripts/benchmark_codon_api.py --suite micro --compare scripts/benchmarks/baseline.json
+    python scripts/benchmark_codon_api.py --suite load --url http://127.0.0.1:8000 --concurrency 1 8 32
+
+Output:
+    scripts/benchmarks/codon_api_benchmark.json
+
+The load suite needs httpx (pip install httpx).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+import codon_api
+from codon_inference import InferenceBatcher
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_OUTPUT = os.path.join(SCRIPT_DIR, "benchmarks", "codon_api_benchmark.json")
+
+AMINO_ACIDS = "ACDEFGHIKLMNPQRSTVWY"
+DEFAULT_RESIDUES = (100, 1000, 10000)
+DEFAULT_ENZYMES = (1, 6, 30)
+DEFAULT_CONCURRENCY = (1, 4, 16, 64)
+LOAD_ORGANISM = "Escherichia coli general"
+
+# Result fields compared against a baseline, and whether higher is better
+MICRO_METRIC = ("median_us", False)
+LOAD_METRICS = (("p95_ms", False), ("rps", True))
+
+
+def synthetic_protein(residues, rng):
+    return "M" + "".join(rng.choice(AMINO_ACIDS) for _ in range(residues - 1))
+
+
+def synthetic_dna(protein, rng):
+    """Random synonymous back-translation, so restriction sites occur at natural rates"""
+    return "".join(rng.choice(codon_api.AA_TO_CODONS[aa]) for aa in protein) + "TAA"
+
+
+def enzyme_panel(count):
+    """The first `count` known enzymes (the built-in six come first)"""
+    names = list(codon_api.RESTRICTION_SITES)
+    return names[:min(count, len(names))]
+
+
+class StubModel:
+    """
+    Stands in for the model behind the inference batcher: sleeps for a
+    simulated forward pass, then returns the most common codon for every
+    residue as the prediction.
+    """
+    name = "stub"
+    revision = "stub"
+
+    def __init__(self, base_ms=5.0, per_residue_us=2.0):
+        self.base = base_ms / 1000.0
+        self.per_residue = per_residue_us / 1e6
+        self.codons = {aa: codons[0] for aa, codons in codon_api.AA_TO_CODONS.items()}
+
+    def run_batch(self, items):
+        from CodonTransformer.CodonUtils import DNASequencePrediction
+
+        longest = max(len(item.protein) for item in items)
+        time.sleep(self.base + self.per_residue * longest * len(items))
+
+        results = []
+        for item in items:
+            dna = "".join(self.codons.get(aa, "NNN") for aa in item.protein.upper()) + "TAA"
+            prediction = DNASequencePrediction(
+                organism=item.organism_name,
+                protein=item.protein,
+                processed_input=item.protein,
+                predicted_dna=dna,
+            )
+            results.append(prediction if item.num_sequences == 1 else [prediction] * item.num_sequences)
+        return results
+
+
+def time_call(fn, min_seconds=0.2, repeats=5):
+    """Per-call seconds over `repeats` runs of enough calls to fill min_seconds"""
+    fn()
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds / repeats or number >= 1 << 20:
+            break
+        number *= 2
+
+    samples = [elapsed / number]
+    for _ in range(repeats - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) / number)
+    return samples, number
+
+
+def run_micro(residue_sizes, enzyme_counts, seed, min_seconds):
+    print("\nMicro-benchmarks (per call):")
+    rng = random.Random(seed)
+    results = []
+
+    def record(name, fn, residues, enzymes=None):
+        samples, number = time_call(fn, min_seconds=min_seconds)
+        entry = {
+            "name": name,
+            "residues": residues,
+            "enzymes": enzymes,
+            "median_us": statistics.median(samples) * 1e6,
+            "min_us": min(samples) * 1e6,
+            "calls": number * len(samples),
+        }
+        results.append(entry)
+        label = f"{name} ({residues} aa" + (f", {enzymes} enzymes)" if enzymes else ")")
+        print(f"  {label:<52} {entry['median_us']:12.1f} us")
+
+    for residues in residue_sizes:
+        dna = synthetic_dna(synthetic_protein(residues, rng), rng)
+        record("translate_dna", lambda: codon_api.translate_dna(dna), residues)
+        record("reverse_complement", lambda: codon_api.reverse_complement(dna), residues)
+        for count in enzyme_counts:
+            panel = enzyme_panel(count)
+            record("check_restriction_sites", lambda: codon_api.check_restriction_sites(dna, panel),
+                   residues, len(panel))
+            record("avoid_restriction_sites_in_dna", lambda: codon_api.avoid_restriction_sites_in_dna(dna, panel),
+                   residues, len(panel))
+    return results
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else None
+
+
+def install_stub(stub, cache):
+    """Put the app into the ready state with the stub model behind a fresh batcher"""
+    codon_api.backend = stub
+    codon_api.device = "cpu"
+    codon_api.model_revision = "stub"
+    codon_api.batcher = InferenceBatcher(
+        stub.run_batch,
+        max_batch_size=codon_api.MAX_BATCH_SIZE,
+        max_wait_ms=codon_api.MAX_BATCH_WAIT_MS,
+        concurrency=codon_api.INFERENCE_SLOTS,
+        max_queue_size=codon_api.MAX_QUEUE_SIZE,
+    )
+    codon_api.batcher.start()
+    codon_api.result_cache = codon_api.ResultCache(max_entries=codon_api.CACHE_SIZE) if cache else None
+    codon_api.model_ready = True
+
+
+async def drive(client, payloads, concurrency, duration):
+    """Send requests from `concurrency` workers for `duration` seconds"""
+    latencies = []
+    statuses = {}
+    stop_at = time.perf_counter() + duration
+
+    async def worker(worker_id):
+        rng = random.Random(worker_id)
+        while time.perf_counter() < stop_at:
+            payload = rng.choice(payloads)
+            start = time.perf_counter()
+            try:
+                response = await client.post("/optimize", json=payload)
+                outcome = str(response.status_code)
+                if response.status_code == 200 and not response.json().get("success"):
+                    outcome = "failed"
+            except Exception as e:
+                outcome = type(e).__name__
+            if outcome == "200":
+                latencies.append(time.perf_counter() - start)
+            statuses[outcome] = statuses.get(outcome, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    wall = time.perf_counter() - started
+    return latencies, statuses, wall
+
+
+async def run_load_async(args):
+    import httpx
+
+    rng = random.Random(args.seed)
+    panel = enzyme_panel(6)
+    payloads = []
+    for residues in args.load_residues:
+        for i in range(8):
+            payloads.append({
+                "protein": synthetic_protein(residues, rng),
+                "organism": LOAD_ORGANISM,
+                "avoid_restriction_sites": panel if i % 2 else [],
+            })
+
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=120.0)
+        target = args.url
+    else:
+        install_stub(StubModel(args.stub_base_ms, args.stub_per_residue_us), args.cache)
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=codon_api.app), base_url="http://bench",
+                                   timeout=120.0)
+        target = "in-process app with stub model"
+
+    print(f"\nLoad test against {target} ({args.duration:g} s per level):")
+    results = []
+    try:
+        for concurrency in args.concurrency:
+            latencies, statuses, wall = await drive(client, payloads, concurrency, args.duration)
+            completed = len(latencies)
+            entry = {
+                "concurrency": concurrency,
+                "requests": sum(statuses.values()),
+                "completed": completed,
+                "rps": completed / wall if wall else 0.0,
+                "p50_ms": percentile(latencies, 50) * 1000 if latencies else None,
+                "p95_ms": percentile(latencies, 95) * 1000 if latencies else None,
+                "p99_ms": percentile(latencies, 99) * 1000 if latencies else None,
+                "statuses": statuses,
+            }
+            results.append(entry)
+            if latencies:
+                print(f"  c={concurrency:<4} {entry['rps']:8.1f} req/s   p50 {entry['p50_ms']:8.1f} ms   "
+                      f"p95 {entry['p95_ms']:8.1f} ms   p99 {entry['p99_ms']:8.1f} ms   {statuses}")
+            else:
+                print(f"  c={concurrency:<4} no successful requests   {statuses}")
+    finally:
+        await client.aclose()
+        if not args.url:
+            await codon_api.batcher.stop()
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SCRIPT_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, baseline, threshold):
+    """Relative changes against a baseline report; returns the regressions"""
+    regressions = []
+
+    def check(label, metric, higher_is_better, current, previous):
+        if current is None or not previous:
+            return
+        change = (current - previous) / previous
+        worse = -change if higher_is_better else change
+        status = "⚠" if worse > threshold else "✓"
+        print(f"  {status} {label:<60} {metric} {previous:10.2f} -> {current:10.2f} ({change * 100:+.1f}%)")
+        if worse > threshold:
+            regressions.append({"benchmark": label, "metric": metric, "baseline": previous, "current": current})
+
+    print(f"\nComparison with baseline (threshold {threshold * 100:.0f}%):")
+    metric, higher = MICRO_METRIC
+    previous_micro = {(b["name"], b["residues"], b["enzymes"]): b for b in baseline.get("micro", [])}
+    for entry in report.get("micro", []):
+        key = (entry["name"], entry["residues"], entry["enzymes"])
+        if key in previous_micro:
+            label = f"{entry['name']} {entry['residues']} aa" + (f" {entry['enzymes']} enzymes" if entry["enzymes"] else "")
+            check(label, metric, higher, entry[metric], previous_micro[key][metric])
+
+    previous_load = {b["concurrency"]: b for b in baseline.get("load", [])}
+    for entry in report.get("load", []):
+        if entry["concurrency"] in previous_load:
+            for metric, higher in LOAD_METRICS:
+                check(f"load c={entry['concurrency']}", metric, higher, entry[metric],
+                      previous_load[entry["concurrency"]][metric])
+    return regressions
+
+
+def run_benchmarks(args):
+    print("=" * 60)
+    print("Codon API Benchmarks")
+    print("=" * 60)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "seed": args.seed,
+        },
+    }
+    if args.suite in ("all", "micro"):
+        report["micro"] = run_micro(args.residues, args.enzymes, args.seed, args.min_seconds)
+    if args.suite in ("all", "load"):
+        report["meta"]["load"] = {
+            "url": args.url,
+            "duration_s": args.duration,
+            "protein_residues": args.load_residues,
+            "stub_base_ms": None if args.url else args.stub_base_ms,
+            "stub_per_residue_us": None if args.url else args.stub_per_residue_us,
+            "max_batch_size": codon_api.MAX_BATCH_SIZE,
+            "inference_slots": codon_api.INFERENCE_SLOTS,
+            "cache": args.cache,
+        }
+        report["load"] = asyncio.run(run_load_async(args))
+
+    success = True
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        report["regressions"] = compare(report, baseline, args.threshold)
+        if report["regressions"]:
+            print(f"\n⚠ {len(report['regressions'])} regression(s) beyond {args.threshold * 100:.0f}%")
+            success = False
+        else:
+            print("\n✓ No regressions")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults saved to {args.output}")
+    print("\n" + "=" * 60)
+    return success
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--suite", choices=("all", "micro", "load"), default="all")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="JSON result file")
+    parser.add_argument("--compare", metavar="BASELINE", help="Earlier result file to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Relative slowdown that counts as a regression (default 0.10)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--residues", type=int, nargs="+", default=list(DEFAULT_RESIDUES),
+                        help="Protein lengths for the micro-benchmarks")
+    parser.add_argument("--enzymes", type=int, nargs="+", default=list(DEFAULT_ENZYMES),
+                        help="Enzyme panel sizes for the restriction site benchmarks")
+    parser.add_argument("--min-seconds", type=float, default=0.2, help="Minimum timed seconds per micro-benchmark")
+    parser.add_argument("--url", help="Benchmark a running server instead of the in-process app")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=list(DEFAULT_CONCURRENCY))
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per concurrency level")
+    parser.add_argument("--load-residues", type=int, nargs="+", default=[100, 300, 1000],
+                        help="Protein lengths in the load test request mix")
+    parser.add_argument("--cache", action="store_true", help="Enable the result cache during the load test")
+    parser.add_argument("--stub-base-ms", type=float, default=5.0, help="Simulated fixed cost per forward pass")
+    parser.add_argument("--stub-per-residue-us", type=float, default=2.0,
+                        help="Simulated cost per residue per batch row")
+    args = parser.parse_args()
+
+    success = run_benchmarks(args)
+    exit(0 if success else 1)
@@ -0,0 +1,164 @@
+"""
+Calibrate the full vs. block-sparse attention crossover for the codon server.
+
+Times BigBird with original_full and block_sparse attention on this machine
+for a range of input lengths, checks block-sparse predictions against full
+attention (argmax codon agreement and maximum logit difference), and records
+the faster mode per length bucket. Block-sparse is only chosen where it is
+both faster and agrees with full attention on at least --min-agreement of
+the codons. The server reads the result at startup when --attention is auto.
+
+Usage:
+    python scripts/calibrate_attention.py
+    python scripts/calibrate_attention.py --lengths 512 1024 2046 --batch-size 4 --model-dir DIR
+
+Output:
+    scripts/models/attention_calibration.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import time
+from datetime import datetime, timezone
+
+import torch
+from transformers import AutoTokenizer, BigBirdForMaskedLM
+from CodonTransformer.CodonData import get_merged_seq
+from CodonTransformer.CodonPrediction import tokenize, validate_and_convert_organism
+
+from codon_backends import (
+    DEFAULT_CALIBRATION_PATH, FULL_ATTENTION, MIN_SPARSE_TOKENS, SPARSE_ATTENTION, EagerBackend,
+)
+from codon_inference import MAX_WINDOW_TOKENS
+from export_codon_model import MODEL_ID, REFERENCE_ORGANISM, REFERENCE_PROTEINS
+
+DEFAULT_LENGTHS = (128, 256, 512, 768, 1024, 1536, MAX_WINDOW_TOKENS)
+
+
+def calibration_proteins(length, batch_size, rng):
+    """Reference proteins tiled to `length` residues (minus the stop token), one per row"""
+    pool = "".join(REFERENCE_PROTEINS.values())
+    proteins = []
+    for _ in range(batch_size):
+        start = rng.randrange(len(pool))
+        tiled = (pool[start:] + pool * (length // len(pool) + 2))[:length - 1]
+        proteins.append(tiled)
+    return proteins
+
+
+def time_mode(backend, tokenized, mode, repeats):
+    backend.logits(tokenized, attention=mode)
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        logits = backend.logits(tokenized, attention=mode)
+        latencies.append(time.perf_counter() - start)
+    return statistics.median(latencies), logits
+
+
+def calibrate(args):
+    print("=" * 60)
+    print("BigBird Attention Calibration")
+    print("=" * 60)
+
+    source = args.model_dir or MODEL_ID
+    print(f"\nLoading {source}...")
+    torch.set_grad_enabled(False)
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    device = torch.device("cuda" if torch.cuda.is_available() and not args.cpu else "cpu")
+    tokenizer = AutoTokenizer.from_pretrained(source, local_files_only=bool(args.model_dir))
+    model = BigBirdForMaskedLM.from_pretrained(source, local_files_only=bool(args.model_dir))
+    model.bert.set_attention_type(FULL_ATTENTION)
+    model.eval()
+    backend = EagerBackend(model.to(device), device)
+    organism_id, organism_name = validate_and_convert_organism(REFERENCE_ORGANISM)
+    print(f"Device: {device}, threads: {torch.get_num_threads()}, batch size: {args.batch_size}")
+
+    rng = random.Random(args.seed)
+    buckets = []
+    print(f"\n{'tokens':>7} {'full ms':>10} {'sparse ms':>10} {'agreement':>10} {'max diff':>9}  choice")
+    for length in sorted(set(min(n, MAX_WINDOW_TOKENS) for n in args.lengths)):
+        proteins = calibration_proteins(length, args.batch_size, rng)
+        tokenized = tokenize(
+            [{"idx": i, "codons": get_merged_seq(protein=p, dna=""), "organism": organism_id}
+             for i, p in enumerate(proteins)],
+            tokenizer=tokenizer,
+        )
+        full_seconds, full_logits = time_mode(backend, tokenized, FULL_ATTENTION, args.repeats)
+        # Buckets are keyed on the padded length the server's policy sees
+        tokens = int(tokenized["input_ids"].shape[1])
+        bucket = {"max_tokens": tokens, "full_ms": full_seconds * 1000, "mode": FULL_ATTENTION}
+
+        if tokens > MIN_SPARSE_TOKENS:
+            sparse_seconds, sparse_logits = time_mode(backend, tokenized, SPARSE_ATTENTION, args.repeats)
+            mask = tokenized["attention_mask"].bool()
+            agreement = float((full_logits.argmax(-1) == sparse_logits.argmax(-1))[mask].float().mean())
+            max_diff = float((full_logits - sparse_logits).abs().max())
+            bucket.update(sparse_ms=sparse_seconds * 1000, codon_agreement=agreement, max_logit_diff=max_diff)
+            if sparse_seconds < full_seconds and agreement >= args.min_agreement:
+                bucket["mode"] = SPARSE_ATTENTION
+            print(f"{tokens:>7} {bucket['full_ms']:>10.1f} {bucket['sparse_ms']:>10.1f} "
+                  f"{agreement * 100:>9.2f}% {max_diff:>9.4f}  {bucket['mode']}")
+        else:
+            # BigBird falls back to full attention at this length anyway
+            print(f"{tokens:>7} {bucket['full_ms']:>10.1f} {'-':>10} {'-':>10} {'-':>9}  {bucket['mode']}")
+        buckets.append(bucket)
+
+    # Crossover: the shortest length from which block-sparse wins every longer bucket
+    threshold = buckets[-1]["max_tokens"]
+    for i in range(len(buckets) - 1, -1, -1):
+        if buckets[i]["mode"] != SPARSE_ATTENTION:
+            break
+        threshold = buckets[i - 1]["max_tokens"] if i > 0 else MIN_SPARSE_TOKENS
+    sparse_used = any(bucket["mode"] == SPARSE_ATTENTION for bucket in buckets)
+
+    result = {
+        "model": source,
+        "organism": organism_name,
+        "device": str(device),
+        "threads": torch.get_num_threads(),
+        "batch_size": args.batch_size,
+        "min_agreement": args.min_agreement,
+        "platform": platform.platform(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "threshold": threshold,
+        "buckets": buckets,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(result, f, indent=2)
+
+    print()
+    if sparse_used:
+        print(f"✓ block_sparse is faster above {threshold} tokens on this machine")
+        if threshold >= 1024:
+            print("  Raise --window-size (up to 2046) so long proteins reach the block_sparse buckets")
+    else:
+        print("⚠ full attention was faster (or block_sparse disagreed) at every length; auto mode stays on full")
+    print(f"Calibration saved to {args.output}")
+    print("\n" + "=" * 60)
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--output", default=DEFAULT_CALIBRATION_PATH, help="Calibration JSON path")
+    parser.add_argument("--lengths", type=int, nargs="+", default=list(DEFAULT_LENGTHS),
+                        help="Token lengths to measure (each becomes a bucket upper bound)")
+    parser.add_argument("--batch-size", type=int, default=1, help="Rows per forward pass")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed runs per mode and length")
+    parser.add_argument("--min-agreement", type=float, default=0.98,
+                        help="Minimum argmax codon agreement with full attention to accept block_sparse")
+    parser.add_argument("--threads", type=int, help="torch intra-op threads (default: torch's choice)")
+    parser.add_argument("--cpu", action="store_true", help="Calibrate on CPU even if CUDA is available")
+    parser.add_argument("--model-dir", help="Local model directory (see export_codon_model.py --save-local)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    success = calibrate(args)
+    exit(0 if success else 1)
@@ -0,0 +1,304 @@
+"""
+Vectorized DNA sequence analytics for the codon optimization server.
+
+Sequences are encoded as uint8 base codes (A=0, C=1, G=2, T=3, other=4) and
+concatenated into one flat array, so whole batches are translated, GC-profiled,
+CAI-scored and codon-counted with a handful of NumPy operations instead of
+per-character Python loops.
+"""
+
+import json
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+BASES = "ACGT"
+INVALID_BASE = 4
+INVALID_CODON = 64
+
+# Byte -> base code lookup; either case is accepted, like toUpperCase() in src/utils/caiCalculator.ts
+BASE_LUT = np.full(256, INVALID_BASE, dtype=np.uint8)
+for _code, _base in enumerate(BASES):
+    BASE_LUT[ord(_base)] = _code
+    BASE_LUT[ord(_base.lower())] = _code
+
+# Codon index is 16*b0 + 4*b1 + b2 over ACGT
+CODONS: List[str] = [a + b + c for a in BASES for b in BASES for c in BASES]
+
+_AMINO_ACIDS = {
+    'TTT': 'F', 'TTC': 'F', 'TTA': 'L', 'TTG': 'L', 'TCT': 'S', 'TCC': 'S', 'TCA': 'S', 'TCG': 'S',
+    'TAT': 'Y', 'TAC': 'Y', 'TAA': '*', 'TAG': '*', 'TGT': 'C', 'TGC': 'C', 'TGA': '*', 'TGG': 'W',
+    'CTT': 'L', 'CTC': 'L', 'CTA': 'L', 'CTG': 'L', 'CCT': 'P', 'CCC': 'P', 'CCA': 'P', 'CCG': 'P',
+    'CAT': 'H', 'CAC': 'H', 'CAA': 'Q', 'CAG': 'Q', 'CGT': 'R', 'CGC': 'R', 'CGA': 'R', 'CGG': 'R',
+    'ATT': 'I', 'ATC': 'I', 'ATA': 'I', 'ATG': 'M', 'ACT': 'T', 'ACC': 'T', 'ACA': 'T', 'ACG': 'T',
+    'AAT': 'N', 'AAC': 'N', 'AAA': 'K', 'AAG': 'K', 'AGT': 'S', 'AGC': 'S', 'AGA': 'R', 'AGG': 'R',
+    'GTT': 'V', 'GTC': 'V', 'GTA': 'V', 'GTG': 'V', 'GCT': 'A', 'GCC': 'A', 'GCA': 'A', 'GCG': 'A',
+    'GAT': 'D', 'GAC': 'D', 'GAA': 'E', 'GAG': 'E', 'GGT': 'G', 'GGC': 'G', 'GGA': 'G', 'GGG': 'G',
+}
+
+# 65-entry codon -> amino acid byte table; the extra entry is 'X' for codons with invalid bases
+AA_LUT = np.frombuffer(("".join(_AMINO_ACIDS[c] for c in CODONS) + "X").encode("ascii"), dtype=np.uint8)
+
+DEFAULT_USAGE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "data", "ecoli_codon_usage.json")
+
+
+@dataclass
+class EncodedBatch:
+    """A batch of DNA sequences as flat base and codon arrays with per-sequence offsets"""
+    bases: np.ndarray          # uint8 base codes, all sequences concatenated
+    lengths: np.ndarray        # bases per sequence
+    offsets: np.ndarray        # start of each sequence in `bases`
+    codons: np.ndarray         # codon index per in-frame codon (64 = invalid)
+    codon_counts: np.ndarray   # complete codons per sequence
+    codon_offsets: np.ndarray  # start of each sequence in `codons`
+
+    @property
+    def size(self) -> int:
+        return len(self.lengths)
+
+    def base_segments(self) -> np.ndarray:
+        """Sequence index of every base"""
+        return np.repeat(np.arange(self.size), self.lengths)
+
+    def codon_segments(self) -> np.ndarray:
+        """Sequence index of every codon"""
+        return np.repeat(np.arange(self.size), self.codon_counts)
+
+    def codon_positions(self) -> np.ndarray:
+        """Position of every codon within its own sequence"""
+        return np.arange(len(self.codons)) - np.repeat(self.codon_offsets, self.codon_counts)
+
+
+def encode(sequences: Union[Sequence[str], EncodedBatch]) -> EncodedBatch:
+    """Encode DNA strings into an EncodedBatch (no-op for an existing batch)"""
+    if isinstance(sequences, EncodedBatch):
+        return sequences
+
+    lengths = np.fromiter((len(s) for s in sequences), dtype=np.int64, count=len(sequences))
+    offsets = np.zeros(len(lengths), dtype=np.int64)
+    np.cumsum(lengths[:-1], out=offsets[1:])
+    raw = np.frombuffer("".join(sequences).encode("ascii", "replace"), dtype=np.uint8)
+    bases = BASE_LUT[raw]
+
+    codon_counts = lengths // 3
+    codon_offsets = np.zeros(len(lengths), dtype=np.int64)
+    np.cumsum(codon_counts[:-1], out=codon_offsets[1:])
+    positions = np.arange(codon_counts.sum()) - np.repeat(codon_offsets, codon_counts)
+    starts = np.repeat(offsets, codon_counts) + 3 * positions
+
+    b0 = bases[starts].astype(np.int64)
+    b1 = bases[starts + 1].astype(np.int64)
+    b2 = bases[starts + 2].astype(np.int64)
+    codons = 16 * b0 + 4 * b1 + b2
+    codons[(b0 == INVALID_BASE) | (b1 == INVALID_BASE) | (b2 == INVALID_BASE)] = INVALID_CODON
+
+    return EncodedBatch(bases, lengths, offsets, codons, codon_counts, codon_offsets)
+
+
+def translate(sequences: Union[Sequence[str], EncodedBatch]) -> List[str]:
+    """Translate every sequence through the 64-entry codon table ('X' for invalid codons)"""
+    batch = encode(sequences)
+    protein = AA_LUT[batch.codons].tobytes().decode("ascii")
+    return [protein[o:o + n] for o, n in zip(batch.codon_offsets.tolist(), batch.codon_counts.tolist())]
+
+
+def gc_content(sequences: Union[Sequence[str], EncodedBatch]) -> np.ndarray:
+    """Fraction of G/C among valid bases, per sequence"""
+    batch = encode(sequences)
+    segments = batch.base_segments()
+    is_gc = (batch.bases == 1) | (batch.bases == 2)
+    valid = batch.bases < INVALID_BASE
+    gc = np.bincount(segments, weights=is_gc, minlength=batch.size)
+    total = np.bincount(segments, weights=valid, minlength=batch.size)
+    return np.divide(gc, total, out=np.zeros(batch.size), where=total > 0)
+
+
+def sliding_gc(sequence: str, window: int = 50) -> np.ndarray:
+    """GC fraction of every window of one sequence"""
+    bases = BASE_LUT[np.frombuffer(sequence.encode("ascii", "replace"), dtype=np.uint8)]
+    if len(bases) < window or window <= 0:
+        return gc_content([sequence])
+    is_gc = ((bases == 1) | (bases == 2)).astype(np.int64)
+    cumulative = np.concatenate(([0], np.cumsum(is_gc)))
+    return (cumulative[window:] - cumulative[:-window]) / window
+
+
+def gc_window_extremes(sequences: Union[Sequence[str], EncodedBatch], window: int = 50) -> np.ndarray:
+    """
+    (min, max) sliding-window GC fraction per sequence, as an (n, 2) array.
+    Sequences shorter than the window use their global GC content.
+    """
+    batch = encode(sequences)
+    is_gc = ((batch.bases == 1) | (batch.bases == 2)).astype(np.int64)
+    cumulative = np.concatenate(([0], np.cumsum(is_gc)))
+
+    window_counts = np.maximum(batch.lengths - window + 1, 0)
+    extremes = np.repeat(gc_content(batch)[:, None], 2, axis=1)
+    has_windows = window_counts > 0
+    if window <= 0 or not has_windows.any():
+        return extremes
+
+    counts = window_counts[has_windows]
+    window_offsets = np.zeros(len(counts), dtype=np.int64)
+    np.cumsum(counts[:-1], out=window_offsets[1:])
+    positions = np.arange(counts.sum()) - np.repeat(window_offsets, counts)
+    starts = np.repeat(batch.offsets[has_windows], counts) + positions
+    fractions = (cumulative[starts + window] - cumulative[starts]) / window
+
+    extremes[has_windows, 0] = np.minimum.reduceat(fractions, window_offsets)
+    extremes[has_windows, 1] = np.maximum.reduceat(fractions, window_offsets)
+    return extremes
+
+
+def kmer_codes(batch: EncodedBatch, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Base-4 code and sequence index of every k-mer (k <= 31) that lies within one
+    sequence and contains only A/C/G/T.
+    """
+    counts = np.maximum(batch.lengths - k + 1, 0)
+    offsets = np.zeros(len(counts), dtype=np.int64)
+    np.cumsum(counts[:-1], out=offsets[1:])
+    starts = np.repeat(batch.offsets, counts) + np.arange(counts.sum()) - np.repeat(offsets, counts)
+
+    codes = np.zeros(len(starts), dtype=np.int64)
+    invalid = np.zeros(len(starts), dtype=bool)
+    for j in range(k):
+        base = batch.bases[starts + j]
+        invalid |= base == INVALID_BASE
+        codes = codes * 4 + (base & 3)
+    segments = np.repeat(np.arange(batch.size), counts)
+    return codes[~invalid], segments[~invalid]
+
+
+def motif_counts(sequences: Union[Sequence[str], EncodedBatch], motifs: Sequence[str]) -> np.ndarray:
+    """Occurrences per sequence of any of the given concrete A/C/G/T motifs (overlaps count)"""
+    batch = encode(sequences)
+    by_length: Dict[int, set] = {}
+    for motif in motifs:
+        codes = BASE_LUT[np.frombuffer(motif.upper().encode("ascii"), dtype=np.uint8)].astype(np.int64)
+        if len(codes) and (codes < INVALID_BASE).all():
+            by_length.setdefault(len(codes), set()).add(int(np.polyval(codes, 4)))
+
+    hits = np.zeros(batch.size, dtype=np.int64)
+    for k, words in by_length.items():
+        codes, segments = kmer_codes(batch, k)
+        matched = np.isin(codes, np.fromiter(words, dtype=np.int64, count=len(words)))
+        hits += np.bincount(segments[matched], minlength=batch.size)
+    return hits
+
+
+def longest_homopolymer(sequences: Union[Sequence[str], EncodedBatch]) -> np.ndarray:
+    """Length of the longest single-base run of A/C/G/T per sequence"""
+    batch = encode(sequences)
+    longest = np.zeros(batch.size, dtype=np.int64)
+    if not len(batch.bases):
+        return longest
+
+    new_run = np.ones(len(batch.bases), dtype=bool)
+    new_run[1:] = batch.bases[1:] != batch.bases[:-1]
+    new_run[batch.offsets[batch.lengths > 0]] = True
+    run_starts = np.flatnonzero(new_run)
+    run_lengths = np.diff(np.append(run_starts, len(batch.bases)))
+    run_lengths[batch.bases[run_starts] == INVALID_BASE] = 0
+    np.maximum.at(longest, batch.base_segments()[run_starts], run_lengths)
+    return longest
+
+
+def repeat_fraction(sequences: Union[Sequence[str], EncodedBatch], k: int = 12) -> np.ndarray:
+    """Fraction of each sequence's k-mers (k <= 20) that occur more than once in that sequence"""
+    batch = encode(sequences)
+    codes, segments = kmer_codes(batch, k)
+    # One sort over (sequence, k-mer) keys finds repeats in every sequence at once
+    _, inverse, counts = np.unique(segments * 4 ** k + codes, return_inverse=True, return_counts=True)
+    repeated = np.bincount(segments, weights=counts[inverse] > 1, minlength=batch.size)
+    total = np.bincount(segments, minlength=batch.size)
+    return np.divide(repeated, total, out=np.zeros(batch.size), where=total > 0)
+
+
+def codon_histograms(sequences: Union[Sequence[str], EncodedBatch]) -> np.ndarray:
+    """(n, 64) codon counts per sequence, columns ordered as CODONS"""
+    batch = encode(sequences)
+    flat = np.bincount(batch.codon_segments() * 65 + batch.codons, minlength=batch.size * 65)
+    return flat.reshape(batch.size, 65)[:, :64]
+
+
+def load_codon_usage(path: str = DEFAULT_USAGE_PATH) -> Dict[str, float]:
+    """Read codon -> frequency from a codon usage JSON file such as ecoli_codon_usage.json"""
+    with open(path) as f:
+        data = json.load(f)
+    return {codon.upper(): info["frequency"] for codon, info in data["codons"].items()}
+
+
+def relative_adaptiveness(usage: Dict[str, float]) -> np.ndarray:
+    """
+    64-entry w_i table: each codon's frequency over its amino acid's most used codon.
+    Met, Trp and stop codons are 1.0; unused codons get 0.001 (as in caiCalculator.ts).
+    """
+    weights = np.zeros(64)
+    by_aa: Dict[str, List[int]] = {}
+    for index, codon in enumerate(CODONS):
+        by_aa.setdefault(_AMINO_ACIDS[codon], []).append(index)
+
+    for aa, indices in by_aa.items():
+        freqs = np.array([usage.get(CODONS[i], 0.0) for i in indices])
+        max_freq = freqs.max()
+        if aa in ("M", "W", "*"):
+            weights[indices] = 1.0
+        elif max_freq > 0:
+            weights[indices] = np.where(freqs > 0, freqs / max_freq, 0.001)
+        else:
+            weights[indices] = 0.001
+    return weights
+
+
+def cai(sequences: Union[Sequence[str], EncodedBatch], weights: np.ndarray) -> np.ndarray:
+    """
+    Codon Adaptation Index per sequence: exp(mean(log w_i)).
+    Like caiCalculator.ts, the first and last codons are excluded when there are more than two.
+    """
+    batch = encode(sequences)
+    log_w = np.append(np.log(weights), 0.0)
+
+    positions = batch.codon_positions()
+    per_codon = np.repeat(batch.codon_counts, batch.codon_counts)
+    included = (batch.codons != INVALID_CODON) & (
+        (per_codon <= 2) | ((positions > 0) & (positions < per_codon - 1))
+    )
+
+    segments = batch.codon_segments()
+    log_sum = np.bincount(segments, weights=np.where(included, log_w[batch.codons], 0.0), minlength=batch.size)
+    count = np.bincount(segments, weights=included, minlength=batch.size)
+    mean = np.divide(log_sum, count, out=np.full(batch.size, -np.inf), where=count > 0)
+    return np.exp(mean)
+
+
+def analyze(
+    sequences: Sequence[str],
+    weights: Optional[np.ndarray] = None,
+    window: int = 50,
+    include_codon_counts: bool = False,
+) -> List[dict]:
+    """Summary metrics for a batch of DNA sequences, one dict per sequence"""
+    batch = encode(sequences)
+    gc = gc_content(batch)
+    extremes = gc_window_extremes(batch, window)
+    scores = cai(batch, weights) if weights is not None else None
+    histograms = codon_histograms(batch) if include_codon_counts else None
+    proteins = translate(batch)
+
+    results = []
+    for i in range(batch.size):
+        entry = {
+            "length": int(batch.lengths[i]),
+            "protein": proteins[i],
+            "gc_content": float(gc[i]),
+            "gc_window_min": float(extremes[i, 0]),
+            "gc_window_max": float(extremes[i, 1]),
+            "cai": float(scores[i]) if scores is not None else None,
+        }
+        if histograms is not None:
+            entry["codon_counts"] = {CODONS[j]: int(c) for j, c in enumerate(histograms[i]) if c}
+        results.append(entry)
+    return results
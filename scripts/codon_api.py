@@ -1,18 +1,41 @@
 """
 CodonTransformer Local API Server
 Run this on your computer to provide codon optimization as a service
+
+torch, transformers and CodonTransformer are imported while the model loads
+in the background, so /health answers as soon as the process is up and
+/ready reports when the model is warm.
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Query, Request
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
-from typing import Optional, Union, List, Dict
-import torch
-from transformers import AutoTokenizer, BigBirdForMaskedLM
-from CodonTransformer.CodonPrediction import predict_dna_sequence
-from CodonTransformer.CodonJupyter import format_model_output
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field, ValidationError, field_validator, model_validator
+from typing import Any, AsyncIterator, Literal, Optional, Tuple, Union, List, Dict
+from codon_backends import ATTENTION_MODES, BACKENDS, DEFAULT_CALIBRATION_PATH, DEFAULT_ONNX_PATH, AttentionPolicy, load_backend
+from codon_jobs import FINAL_STATES, JobScheduler, JobStore
+from codon_lifecycle import PRECISIONS, ModelLifecycle, load_snapshot, save_snapshot
+from codon_inference import MAX_WINDOW_TOKENS, InferenceBatcher, InferenceItem, QueueFullError, check_protein, predict_batch
+import codon_analytics
+from codon_cache import ResultCache, make_cache_key
+from codon_metrics import Registry, process_rss_bytes, server_timing, timed
+from codon_organisms import OrganismIndex
+from codon_ranking import OBJECTIVE_TERMS, rank_candidates, resolve_objective
+from codon_restriction import SiteScanner, load_enzyme_sites, repair_sites, site_words
+from codon_tables import DEFAULT_TABLE_DIR, CodonTableEngine, CodonUsageTable, TablePrediction
+from contextlib import contextmanager, nullcontext
+from functools import lru_cache
+from fasta import aiter_fasta, aiter_json_list
 import uvicorn
-import random
+import argparse
+import asyncio
+import json
+import math
+import os
+import threading
+import time
 
 app = FastAPI(
     title="CodonTransformer API",
@@ -20,6 +43,35 @@ app = FastAPI(
     version="1.0.0"
 )
 
+class RequestMetricsMiddleware:
+    """Count and time every HTTP request by route template and status code"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router stores the matched route in the scope; templates keep label cardinality bounded
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUESTS.inc(scope["method"], route, str(status[0]))
+            HTTP_SECONDS.observe(time.perf_counter() - started, route)
+
+app.add_middleware(RequestMetricsMiddleware)
+
 # Enable CORS for local development
 app.add_middleware(
     CORSMiddleware,
@@ -27,12 +79,127 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "Retry-After", "ETag"],
 )
 
+MODEL_ID = "adibvafa/CodonTransformer"
+
 # Global model and tokenizer (loaded once at startup)
 model = None
 tokenizer = None
 device = None
+backend = None
+batcher = None
+result_cache = None
+job_store = None
+job_scheduler = None
+lifecycle = None
+model_config = None
+model_revision = MODEL_ID
+cuda_available = None
+attention_policy = None
+organism_index = None
+organism_index_lock = threading.Lock()
+
+# Startup state: /health is liveness only, /ready flips once the model is warm
+model_ready = False
+startup_error = None
+startup_timings: Dict[str, float] = {}
+loader_task = None
+
+# Prometheus metrics served on /metrics
+METRICS = Registry()
+HTTP_REQUESTS = METRICS.counter(
+    "codon_http_requests_total", "HTTP requests by method, route and status code", ("method", "route", "status"))
+HTTP_SECONDS = METRICS.histogram(
+    "codon_http_request_duration_seconds", "HTTP request latency by route", ("route",))
+OPTIMIZATIONS = METRICS.counter(
+    "codon_optimizations_total", "Optimization requests by outcome (success, cached, fallback, failed, overloaded)",
+    ("outcome",))
+STAGE_SECONDS = METRICS.histogram(
+    "codon_stage_duration_seconds", "Time each optimization spent per stage", ("stage",))
+BATCH_SIZE = METRICS.histogram(
+    "codon_batch_size", "Requests per model forward pass", buckets=(1, 2, 4, 8, 16, 32, 64))
+METRICS.gauge("codon_queue_depth", "Requests waiting for an inference slot",
+              lambda: batcher.queue_depth if batcher else 0)
+METRICS.gauge("codon_in_flight_requests", "Requests in a running forward pass",
+              lambda: batcher.in_flight if batcher else 0)
+METRICS.gauge("codon_model_ready", "1 once the model is loaded and warmed up", lambda: int(model_ready))
+METRICS.gauge("codon_model_info", "Inference backend and device of the loaded model",
+              lambda: {(backend.name, str(device)): 1} if backend else None, ("backend", "device"))
+METRICS.gauge("codon_cache_entries", "Results held in the in-memory cache",
+              lambda: result_cache.summary(include_disk=False)["memory_entries"] if result_cache else None)
+METRICS.gauge("codon_cache_hit_ratio", "Fraction of cache lookups served from memory or disk",
+              lambda: result_cache.summary(include_disk=False)["hit_rate"] if result_cache else None)
+METRICS.gauge("codon_jobs", "Stored optimization jobs by state",
+              lambda: {(state,): count for state, count in job_store.counts().items()} if job_store else None,
+              ("state",))
+METRICS.gauge("codon_model_resident", "1 while the model weights are loaded (0 after an idle unload)",
+              lambda: int(lifecycle.state == "loaded") if lifecycle else int(backend is not None))
+METRICS.gauge("process_resident_memory_bytes", "Resident memory size in bytes", process_rss_bytes)
+
+# Local model directory (config, tokenizer and safetensors weights); when set the hub is never contacted
+MODEL_DIR = os.environ.get("CODON_MODEL_DIR", "")
+
+# Short request run through the model before the server reports ready
+WARMUP_PROTEIN = "MSKGEELFTGVVPILVELDGDVNGHKFSVSGEGEGDATYGK"
+WARMUP_ORGANISM = "Escherichia coli general"
+
+# Inference scheduler settings (environment variables, overridable from the command line)
+MAX_BATCH_SIZE = int(os.environ.get("CODON_MAX_BATCH_SIZE", "8"))
+MAX_BATCH_WAIT_MS = float(os.environ.get("CODON_MAX_BATCH_WAIT_MS", "10"))
+INFERENCE_SLOTS = int(os.environ.get("CODON_INFERENCE_SLOTS", "1"))
+MAX_QUEUE_SIZE = int(os.environ.get("CODON_MAX_QUEUE_SIZE", "64"))
+
+# Server processes sharing one copy of the weights, and torch intra-op threads per process
+# (0 = torch's default for one process, an even share of the cores with several workers)
+WORKERS = int(os.environ.get("CODON_WORKERS", "1"))
+TORCH_THREADS = int(os.environ.get("CODON_TORCH_THREADS", "0"))
+worker_index = None
+
+# Long proteins: split into windows of this many tokens (0 = only beyond the model limit) with this overlap
+WINDOW_SIZE = int(os.environ.get("CODON_WINDOW_SIZE", "1024"))
+WINDOW_OVERLAP = int(os.environ.get("CODON_WINDOW_OVERLAP", "128"))
+
+# BigBird attention per forward pass: auto picks full or block_sparse from the padded length,
+# using the calibration file from calibrate_attention.py when present; without one it stays on full
+# attention unless a threshold (tokens, 0 = none) explicitly opts longer inputs into block_sparse
+ATTENTION_MODE = os.environ.get("CODON_ATTENTION", "auto")
+ATTENTION_THRESHOLD = int(os.environ.get("CODON_ATTENTION_THRESHOLD", "0"))
+ATTENTION_CALIBRATION = os.environ.get("CODON_ATTENTION_CALIBRATION", DEFAULT_CALIBRATION_PATH)
+
+# Inference backend: eager (PyTorch), int8 (dynamic quantization) or onnx (ONNX Runtime export)
+INFERENCE_BACKEND = os.environ.get("CODON_BACKEND", "eager")
+ONNX_PATH = os.environ.get("CODON_ONNX_PATH", DEFAULT_ONNX_PATH)
+
+# Model lifecycle: unload the weights after this many idle seconds (0 = keep them loaded), refuse to load
+# past a resident memory budget in MB (0 = no budget), and the CPU precision of the eager backend.
+# Reloads memory-map a snapshot of the weights written to SNAPSHOT_DIR on first load.
+IDLE_UNLOAD_SECONDS = float(os.environ.get("CODON_IDLE_UNLOAD_SECONDS", "0"))
+MEMORY_BUDGET_MB = float(os.environ.get("CODON_MEMORY_BUDGET_MB", "0"))
+PRECISION = os.environ.get("CODON_PRECISION", "float32")
+SNAPSHOT_DIR = os.environ.get(
+    "CODON_SNAPSHOT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "models", "snapshots"))
+
+# Result cache for deterministic requests (size 0 disables it; an empty DB path keeps it in memory only)
+CACHE_SIZE = int(os.environ.get("CODON_CACHE_SIZE", "1024"))
+CACHE_TTL = float(os.environ.get("CODON_CACHE_TTL", "86400"))
+CACHE_DB = os.environ.get("CODON_CACHE_DB", "")
+ADMIN_TOKEN = os.environ.get("CODON_ADMIN_TOKEN", "")
+
+# Largest candidate pool a best_of request may sample and rank
+MAX_BEST_OF = int(os.environ.get("CODON_MAX_BEST_OF", "1000"))
+
+# Asynchronous jobs: SQLite store (empty = memory only, lost on restart), days finished jobs are kept,
+# and records in flight across all jobs (0 = enough to fill every inference slot)
+JOBS_DB = os.environ.get("CODON_JOBS_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "jobs", "codon_jobs.db"))
+JOBS_RETENTION_DAYS = float(os.environ.get("CODON_JOBS_RETENTION_DAYS", "7"))
+JOBS_CONCURRENCY = int(os.environ.get("CODON_JOBS_CONCURRENCY", "0"))
+
+# Table-based fallback: codon usage tables (*_codon_usage.json) and the model queue wait, in ms,
+# beyond which engine="auto" requests are answered from the tables instead (0 = only when not loaded)
+CODON_TABLE_DIR = os.environ.get("CODON_TABLE_DIR", DEFAULT_TABLE_DIR)
+FALLBACK_WAIT_MS = float(os.environ.get("CODON_FALLBACK_WAIT_MS", "2000"))
 
 class OptimizationRequest(BaseModel):
     protein: str = Field(..., description="Protein sequence (amino acids)")
@@ -41,7 +208,25 @@ class OptimizationRequest(BaseModel):
     temperature: float = Field(0.2, ge=0.0, le=2.0, description="Sampling temperature (for non-deterministic)")
     top_p: float = Field(0.95, ge=0.0, le=1.0, description="Nucleus sampling threshold")
     num_sequences: int = Field(1, ge=1, le=10, description="Number of sequences to generate")
+    unique_sequences: bool = Field(False, description="Drop duplicate sequences (may return fewer than num_sequences)")
     avoid_restriction_sites: List[str] = Field(default_factory=list, description="Restriction sites to avoid (e.g., ['BsaI', 'BbsI'])")
+    best_of: int = Field(0, ge=0, le=MAX_BEST_OF, description="Sample this many candidates (always with temperature/top_p) and return the top num_sequences; 0 disables ranking")
+    objective: Optional[Dict[str, float]] = Field(None, description=f"best_of objective weights, overriding the defaults ({', '.join(OBJECTIVE_TERMS)})")
+    engine: Literal["auto", "model", "table"] = Field("auto", description="auto uses the model, or the codon usage tables while the model is loading or busy")
+    table_strategy: Optional[Literal["max_cai", "harmonize", "weighted_random"]] = Field(None, description="Table engine strategy (default: max_cai, or weighted_random when not deterministic)")
+
+    @field_validator("protein")
+    @classmethod
+    def protein_residues(cls, protein: str) -> str:
+        check_protein(protein)
+        return protein
+
+    @model_validator(mode="after")
+    def deterministic_count(self) -> "OptimizationRequest":
+        # A deterministic prediction has exactly one answer; best_of always samples its pool
+        if self.deterministic and self.num_sequences > 1 and not self.best_of:
+            raise ValueError("Multiple sequences need deterministic=false (or best_of)")
+        return self
 
 class OptimizationResponse(BaseModel):
     success: bool
@@ -53,6 +238,19 @@ class OptimizationResponse(BaseModel):
     error: Optional[str] = None
     restriction_sites_avoided: Optional[List[str]] = None
     warning: Optional[str] = None
+    metrics: Optional[List[Dict[str, Any]]] = None
+    candidates_evaluated: Optional[int] = None
+    candidate_scores: Optional[List[Dict[str, Any]]] = None
+    engine: Optional[str] = None
+
+class JobSubmission(BaseModel):
+    requests: List[Dict[str, Any]] = Field(..., description="Optimization requests, each optionally with an \"id\"")
+    priority: int = Field(0, ge=0, le=9, description="Jobs with a higher priority are scheduled first")
+
+class AnalysisRequest(BaseModel):
+    sequences: List[str] = Field(..., description="DNA sequences to analyze")
+    window: int = Field(50, ge=1, description="Sliding window size for GC extremes")
+    include_codon_counts: bool = Field(False, description="Include per-sequence codon histograms")
 
 # Restriction site recognition sequences
 RESTRICTION_SITES: Dict[str, str] = {
@@ -64,6 +262,11 @@ RESTRICTION_SITES: Dict[str, str] = {
     'Esp3I': 'CGTCTC',  # Same as BsmBI
 }
 
+# Enzymes shared with the web app, including degenerate IUPAC sites such as AccI (GT[AC][GT]AC)
+ENZYME_DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "data", "restriction_enzymes.json")
+for _name, _site in load_enzyme_sites(ENZYME_DATA_PATH).items():
+    RESTRICTION_SITES.setdefault(_name, _site)
+
 # Genetic code
 GENETIC_CODE = {
     'TTT': 'F', 'TTC': 'F', 'TTA': 'L', 'TTG': 'L',
@@ -91,144 +294,364 @@ for codon, aa in GENETIC_CODE.items():
         AA_TO_CODONS[aa] = []
     AA_TO_CODONS[aa].append(codon)
 
+# Codons that may replace each codon without changing the protein (stop codons stay fixed)
+SYNONYMOUS_CODONS = {
+    codon: AA_TO_CODONS[aa] for codon, aa in GENETIC_CODE.items() if aa != '*'
+}
+
+# Codon usage tables for the model-free engine (available before the model loads)
+TABLE_ENGINE = CodonTableEngine.load_directory(CODON_TABLE_DIR)
+
+# Reference codon usage for CAI (the same E. coli table the web app uses)
+CAI_WEIGHTS = (
+    codon_analytics.relative_adaptiveness(codon_analytics.load_codon_usage())
+    if os.path.exists(codon_analytics.DEFAULT_USAGE_PATH) else None
+)
+
+DNA_COMPLEMENT = str.maketrans('ATGC', 'TACG')
+
 def reverse_complement(seq: str) -> str:
     """Get reverse complement of DNA sequence"""
-    complement = {'A': 'T', 'T': 'A', 'G': 'C', 'C': 'G'}
-    return ''.join(complement.get(base, base) for base in reversed(seq))
+    return seq.translate(DNA_COMPLEMENT)[::-1]
+
+@lru_cache(maxsize=128)
+def site_scanner(site_names: tuple) -> SiteScanner:
+    """Compiled scanner for a set of known enzyme names (cached per set)"""
+    return SiteScanner({name: RESTRICTION_SITES[name] for name in site_names})
+
+def known_sites(sites: List[str]) -> tuple:
+    """Requested enzyme names that have a known recognition site, deduplicated in order"""
+    return tuple(dict.fromkeys(name for name in sites if name in RESTRICTION_SITES))
+
+@lru_cache(maxsize=128)
+def site_motifs(site_names: tuple) -> tuple:
+    """Concrete site sequences (both strands) for a set of known enzyme names, for ranking"""
+    return tuple(site_words(RESTRICTION_SITES[name] for name in site_names))
 
 def check_restriction_sites(sequence: str, sites_to_check: List[str]) -> List[str]:
     """Check if sequence contains any restriction sites (forward or reverse complement)"""
-    found = []
-    for site_name in sites_to_check:
-        if site_name not in RESTRICTION_SITES:
-            continue
-        site_seq = RESTRICTION_SITES[site_name]
-        site_rc = reverse_complement(site_seq)
-        if site_seq in sequence or site_rc in sequence:
-            found.append(site_name)
-    return found
+    names = known_sites(sites_to_check)
+    if not names:
+        return []
+    present = site_scanner(names).present(sequence)
+    return [name for name in names if name in present]
 
 def translate_dna(dna_seq: str) -> str:
     """Translate DNA sequence to protein"""
-    protein = []
-    for i in range(0, len(dna_seq), 3):
-        codon = dna_seq[i:i+3]
-        if len(codon) == 3:
-            aa = GENETIC_CODE.get(codon, 'X')
-            protein.append(aa)
-    return ''.join(protein)
-
-def avoid_restriction_sites_in_dna(dna_seq: str, sites_to_avoid: List[str], max_attempts: int = 100) -> tuple[str, List[str]]:
+    return codon_analytics.translate([dna_seq])[0]
+
+def is_windowed(protein: str) -> bool:
+    """Whether predict_batch splits this protein (plus its stop token) into windows"""
+    window = WINDOW_SIZE if 0 < WINDOW_SIZE <= MAX_WINDOW_TOKENS else MAX_WINDOW_TOKENS
+    return len("".join(protein.split()).rstrip("*_")) + 1 > window
+
+def translation_warning(protein: str, dna_sequences: List[str]) -> Optional[str]:
+    """Warning text if any sequence does not translate back to the protein (stop codon ignored)"""
+    expected = "".join(protein.split()).upper().rstrip("*_")
+    mismatched = [i + 1 for i, dna in enumerate(dna_sequences) if translate_dna(dna).rstrip("*") != expected]
+    if not mismatched:
+        return None
+    return f"Sequence(s) {', '.join(map(str, mismatched))} do not translate back to the input protein"
+
+def sequence_metrics(dna_sequences: List[str]) -> List[Dict[str, Any]]:
+    """GC content, GC window extremes and CAI for each returned sequence"""
+    return [
+        {key: value for key, value in entry.items() if key != "protein"}
+        for entry in codon_analytics.analyze(dna_sequences, CAI_WEIGHTS)
+    ]
+
+def avoid_restriction_sites_in_dna(
+    dna_seq: str,
+    sites_to_avoid: List[str],
+    change_costs: Optional[Dict[str, float]] = None,
+) -> tuple[str, List[str]]:
     """
-    Attempt to remove restriction sites from DNA sequence by changing synonymous codons.
+    Remove restriction sites from DNA sequence by changing synonymous codons.
+    Uses a deterministic minimum-change repair (optionally weighted per codon via
+    change_costs); sites are only left in place when no synonymous recoding removes them.
     Returns (modified_sequence, list_of_avoided_sites)
     """
-    # First check if there are any sites to avoid
-    found_sites = check_restriction_sites(dna_seq, sites_to_avoid)
-    if not found_sites:
+    names = known_sites(sites_to_avoid)
+    if not names:
+        return dna_seq, sites_to_avoid
+
+    scanner = site_scanner(names)
+    tracker = scanner.tracker(dna_seq)
+    if not tracker.present():
         return dna_seq, sites_to_avoid  # No sites found, return original
 
     # Translate to protein to maintain amino acid sequence
     original_protein = translate_dna(dna_seq)
 
-    # Try to modify codons to avoid restriction sites
-    modified_seq = dna_seq
-    attempts = 0
+    repair = repair_sites(scanner, dna_seq, SYNONYMOUS_CODONS, change_costs)
+    modified_seq = repair.sequence
 
-    while attempts < max_attempts:
-        # Check which sites are still present
-        remaining_sites = check_restriction_sites(modified_seq, sites_to_avoid)
-        if not remaining_sites:
-            break  # Success! All sites avoided
+    # Replay the changed codons on the tracker: an independent check of the repair
+    # that only rescans around each edit
+    for pos in range(0, len(modified_seq) - 2, 3):
+        if modified_seq[pos:pos + 3] != dna_seq[pos:pos + 3]:
+            tracker.replace(pos, modified_seq[pos:pos + 3])
 
-        # Find positions where restriction sites occur
-        site_positions = []
-        for site_name in remaining_sites:
-            site_seq = RESTRICTION_SITES[site_name]
-            site_rc = reverse_complement(site_seq)
+    # Verify protein sequence is unchanged
+    final_protein = translate_dna(modified_seq)
+    if final_protein != original_protein:
+        # If protein changed, return original sequence
+        print(f"Warning: Protein sequence changed during restriction site avoidance, reverting")
+        return dna_seq, []
 
-            # Find all occurrences
-            for i in range(len(modified_seq) - len(site_seq) + 1):
-                if modified_seq[i:i+len(site_seq)] in (site_seq, site_rc):
-                    site_positions.append(i)
+    # Return modified sequence and list of successfully avoided sites
+    still_present = set(tracker.present())
+    if bool(still_present) != bool(repair.remaining_hits):
+        print(f"Warning: restriction site repair reported {repair.remaining_hits} remaining hit(s), rescan found {len(tracker.hits())}")
+    avoided = [site for site in sites_to_avoid if site not in still_present]
 
-        if not site_positions:
-            break
+    return modified_seq, avoided
 
-        # Try to modify codons around restriction sites
-        # Pick a random site position to modify
-        pos = random.choice(site_positions)
+def get_organism_index() -> OrganismIndex:
+    """The organism index, built on first use (normally while the model loads)"""
+    global organism_index
+    with organism_index_lock:
+        if organism_index is None:
+            from CodonTransformer.CodonUtils import ORGANISM2ID
+            organism_index = OrganismIndex(ORGANISM2ID)
+    return organism_index
 
-        # Find which codons overlap with this position
-        codon_start = (pos // 3) * 3
-        codon_end = min(codon_start + 9, len(modified_seq))  # Check 3 codons
+@contextmanager
+def startup_phase(name: str):
+    """Record the wall time of one startup phase"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        startup_timings[name] = time.perf_counter() - start
 
-        # Try changing one of the codons in this region
-        changed = False
-        for codon_pos in range(codon_start, codon_end, 3):
-            if codon_pos + 3 > len(modified_seq):
-                break
+def load_model_blocking():
+    """Import, load and warm up the model (runs in a worker thread)"""
+    # Forked workers inherit weights the parent already loaded and only warm up
+    if backend is None:
+        load_weights_blocking()
 
-            original_codon = modified_seq[codon_pos:codon_pos+3]
-            aa = GENETIC_CODE.get(original_codon, 'X')
+    import torch
+    from CodonTransformer.CodonPrediction import validate_and_convert_organism
 
-            if aa == 'X' or aa == '*':
-                continue
+    if TORCH_THREADS > 0:
+        torch.set_num_threads(TORCH_THREADS)
 
-            # Try alternative codons for this amino acid
-            alternative_codons = [c for c in AA_TO_CODONS.get(aa, []) if c != original_codon]
-            if not alternative_codons:
-                continue
+    with startup_phase("warmup"):
+        organism_id, organism_name = validate_and_convert_organism(WARMUP_ORGANISM)
+        predict_batch(backend, tokenizer, [InferenceItem(WARMUP_PROTEIN, organism_id, organism_name)])
 
-            # Try each alternative
-            for alt_codon in alternative_codons:
-                test_seq = modified_seq[:codon_pos] + alt_codon + modified_seq[codon_pos+3:]
+def load_weights_blocking():
+    """Import torch and the model, then load the tokenizer and backend without running them"""
+    global model, tokenizer, device, backend, model_revision, cuda_available, attention_policy, model_config
 
-                # Check if this reduces restriction sites
-                test_sites = check_restriction_sites(test_seq, sites_to_avoid)
-                if len(test_sites) < len(remaining_sites):
-                    modified_seq = test_seq
-                    changed = True
-                    break
+    if MODEL_DIR:
+        # Serving from a local directory must never fall back to the network
+        os.environ["HF_HUB_OFFLINE"] = "1"
+        os.environ["TRANSFORMERS_OFFLINE"] = "1"
+    source = MODEL_DIR or MODEL_ID
 
-            if changed:
-                break
+    with startup_phase("imports"):
+        import torch
+        from transformers import AutoTokenizer, BigBirdForMaskedLM
+        import CodonTransformer.CodonPrediction  # noqa: F401 (organism validation)
+        import CodonTransformer.CodonJupyter  # noqa: F401 (used when formatting responses)
 
-        if not changed:
-            # If we couldn't make progress, stop trying
-            break
+    with startup_phase("organism_index"):
+        get_organism_index()
 
-        attempts += 1
+    cuda_available = torch.cuda.is_available()
+    device = torch.device("cuda" if cuda_available else "cpu")
 
-    # Verify protein sequence is unchanged
-    final_protein = translate_dna(modified_seq)
-    if final_protein != original_protein:
-        # If protein changed, return original sequence
-        print(f"Warning: Protein sequence changed during restriction site avoidance, reverting")
-        return dna_seq, []
+    with startup_phase("tokenizer"):
+        loaded_tokenizer = AutoTokenizer.from_pretrained(source, local_files_only=bool(MODEL_DIR))
 
-    # Return modified sequence and list of successfully avoided sites
-    still_present = check_restriction_sites(modified_seq, sites_to_avoid)
-    avoided = [site for site in sites_to_avoid if site not in still_present]
+    if INFERENCE_BACKEND == "onnx":
+        # The exported graph carries its own weights; no PyTorch model is needed
+        with startup_phase("weights"):
+            loaded = load_backend("onnx", onnx_path=ONNX_PATH)
+    else:
+        with startup_phase("weights"):
+            # low_cpu_mem_usage maps safetensors weights straight into the model
+            # instead of initializing it and copying a second set of tensors in
+            weights = BigBirdForMaskedLM.from_pretrained(
+                source,
+                local_files_only=bool(MODEL_DIR),
+                use_safetensors=True if MODEL_DIR else None,
+                low_cpu_mem_usage=True,
+            )
+            weights.bert.set_attention_type("original_full")
+            weights.eval()
+        model_config = weights.config
+        if PRECISION != "float32":
+            if INFERENCE_BACKEND == "eager":
+                with startup_phase("precision"):
+                    weights = weights.to(getattr(torch, PRECISION))
+            else:
+                print(f"Warning: --precision {PRECISION} only applies to the eager backend; ignoring it")
+        if IDLE_UNLOAD_SECONDS > 0:
+            with startup_phase("snapshot"):
+                save_snapshot(weights, snapshot_path(weights.config))
+        with startup_phase("device_transfer"):
+            loaded = load_backend(INFERENCE_BACKEND, weights.to(device), device)
+        model = loaded.model
+    device = getattr(loaded, "device", torch.device("cpu"))
 
-    return modified_seq, avoided
+    # The exported ONNX graph is fixed to full attention
+    if INFERENCE_BACKEND != "onnx":
+        attention_policy = AttentionPolicy.load(ATTENTION_MODE, ATTENTION_THRESHOLD, ATTENTION_CALIBRATION)
+
+    tokenizer = loaded_tokenizer
+    backend = loaded
+    # Backends and precisions can differ slightly, so cached results are tied to them too
+    model_revision = f"{backend.revision or MODEL_ID}+{backend.name}"
+    if INFERENCE_BACKEND == "eager" and PRECISION != "float32":
+        model_revision += f"+{PRECISION}"
+    # So do the windows long proteins are split into and stitched back from
+    model_revision += f"+window{min(WINDOW_SIZE, MAX_WINDOW_TOKENS) or MAX_WINDOW_TOKENS}/{WINDOW_OVERLAP}"
+    # block_sparse and original_full attention give different logits
+    if attention_policy is not None:
+        model_revision += f"+attention:{attention_policy.describe()}"
+
+def snapshot_path(config) -> str:
+    """Weights snapshot for this model revision and precision"""
+    revision = getattr(config, "_commit_hash", None) or os.path.basename(os.path.normpath(MODEL_DIR or MODEL_ID))
+    precision = PRECISION if INFERENCE_BACKEND == "eager" else "float32"
+    return os.path.join(SNAPSHOT_DIR, f"{revision}-{precision}.pt")
+
+def snapshot_bytes() -> Optional[int]:
+    """Expected resident size of the weights, for the memory budget (None when unknown)"""
+    if INFERENCE_BACKEND == "onnx":
+        return os.path.getsize(ONNX_PATH) if os.path.exists(ONNX_PATH) else None
+    if model_config is None:
+        return None
+    path = snapshot_path(model_config)
+    return os.path.getsize(path) if os.path.exists(path) else None
+
+def reload_weights_blocking():
+    """Rebuild the backend after an idle unload, memory-mapping the weights snapshot when there is one"""
+    global model, backend
+    if INFERENCE_BACKEND == "onnx":
+        backend = load_backend("onnx", onnx_path=ONNX_PATH)
+        return
+    if model_config is None or not os.path.exists(snapshot_path(model_config)):
+        load_weights_blocking()
+        return
+
+    from transformers import BigBirdForMaskedLM
+
+    weights = load_snapshot(BigBirdForMaskedLM, model_config, snapshot_path(model_config))
+    weights.bert.set_attention_type("original_full")
+    loaded = load_backend(INFERENCE_BACKEND, weights.to(device), device)
+    model = loaded.model
+    backend = loaded
+
+def unload_weights_blocking():
+    """Drop every reference to the weights; the tokenizer (a few MB) stays loaded"""
+    global model, backend
+    model = None
+    backend = None
 
 @app.on_event("startup")
-async def load_model():
-    """Load the model and tokenizer on server startup"""
-    global model, tokenizer, device
+async def start_model_loading():
+    """Start loading the model in the background so liveness probes answer immediately"""
+    global loader_task
+    loader_task = asyncio.create_task(load_model())
 
-    print("Loading CodonTransformer model...")
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    print(f"Using device: {device}")
+async def load_model():
+    """Load the model and tokenizer, then open the server for inference"""
+    global batcher, result_cache, job_store, job_scheduler, model_ready, startup_error, lifecycle
 
+    print(f"Loading CodonTransformer model from {MODEL_DIR or MODEL_ID}...")
+    started = time.perf_counter()
     try:
-        tokenizer = AutoTokenizer.from_pretrained("adibvafa/CodonTransformer")
-        model = BigBirdForMaskedLM.from_pretrained("adibvafa/CodonTransformer").to(device)
-        print("Model loaded successfully!")
+        await run_in_threadpool(load_model_blocking)
     except Exception as e:
+        startup_error = str(e)
         print(f"Error loading model: {e}")
-        raise
+        return
+    print(f"Using device: {device}")
+    print(f"Model loaded successfully! (backend: {backend.name})")
+
+    lifecycle = ModelLifecycle(
+        reload_weights_blocking,
+        unload_weights_blocking,
+        idle_seconds=IDLE_UNLOAD_SECONDS,
+        memory_budget_bytes=int(MEMORY_BUDGET_MB * 2**20),
+        estimate_bytes=snapshot_bytes,
+    )
+    lifecycle.mark_loaded(startup_timings.get("weights"))
+    lifecycle.start()
+    rss = process_rss_bytes()
+    print(f"Precision: {PRECISION if INFERENCE_BACKEND == 'eager' else 'float32'}, resident memory: "
+          + (f"{rss / 2**20:.0f} MB" if rss else "unknown")
+          + (f", budget {MEMORY_BUDGET_MB:g} MB" if MEMORY_BUDGET_MB > 0 else "")
+          + (f", unloaded after {IDLE_UNLOAD_SECONDS:g} s idle" if IDLE_UNLOAD_SECONDS > 0 else ""))
+    if lifecycle.over_budget():
+        print("Warning: resident memory is already over the budget; the model unloads as soon as it is idle")
+
+    batcher = InferenceBatcher(
+        run_inference_batch,
+        max_batch_size=MAX_BATCH_SIZE,
+        max_wait_ms=MAX_BATCH_WAIT_MS,
+        concurrency=INFERENCE_SLOTS,
+        max_queue_size=MAX_QUEUE_SIZE,
+    )
+    batcher.start()
+    print(f"Inference batching: up to {MAX_BATCH_SIZE} requests, {MAX_BATCH_WAIT_MS:g} ms max wait")
+    print(f"Inference slots: {INFERENCE_SLOTS}, queue limit: {MAX_QUEUE_SIZE}")
+    if attention_policy is not None:
+        print(f"Attention: {attention_policy.describe()}")
+    print(f"Long proteins: windows of {min(WINDOW_SIZE, MAX_WINDOW_TOKENS) or MAX_WINDOW_TOKENS} tokens, {WINDOW_OVERLAP} overlap")
+
+    if CACHE_SIZE > 0:
+        result_cache = ResultCache(max_entries=CACHE_SIZE, ttl_seconds=CACHE_TTL, db_path=CACHE_DB or None)
+        print(f"Result cache: {CACHE_SIZE} entries in memory" + (f", persisted to {CACHE_DB}" if CACHE_DB else ""))
+
+    if JOBS_DB:
+        os.makedirs(os.path.dirname(os.path.abspath(JOBS_DB)), exist_ok=True)
+    job_store = JobStore(JOBS_DB)
+    purged = job_store.purge(time.time() - JOBS_RETENTION_DAYS * 86400)
+    job_scheduler = JobScheduler(
+        job_store, run_job_record, concurrency=JOBS_CONCURRENCY or MAX_BATCH_SIZE * INFERENCE_SLOTS,
+    )
+    # Workers sharing the store only resume jobs whose owner has stopped sending heartbeats
+    job_scheduler.start()
+    print(f"Jobs: stored in {JOBS_DB or 'memory'}, {job_scheduler.concurrency} records in flight"
+          + (f", {purged} expired job(s) removed" if purged else ""))
+
+    startup_timings["total"] = time.perf_counter() - started
+    print("Startup timing breakdown:")
+    for phase, seconds in startup_timings.items():
+        print(f"  {phase:<16} {seconds * 1000:9.1f} ms")
+    model_ready = True
+
+@app.on_event("shutdown")
+async def stop_batcher():
+    """Stop the job and inference schedulers and close the result cache and job store"""
+    if loader_task is not None and not loader_task.done():
+        loader_task.cancel()
+    if lifecycle is not None:
+        lifecycle.stop()
+    if job_scheduler is not None:
+        await job_scheduler.stop()
+    if job_store is not None:
+        job_store.close()
+    if batcher is not None:
+        await batcher.stop()
+    if result_cache is not None:
+        result_cache.close()
+
+def run_inference_batch(items: List[InferenceItem]) -> list:
+    """Run one padded forward pass for a batch collected by the scheduler"""
+    BATCH_SIZE.observe(len(items))
+    # Reloads the weights first if they were unloaded while idle
+    with lifecycle.use() if lifecycle is not None else nullcontext():
+        # Windows of long proteins add rows; run at most MAX_BATCH_SIZE rows per forward pass
+        return predict_batch(
+            backend, tokenizer, items, window=WINDOW_SIZE, overlap=WINDOW_OVERLAP, max_rows=MAX_BATCH_SIZE,
+            attention_policy=attention_policy,
+        )
 
 @app.get("/")
 async def root():
@@ -237,43 +660,276 @@ async def root():
         "status": "running",
         "service": "CodonTransformer API",
         "device": str(device),
-        "model_loaded": model is not None
+        "model_loaded": model_ready
     }
 
 @app.get("/health")
 async def health_check():
-    """Detailed health check"""
+    """Liveness check with model details (use /ready for traffic gating)"""
     return {
         "status": "healthy",
-        "model_loaded": model is not None,
+        "worker": worker_index,
+        "pid": os.getpid(),
+        "model_loaded": model_ready,
         "tokenizer_loaded": tokenizer is not None,
+        "backend": backend.name if backend else None,
         "device": str(device),
-        "cuda_available": torch.cuda.is_available()
+        "precision": PRECISION if INFERENCE_BACKEND == "eager" else "float32",
+        "model_state": lifecycle.summary() if lifecycle else None,
+        "rss_bytes": process_rss_bytes(),
+        "cuda_available": cuda_available,
+        "queue_depth": batcher.queue_depth if batcher else 0,
+        "in_flight": batcher.in_flight if batcher else 0,
+        "fallback_tables": TABLE_ENGINE.organisms,
     }
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe: 200 only once the model is loaded and warmed up"""
+    timings = {phase: round(seconds * 1000, 1) for phase, seconds in startup_timings.items()}
+    if not model_ready:
+        return JSONResponse(
+            status_code=503,
+            content={"ready": False, "error": startup_error, "startup_timings_ms": timings},
+        )
+    return {"ready": True, "startup_timings_ms": timings}
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus text-format metrics"""
+    return Response(content=METRICS.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.post("/optimize", response_model=OptimizationResponse)
-async def optimize_codon(request: OptimizationRequest):
+async def optimize_codon(request: OptimizationRequest, response: Response):
     """
-    Optimize codon usage for a protein sequence
+    Optimize codon usage for a protein sequence.
+    The Server-Timing response header breaks the latency down per stage.
+    With engine="auto", requests are answered from the codon usage tables
+    (engine "table:<strategy>" in the response) while the model is loading,
+    its queue wait exceeds the fallback budget, or the queue is full.
     """
-    if model is None or tokenizer is None:
-        raise HTTPException(status_code=503, detail="Model not loaded")
+    timings: Dict[str, float] = {}
+    table = table_for_request(request) if request.engine != "model" else None
+    if table is not None and request.engine == "auto" and lifecycle is not None and lifecycle.state == "unloaded":
+        # Requests answered from the tables would otherwise never bring an unloaded model back
+        lifecycle.load_in_background()
+    use_table, reason = False, None
+    if request.engine == "table":
+        if table is None:
+            raise HTTPException(status_code=400, detail=f"No codon usage table for organism {request.organism}")
+        use_table = True
+    elif table is not None and not model_ready:
+        use_table, reason = True, "the model is still loading"
+    elif table is not None and model_queue_too_long():
+        use_table, reason = True, "the model queue is too long"
+    elif table is not None and lifecycle is not None and lifecycle.state != "loaded" and not lifecycle.can_load():
+        use_table, reason = True, "the model is unloaded and over the memory budget"
+
+    # Back-translation, ranking and site repair are CPU-bound, and this path is taken under load
+    if use_table:
+        result = await run_in_threadpool(run_table_optimization, request, table, timings, reason=reason)
+    else:
+        if not model_ready:
+            raise HTTPException(status_code=503, detail="Model not loaded")
+        try:
+            result = await run_optimization(request, timings=timings)
+        except QueueFullError as e:
+            if table is None:
+                OPTIMIZATIONS.inc("overloaded")
+                raise HTTPException(
+                    status_code=503,
+                    detail="Inference queue is full, please retry later",
+                    headers={"Retry-After": str(math.ceil(e.retry_after))},
+                )
+            timings.clear()
+            result = await run_in_threadpool(run_table_optimization, request, table, timings, reason="the model queue is full")
+    response.headers["Server-Timing"] = server_timing(timings)
+    return result
 
+def table_for_request(request: OptimizationRequest) -> Optional[CodonUsageTable]:
+    """Codon usage table for the request's organism (IDs resolve once the organism index is built)"""
+    organism = request.organism
+    if isinstance(organism, int) or str(organism).isdigit():
+        organism = organism_index.name(int(organism)) if organism_index else None
+    return TABLE_ENGINE.table_for(organism) if organism else None
+
+def model_queue_too_long() -> bool:
+    """
+    Whether the expected model queue wait exceeds the fallback budget. A reload
+    after an idle unload is left out: the first request pays it rather than
+    being downgraded to the tables.
+    """
+    if FALLBACK_WAIT_MS <= 0 or batcher is None:
+        return False
+    return batcher.estimated_wait() * 1000 > FALLBACK_WAIT_MS
+
+
+def run_table_optimization(
+    request: OptimizationRequest,
+    table: CodonUsageTable,
+    timings: Dict[str, float],
+    reason: Optional[str] = None,
+) -> OptimizationResponse:
+    """
+    Back-translate from a codon usage table, then post-process like a model
+    result (best_of ranking, restriction sites, metrics). reason, if given, is
+    why the model was skipped and is reported in the warning.
+    """
+    started = time.perf_counter()
+    sampled = not request.deterministic or request.best_of
+    strategy = request.table_strategy or ("weighted_random" if sampled else "max_cai")
+    count = max(request.best_of, request.num_sequences) if strategy == "weighted_random" else 1
     try:
-        # Predict DNA sequence(s)
-        result = predict_dna_sequence(
-            protein=request.protein,
-            organism=request.organism,
-            device=device,
-            tokenizer=tokenizer,
-            model=model,
-            attention_type="original_full",
-            deterministic=request.deterministic,
-            temperature=request.temperature,
-            top_p=request.top_p,
-            num_sequences=request.num_sequences
-        )
+        with timed(timings, "table"):
+            sequences = TABLE_ENGINE.optimize([request.protein] * count, table, strategy)
+    except ValueError as e:
+        response = optimization_error(e)
+    else:
+        if request.unique_sequences:
+            sequences = list(dict.fromkeys(sequences))
+        elif count == 1:
+            sequences = sequences * request.num_sequences
+        predictions = [TablePrediction(table.organism, request.protein, dna, strategy) for dna in sequences]
+        result = predictions if request.best_of or request.num_sequences > 1 else predictions[0]
+        response = build_optimization_response(request, result, timings)
+        if reason and response.success:
+            note = f"Answered from the {table.organism} codon usage table ({strategy}) because {reason}"
+            response.warning = f"{response.warning}; {note}" if response.warning else note
+    timings["total"] = time.perf_counter() - started
+    record_optimization(response, timings)
+    return response
+
+def record_optimization(response: OptimizationResponse, timings: Dict[str, float]):
+    """Feed one finished optimization into the outcome counter and stage histograms"""
+    if not response.success:
+        outcome = "failed"
+    elif (response.engine or "").startswith("table"):
+        outcome = "fallback"
+    elif "forward" not in timings:
+        outcome = "cached"
+    else:
+        outcome = "success"
+    OPTIMIZATIONS.inc(outcome)
+    for stage, seconds in timings.items():
+        STAGE_SECONDS.observe(seconds, stage)
+
+async def run_optimization(
+    request: OptimizationRequest,
+    block: bool = False,
+    timings: Optional[Dict[str, float]] = None,
+    background: bool = False,
+) -> OptimizationResponse:
+    """
+    Predict and post-process one request, serving deterministic requests from the cache.
+    Raises QueueFullError when the scheduler is saturated and block is False.
+    Per-stage seconds are added to timings (including "total") and recorded in the metrics.
+    Background requests (bulk work) yield to interactive ones in the scheduler.
+    """
+    timings = {} if timings is None else timings
+    started = time.perf_counter()
+    response = await optimize_request(request, block, timings, background)
+    timings["total"] = time.perf_counter() - started
+    record_optimization(response, timings)
+    return response
+
+async def optimize_request(
+    request: OptimizationRequest,
+    block: bool,
+    timings: Dict[str, float],
+    background: bool = False,
+) -> OptimizationResponse:
+    """Cache lookup, prediction and post-processing for one request"""
+    from CodonTransformer.CodonPrediction import validate_and_convert_organism
 
+    try:
+        organism_id, organism_name = validate_and_convert_organism(request.organism)
+        if request.best_of:
+            resolve_objective(request.objective)
+    except Exception as e:
+        return optimization_error(e)
+
+    # best_of draws its whole candidate pool from one forward pass
+    item = InferenceItem(
+        protein=request.protein,
+        organism_id=organism_id,
+        organism_name=organism_name,
+        deterministic=request.deterministic and not request.best_of,
+        temperature=request.temperature,
+        top_p=request.top_p,
+        num_sequences=max(request.best_of, request.num_sequences),
+        unique=request.unique_sequences,
+        background=background,
+    )
+    if result_cache is None or not item.deterministic:
+        return await predict_and_build(request, item, block, timings)
+
+    async def compute() -> Dict[str, Any]:
+        return jsonable_encoder(await predict_and_build(request, item, block, timings))
+
+    cached = await result_cache.get_or_compute(
+        request_cache_key(request, organism_id),
+        compute,
+        store_if=lambda value: value.get("success", False),
+    )
+    # The key is normalized, so echo this caller's protein exactly as sent
+    return OptimizationResponse(**{**cached, "protein": request.protein})
+
+async def predict_and_build(
+    request: OptimizationRequest,
+    item: InferenceItem,
+    block: bool,
+    timings: Dict[str, float],
+) -> OptimizationResponse:
+    """Run one item through the scheduler and build its response"""
+    try:
+        # Predict DNA sequence(s), batched with any concurrent requests
+        result = await batcher.submit(item, block=block)
+    except QueueFullError:
+        raise
+    except Exception as e:
+        return optimization_error(e)
+    finally:
+        timings.update(item.timings)
+
+    # Restriction site avoidance and formatting are CPU-bound as well
+    return await run_in_threadpool(build_optimization_response, request, result, timings)
+
+def request_cache_key(request: OptimizationRequest, organism_id: int) -> str:
+    """Cache key for a deterministic request: normalized inputs plus model revision"""
+    fields = {
+        "protein": "".join(request.protein.split()).upper(),
+        "organism_id": organism_id,
+        "num_sequences": request.num_sequences,
+        "unique_sequences": request.unique_sequences,
+        "avoid_restriction_sites": sorted(set(request.avoid_restriction_sites)),
+    }
+    return make_cache_key(fields, model_revision)
+
+def optimization_error(e: Exception) -> OptimizationResponse:
+    """Log an optimization failure and wrap it in a response"""
+    import traceback
+    error_details = traceback.format_exc()
+    print(f"Error during optimization: {error_details}")
+
+    return OptimizationResponse(
+        success=False,
+        error=f"{str(e)}"
+    )
+
+def build_optimization_response(
+    request: OptimizationRequest,
+    result,
+    timings: Optional[Dict[str, float]] = None,
+) -> OptimizationResponse:
+    """Post-process model predictions into an OptimizationResponse, timing each stage"""
+    timings = {} if timings is None else timings
+
+    candidates_evaluated = candidate_scores = None
+    if request.best_of and isinstance(result, list):
+        with timed(timings, "ranking"):
+            result, candidates_evaluated, candidate_scores = rank_result(request, result)
+
+    try:
         # Get organism name from result if available
         organism_name = None
         if hasattr(result, 'organism'):
@@ -302,10 +958,11 @@ async def optimize_codon(request: OptimizationRequest):
             if request.avoid_restriction_sites:
                 print(f"Attempting to avoid restriction sites: {request.avoid_restriction_sites}")
                 modified_sequences = []
-                for dna_seq in dna_sequences:
-                    modified_seq, avoided = avoid_restriction_sites_in_dna(dna_seq, request.avoid_restriction_sites)
-                    modified_sequences.append(modified_seq)
-                    avoided_sites = avoided  # Use the avoided sites from the first sequence
+                with timed(timings, "restriction_sites"):
+                    for dna_seq in dna_sequences:
+                        modified_seq, avoided = avoid_restriction_sites_in_dna(dna_seq, request.avoid_restriction_sites)
+                        modified_sequences.append(modified_seq)
+                        avoided_sites = avoided  # Use the avoided sites from the first sequence
 
                 dna_sequences = modified_sequences
 
@@ -316,22 +973,40 @@ async def optimize_codon(request: OptimizationRequest):
                 else:
                     print(f"Successfully avoided all {len(avoided_sites)} restriction sites")
 
+            # Windowed predictions are stitched together, so confirm they still encode the protein
+            if is_windowed(request.protein):
+                mismatch = translation_warning(request.protein, dna_sequences)
+                if mismatch:
+                    warning_msg = f"{warning_msg}; {mismatch}" if warning_msg else mismatch
+
+            if request.unique_sequences and len(dna_sequences) < request.num_sequences:
+                shortfall = f"Only {len(dna_sequences)} of {request.num_sequences} sampled sequences were distinct"
+                warning_msg = f"{warning_msg}; {shortfall}" if warning_msg else shortfall
+
             # Try to format output
             try:
-                formatted = "\n\n".join([format_model_output(r) for r in result])
+                with timed(timings, "format"):
+                    formatted = format_predictions(result)
             except Exception as format_error:
                 print(f"Warning: Could not format output: {format_error}")
                 formatted = None
 
+            with timed(timings, "metrics"):
+                metrics = sequence_metrics(dna_sequences)
+
             return OptimizationResponse(
                 success=True,
+                metrics=metrics,
                 sequences=dna_sequences,
                 dna_sequence=dna_sequences[0] if dna_sequences else None,
                 organism=organism_name,
                 protein=request.protein,  # Use the input protein
                 formatted_output=formatted,
                 restriction_sites_avoided=avoided_sites if avoided_sites else None,
-                warning=warning_msg
+                warning=warning_msg,
+                candidates_evaluated=candidates_evaluated,
+                candidate_scores=candidate_scores,
+                engine=result_engine(result),
             )
         else:
             # Single sequence returned
@@ -349,7 +1024,8 @@ async def optimize_codon(request: OptimizationRequest):
             warning_msg = None
             if request.avoid_restriction_sites and dna_seq:
                 print(f"Attempting to avoid restriction sites: {request.avoid_restriction_sites}")
-                dna_seq, avoided_sites = avoid_restriction_sites_in_dna(dna_seq, request.avoid_restriction_sites)
+                with timed(timings, "restriction_sites"):
+                    dna_seq, avoided_sites = avoid_restriction_sites_in_dna(dna_seq, request.avoid_restriction_sites)
 
                 # Check if all sites were avoided
                 still_present = check_restriction_sites(dna_seq, request.avoid_restriction_sites)
@@ -358,77 +1034,573 @@ async def optimize_codon(request: OptimizationRequest):
                 else:
                     print(f"Successfully avoided all {len(avoided_sites)} restriction sites")
 
+            # Windowed predictions are stitched together, so confirm they still encode the protein
+            if dna_seq and is_windowed(request.protein):
+                mismatch = translation_warning(request.protein, [dna_seq])
+                if mismatch:
+                    warning_msg = f"{warning_msg}; {mismatch}" if warning_msg else mismatch
+
             # Try to format output
             try:
-                formatted = format_model_output(result)
+                with timed(timings, "format"):
+                    formatted = format_predictions([result])
             except Exception as format_error:
                 print(f"Warning: Could not format output: {format_error}")
                 formatted = None
 
+            with timed(timings, "metrics"):
+                metrics = sequence_metrics([dna_seq]) if dna_seq else None
+
             return OptimizationResponse(
                 success=True,
+                metrics=metrics,
                 dna_sequence=dna_seq,
                 organism=organism_name,
                 protein=request.protein,  # Use the input protein
                 formatted_output=formatted,
                 restriction_sites_avoided=avoided_sites if avoided_sites else None,
-                warning=warning_msg
+                warning=warning_msg,
+                candidates_evaluated=candidates_evaluated,
+                candidate_scores=candidate_scores,
+                engine=result_engine(result),
             )
 
     except Exception as e:
-        import traceback
-        error_details = traceback.format_exc()
-        print(f"Error during optimization: {error_details}")
+        return optimization_error(e)
 
-        return OptimizationResponse(
-            success=False,
-            error=f"{str(e)}"
-        )
+def format_predictions(predictions: list) -> Optional[str]:
+    """CodonTransformer's text rendering of model predictions (table-engine output has none)"""
+    if not predictions or isinstance(predictions[0], TablePrediction):
+        return None
+    from CodonTransformer.CodonJupyter import format_model_output
+    return "\n\n".join(format_model_output(prediction) for prediction in predictions)
+
+def result_engine(result) -> str:
+    """Engine that produced a result: "model", or "table:<strategy>" for the codon usage tables"""
+    first = result[0] if isinstance(result, list) and result else result
+    return f"table:{first.strategy}" if isinstance(first, TablePrediction) else "model"
+
+def rank_result(request: OptimizationRequest, result: list) -> Tuple[Any, int, List[Dict[str, Any]]]:
+    """
+    Keep the best num_sequences predictions of a best_of pool.
+    Returns (the kept prediction(s), distinct candidates scored, their scores);
+    scores describe the sampled sequences, before any restriction site repair.
+    """
+    ranked_count, ranked = rank_candidates(
+        [prediction.predicted_dna for prediction in result],
+        request.num_sequences,
+        resolve_objective(request.objective),
+        cai_weights=CAI_WEIGHTS,
+        site_motifs=site_motifs(known_sites(request.avoid_restriction_sites)),
+    )
+    kept = [result[index] for index, _ in ranked]
+    scores = [entry for _, entry in ranked]
+    return (kept[0] if request.num_sequences == 1 else kept), ranked_count, scores
+
+@app.post("/optimize/batch")
+async def optimize_batch(
+    http_request: Request,
+    organism: Optional[str] = Query(None, description="Target organism for FASTA input"),
+    deterministic: bool = True,
+    temperature: float = 0.2,
+    top_p: float = 0.95,
+    num_sequences: int = 1,
+    unique_sequences: bool = False,
+    avoid_restriction_sites: List[str] = Query([]),
+    debug_timings: bool = Query(False, description="Add a per-stage timings_ms breakdown to every line"),
+):
+    """
+    Optimize many proteins in one call.
+
+    Accepts either a JSON list of optimization requests (each may carry an
+    "id") or a multi-FASTA body with the shared options as query parameters.
+    Both are parsed as the body arrives, so neither is held in memory; a
+    single JSON list element may be at most 1 MB.
+    Results stream back as NDJSON in completion order, one line per record,
+    each tagged with the record id.
+    """
+    if not model_ready:
+        raise HTTPException(status_code=503, detail="Model not loaded")
+
+    if "json" in http_request.headers.get("content-type", ""):
+        items = aiter_json_list(http_request.stream())
+        try:
+            # Reading the first element rejects a body that is not a JSON list before streaming starts
+            first = [await items.__anext__()]
+        except StopAsyncIteration:
+            first = []
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"JSON body must be a list of optimization requests: {e}")
+        records = json_batch_records(first, items)
+    else:
+        if not organism:
+            raise HTTPException(status_code=400, detail="organism query parameter is required for FASTA input")
+        defaults = {
+            "organism": int(organism) if organism.isdigit() else organism,
+            "deterministic": deterministic,
+            "temperature": temperature,
+            "top_p": top_p,
+            "num_sequences": num_sequences,
+            "unique_sequences": unique_sequences,
+            "avoid_restriction_sites": avoid_restriction_sites,
+        }
+        records = fasta_batch_records(http_request.stream(), defaults)
+
+    return StreamingResponse(stream_batch_results(records, debug_timings), media_type="application/x-ndjson")
+
+async def json_batch_records(first: List[Any], rest: AsyncIterator[Any]) -> AsyncIterator[Tuple[str, Any]]:
+    """Yield (record_id, request fields) from a streamed JSON batch body whose first element was already read"""
+    async def items():
+        for item in first:
+            yield item
+        async for item in rest:
+            yield item
+
+    index = 0
+    async for item in items():
+        record_id = item.get("id") if isinstance(item, dict) else None
+        yield str(record_id if record_id is not None else index), item
+        index += 1
+
+async def fasta_batch_records(chunks, defaults: Dict[str, Any]) -> AsyncIterator[Tuple[str, Any]]:
+    """Yield (record_id, request fields) from a streamed multi-FASTA body"""
+    async for record_id, protein in aiter_fasta(chunks):
+        yield record_id, {**defaults, "protein": protein}
+
+async def stream_batch_results(records: AsyncIterator[Tuple[str, Any]], debug_timings: bool = False) -> AsyncIterator[str]:
+    """
+    Run batch records through the scheduler and yield NDJSON lines as they finish.
+    Only a bounded window of records is in flight, so memory stays flat.
+    """
+    window = max(1, MAX_BATCH_SIZE * INFERENCE_SLOTS * 2)
+
+    async def run_record(record_id: str, fields: Any) -> Tuple[str, OptimizationResponse, Dict[str, float]]:
+        timings: Dict[str, float] = {}
+        try:
+            request = OptimizationRequest(**fields) if isinstance(fields, dict) else None
+        except ValidationError as e:
+            return record_id, OptimizationResponse(success=False, error=str(e)), timings
+        if request is None:
+            return record_id, OptimizationResponse(success=False, error="Record must be a JSON object"), timings
+        return record_id, await run_optimization(request, block=True, timings=timings, background=True), timings
+
+    pending = set()
+    exhausted = False
+    try:
+        while pending or not exhausted:
+            while not exhausted and len(pending) < window:
+                try:
+                    record_id, fields = await records.__anext__()
+                except StopAsyncIteration:
+                    exhausted = True
+                    break
+                except ValueError as e:
+                    # A body that turns malformed after records were streamed ends the batch with an error line
+                    exhausted = True
+                    yield json.dumps({"id": None, "success": False, "error": f"Invalid batch body: {e}"}) + "\n"
+                    break
+                pending.add(asyncio.create_task(run_record(record_id, fields)))
+            if not pending:
+                break
+
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                record_id, response, timings = task.result()
+                line = {"id": record_id, **jsonable_encoder(response)}
+                if debug_timings:
+                    line["timings_ms"] = {stage: round(seconds * 1000, 3) for stage, seconds in timings.items()}
+                yield json.dumps(line) + "\n"
+    finally:
+        # Client went away or the stream failed: drop the remaining work
+        for task in pending:
+            task.cancel()
+
+async def run_job_record(fields: Dict[str, Any]) -> Tuple[bool, Dict[str, Any]]:
+    """Optimize one record of an asynchronous job (validated when the job was submitted)"""
+    response = await run_optimization(OptimizationRequest(**fields), block=True, background=True)
+    return response.success, jsonable_encoder(response)
+
+def client_key(http_request: Request, client_id: Optional[str]) -> str:
+    """Who a job belongs to for fair scheduling: the X-Client-Id header, else the peer address"""
+    if client_id:
+        return client_id[:128]
+    return http_request.client.host if http_request.client else "unknown"
+
+def get_job_or_404(job_id: str) -> Dict[str, Any]:
+    job = job_store.get(job_id) if job_store else None
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.post("/jobs", status_code=202)
+async def submit_job(
+    submission: JobSubmission,
+    http_request: Request,
+    x_client_id: Optional[str] = Header(None),
+):
+    """
+    Queue a list of optimization requests as one asynchronous job.
+    Returns the job id at once; poll GET /jobs/{id}, follow GET /jobs/{id}/events
+    and fetch GET /jobs/{id}/results. Jobs persist across restarts.
+    """
+    if not model_ready or job_scheduler is None:
+        raise HTTPException(status_code=503, detail="Model not loaded")
+    if not submission.requests:
+        raise HTTPException(status_code=400, detail="A job needs at least one request")
+
+    records = []
+    for index, fields in enumerate(submission.requests):
+        record_id = fields.get("id")
+        fields = {key: value for key, value in fields.items() if key != "id"}
+        try:
+            OptimizationRequest(**fields)
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail=f"Request {index}: {e}")
+        records.append((str(record_id if record_id is not None else index), fields))
+
+    return job_scheduler.submit(client_key(http_request, x_client_id), submission.priority, records)
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Job state and progress (done, succeeded and failed out of total records)"""
+    return get_job_or_404(job_id)
+
+@app.get("/jobs/{job_id}/results")
+async def get_job_results(
+    job_id: str,
+    offset: int = Query(0, ge=0, description="Number of finished records to skip"),
+    limit: int = Query(100, ge=1, le=1000, description="Maximum records to return"),
+):
+    """Finished records of a job in submission order (available while it is still running)"""
+    job = get_job_or_404(job_id)
+    results = job_store.results(job_id, offset=offset, limit=limit)
+    return {"job": job, "results": results, "count": len(results), "offset": offset, "limit": limit}
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """
+    Server-sent events for a job: "progress" with the job summary, "record"
+    as each record finishes, and a final "end" once the job is done
+    """
+    get_job_or_404(job_id)
+    return StreamingResponse(
+        stream_job_events(job_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+def sse_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def stream_job_events(job_id: str) -> AsyncIterator[str]:
+    """Replay the job's current state, then forward its events until it finishes"""
+    queue = job_scheduler.subscribe(job_id)
+    try:
+        job = job_store.get(job_id)
+        yield sse_event("progress", job)
+        # Jobs run by another worker process are followed by polling the shared store
+        while job is not None and job["status"] not in FINAL_STATES:
+            if job_scheduler.owns(job_id):
+                try:
+                    event, data = await asyncio.wait_for(queue.get(), timeout=15.0)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if event == "end":
+                    job = data
+                    break
+                yield sse_event(event, data)
+            else:
+                await asyncio.sleep(1.0)
+                latest = job_store.get(job_id)
+                if latest is not None and latest != job and latest["status"] not in FINAL_STATES:
+                    yield sse_event("progress", latest)
+                job = latest
+        if job is not None:
+            yield sse_event("end", job)
+    finally:
+        job_scheduler.unsubscribe(job_id, queue)
+
+@app.delete("/jobs/{job_id}")
+async def delete_job(job_id: str):
+    """Cancel a queued or running job (finished records are kept); delete a finished job and its results"""
+    job = get_job_or_404(job_id)
+    if job["status"] in FINAL_STATES:
+        job_store.delete(job_id)
+        return {"id": job_id, "deleted": True}
+    job_scheduler.cancel(job_id)
+    return job_store.get(job_id)
+
+@app.post("/analyze")
+async def analyze_sequences(request: AnalysisRequest):
+    """
+    GC content (global and sliding-window extremes), CAI against the
+    E. coli reference table, translation and optional codon counts
+    for a batch of DNA sequences
+    """
+    results = await run_in_threadpool(
+        codon_analytics.analyze,
+        request.sequences,
+        CAI_WEIGHTS,
+        request.window,
+        request.include_codon_counts,
+    )
+    return {"results": results, "count": len(results)}
+
+def require_admin(token: Optional[str]):
+    """Reject admin calls without the configured token (if one is set)"""
+    if ADMIN_TOKEN and token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Result cache hit/miss counters"""
+    if result_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **(await run_in_threadpool(result_cache.summary))}
+
+@app.delete("/cache")
+async def clear_cache(x_admin_token: Optional[str] = Header(None)):
+    """Drop every cached result"""
+    require_admin(x_admin_token)
+    if result_cache is None:
+        return {"removed": 0}
+    return {"removed": await run_in_threadpool(result_cache.clear)}
+
+@app.post("/cache/invalidate")
+async def invalidate_cache(request: OptimizationRequest, x_admin_token: Optional[str] = Header(None)):
+    """Drop the cached result for one request"""
+    require_admin(x_admin_token)
+    if result_cache is None:
+        return {"removed": False}
+    from CodonTransformer.CodonPrediction import validate_and_convert_organism
+
+    try:
+        organism_id, _ = validate_and_convert_organism(request.organism)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"removed": await run_in_threadpool(result_cache.invalidate, request_cache_key(request, organism_id))}
 
 @app.get("/organisms")
-async def list_organisms():
+async def list_organisms(if_none_match: Optional[str] = Header(None)):
     """
     List all supported organisms
     """
     try:
-        from CodonTransformer.CodonUtils import ORGANISM2ID
-        return {
-            "organisms": list(ORGANISM2ID.keys()),
-            "count": len(ORGANISM2ID)
-        }
+        index = organism_index or await run_in_threadpool(get_organism_index)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    headers = {"ETag": index.etag, "Cache-Control": "public, max-age=3600"}
+    if if_none_match and index.etag in (tag.strip() for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+    return Response(content=index.list_payload, media_type="application/json", headers=headers)
 
 @app.get("/organisms/search")
-async def search_organisms(query: str):
+async def search_organisms(
+    query: str,
+    limit: int = Query(50, ge=1, le=1000, description="Maximum matches to return"),
+    offset: int = Query(0, ge=0, description="Number of ranked matches to skip"),
+):
     """
-    Search for organisms by name
+    Search for organisms by name, best matches first (prefix, substring and typo-tolerant)
     """
     try:
-        from CodonTransformer.CodonUtils import ORGANISM2ID
-        query_lower = query.lower()
-        matches = {
-            name: idx for name, idx in ORGANISM2ID.items()
-            if query_lower in name.lower()
-        }
-        return {
-            "query": query,
-            "matches": matches,
-            "count": len(matches)
-        }
+        index = organism_index or await run_in_threadpool(get_organism_index)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    total, page = index.search(query, limit=limit, offset=offset)
+    return {
+        "query": query,
+        "matches": {match.name: match.id for match in page},
+        "scores": {match.name: match.score for match in page},
+        "count": len(page),
+        "total": total,
+        "limit": limit,
+        "offset": offset,
+    }
+
+def serve_workers(host: str, port: int, workers: int):
+    """
+    Load the weights once, then fork workers that share them copy-on-write.
+
+    Every worker accepts connections on one inherited listening socket and
+    runs its own scheduler and cache. The parent loads (and quantizes or
+    casts) the weights with a single intra-op thread and never runs the
+    model, so no OpenMP/intra-op thread pool exists at fork time; each worker
+    sizes its own with TORCH_THREADS. Workers that die are replaced from the
+    preloaded parent.
+    """
+    import gc
+    import signal
+    import socket
+
+    if INFERENCE_BACKEND == "onnx":
+        # ONNX Runtime sessions own thread pools that do not survive fork, so each worker builds its own
+        print("ONNX backend: every worker loads its own session")
+    elif IDLE_UNLOAD_SECONDS > 0:
+        # Weights the parent holds could never be freed; workers share the snapshot's page cache instead
+        print("Idle unload: every worker loads the model itself and reloads it from the shared snapshot")
+    else:
+        print(f"Preloading the model once for {workers} workers...")
+        import torch
+
+        # from_pretrained, quantize_dynamic and .to() would otherwise start a thread pool
+        # that forked children inherit in an unusable state
+        torch.set_num_threads(1)
+        load_weights_blocking()
+        if cuda_available:
+            raise SystemExit("Multi-worker mode shares CPU weights and cannot fork after CUDA is initialized")
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    # Objects that exist now are never scanned by the collector in the children,
+    # so it does not write to (and un-share) the pages that hold them
+    gc.freeze()
+
+    def spawn(index: int) -> int:
+        global worker_index
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            worker_index = index
+            server = uvicorn.Server(uvicorn.Config(app, log_level="info"))
+            asyncio.run(server.serve(sockets=[sock]))
+            os._exit(0)
+        return pid
+
+    children = {spawn(index): index for index in range(workers)}
+    print(f"Started {workers} workers with {TORCH_THREADS} torch threads each: {sorted(children)}")
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        index = children.pop(pid, None)
+        if index is not None and not stopping:
+            print(f"Worker {index} (pid {pid}) exited with status {status}, restarting")
+            children[spawn(index)] = index
+    sock.close()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CodonTransformer local API server")
+    parser.add_argument("--workers", type=int, default=WORKERS,
+                        help="Server processes; the model is loaded once and shared copy-on-write")
+    parser.add_argument("--threads", type=int, default=TORCH_THREADS,
+                        help="torch intra-op threads per process (default: cores divided by workers)")
+    parser.add_argument("--max-batch-size", type=int, default=MAX_BATCH_SIZE,
+                        help="Maximum number of requests per model forward pass")
+    parser.add_argument("--max-batch-wait-ms", type=float, default=MAX_BATCH_WAIT_MS,
+                        help="Maximum time a request waits for its batch to fill")
+    parser.add_argument("--inference-slots", type=int, default=INFERENCE_SLOTS,
+                        help="Number of batches that may run on the model concurrently")
+    parser.add_argument("--max-queue-size", type=int, default=MAX_QUEUE_SIZE,
+                        help="Requests allowed to wait for a slot before returning 503")
+    parser.add_argument("--cache-size", type=int, default=CACHE_SIZE,
+                        help="In-memory result cache entries (0 disables caching)")
+    parser.add_argument("--cache-ttl", type=float, default=CACHE_TTL,
+                        help="Seconds a cached result stays valid (0 = forever)")
+    parser.add_argument("--cache-db", default=CACHE_DB,
+                        help="SQLite file for a persistent cache tier")
+    parser.add_argument("--jobs-db", default=JOBS_DB,
+                        help="SQLite file holding asynchronous jobs and their results (empty = memory only)")
+    parser.add_argument("--jobs-concurrency", type=int, default=JOBS_CONCURRENCY,
+                        help="Job records in flight at once (0 = enough to fill every inference slot)")
+    parser.add_argument("--table-dir", default=CODON_TABLE_DIR,
+                        help="Directory of *_codon_usage.json tables for the model-free fallback engine")
+    parser.add_argument("--fallback-wait-ms", type=float, default=FALLBACK_WAIT_MS,
+                        help="Expected model queue wait beyond which engine=auto requests use the tables "
+                             "(0 = only while the model loads or the queue is full)")
+    parser.add_argument("--window-size", type=int, default=WINDOW_SIZE,
+                        help="Split proteins longer than this many tokens into overlapping windows "
+                             f"(0 = only beyond the model limit of {MAX_WINDOW_TOKENS})")
+    parser.add_argument("--window-overlap", type=int, default=WINDOW_OVERLAP,
+                        help="Tokens shared by neighbouring windows")
+    parser.add_argument("--attention", choices=ATTENTION_MODES, default=ATTENTION_MODE,
+                        help="BigBird attention: auto picks full or block_sparse per batch from its length")
+    parser.add_argument("--attention-threshold", type=int, default=ATTENTION_THRESHOLD,
+                        help="Tokens above which auto mode uses block_sparse when no calibration file exists "
+                             "(0 = full attention until calibrated)")
+    parser.add_argument("--attention-calibration", default=ATTENTION_CALIBRATION,
+                        help="Per-length-bucket results written by calibrate_attention.py")
+    parser.add_argument("--backend", choices=BACKENDS, default=INFERENCE_BACKEND,
+                        help="Inference backend: PyTorch eager, dynamic int8 quantized, or ONNX Runtime")
+    parser.add_argument("--onnx-path", default=ONNX_PATH,
+                        help="Exported model for the onnx backend (see export_codon_model.py)")
+    parser.add_argument("--model-dir", default=MODEL_DIR,
+                        help="Local model directory with safetensors weights (no network access)")
+    parser.add_argument("--precision", choices=PRECISIONS, default=PRECISION,
+                        help="CPU precision of the eager backend's weights")
+    parser.add_argument("--idle-unload", type=float, default=IDLE_UNLOAD_SECONDS,
+                        help="Unload the model after this many idle seconds and reload it on the next request (0 = never)")
+    parser.add_argument("--memory-budget-mb", type=float, default=MEMORY_BUDGET_MB,
+                        help="Resident memory the model may not push the process past (0 = no budget)")
+    parser.add_argument("--snapshot-dir", default=SNAPSHOT_DIR,
+                        help="Where memory-mappable weight snapshots for fast reloads are kept")
+    args = parser.parse_args()
+    WORKERS = max(1, args.workers)
+    TORCH_THREADS = args.threads or (max(1, (os.cpu_count() or 1) // WORKERS) if WORKERS > 1 else 0)
+    MAX_BATCH_SIZE = args.max_batch_size
+    MAX_BATCH_WAIT_MS = args.max_batch_wait_ms
+    INFERENCE_SLOTS = args.inference_slots
+    MAX_QUEUE_SIZE = args.max_queue_size
+    CACHE_SIZE = args.cache_size
+    CACHE_TTL = args.cache_ttl
+    CACHE_DB = args.cache_db
+    JOBS_DB = args.jobs_db
+    FALLBACK_WAIT_MS = args.fallback_wait_ms
+    if args.table_dir != CODON_TABLE_DIR:
+        CODON_TABLE_DIR = args.table_dir
+        TABLE_ENGINE = CodonTableEngine.load_directory(CODON_TABLE_DIR)
+    JOBS_CONCURRENCY = args.jobs_concurrency
+    WINDOW_SIZE = args.window_size
+    WINDOW_OVERLAP = args.window_overlap
+    ATTENTION_MODE = args.attention
+    ATTENTION_THRESHOLD = args.attention_threshold
+    ATTENTION_CALIBRATION = args.attention_calibration
+    INFERENCE_BACKEND = args.backend
+    ONNX_PATH = args.onnx_path
+    MODEL_DIR = args.model_dir
+    PRECISION = args.precision
+    IDLE_UNLOAD_SECONDS = args.idle_unload
+    MEMORY_BUDGET_MB = args.memory_budget_mb
+    SNAPSHOT_DIR = args.snapshot_dir
+
     print("Starting CodonTransformer API Server...")
-    print("The first startup will download the model (~1GB)")
-    print("Subsequent startups will be much faster")
+    if MODEL_DIR:
+        print(f"Serving the model from {MODEL_DIR} (offline)")
+    else:
+        print("The first startup will download the model (~1GB)")
+        print("Subsequent startups will be much faster")
+        print("Create a local copy for offline, faster starts: python scripts/export_codon_model.py --save-local DIR")
     print("\nOnce running, access the API at: http://localhost:8000")
     print("API documentation at: http://localhost:8000/docs")
 
-    uvicorn.run(
-        app,
-        host="127.0.0.1",  # Only accessible locally
-        port=8000,
-        log_level="info"
-    )
+    if WORKERS > 1:
+        serve_workers("127.0.0.1", 8000, WORKERS)  # Only accessible locally
+    else:
+        uvicorn.run(
+            app,
+            host="127.0.0.1",  # Only accessible locally
+            port=8000,
+            log_level="info"
+        )
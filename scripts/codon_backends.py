@@ -0,0 +1,181 @@
+"""
+Inference backends for the CodonTransformer model.
+
+Every backend turns a tokenized batch into CPU logits, so the batching and
+decoding code does not care which one is in use:
+
+    eager - the BigBirdForMaskedLM model as loaded (default)
+    int8  - PyTorch dynamic int8 quantization of the Linear layers (CPU only)
+    onnx  - an ONNX Runtime session over a model exported by export_codon_model.py
+
+The PyTorch backends can switch BigBird between full and block-sparse
+attention per forward pass; `AttentionPolicy` picks the mode from the padded
+input length, using the crossover measured by calibrate_attention.py.
+
+torch and onnxruntime are imported when a backend is built, not at import time.
+"""
+
+import json
+import os
+import threading
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    import torch
+
+BACKENDS = ("eager", "int8", "onnx")
+
+DEFAULT_ONNX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models", "codon_transformer.onnx")
+
+# Inputs the exported graph takes, in order
+ONNX_INPUTS = ("input_ids", "attention_mask", "token_type_ids")
+
+FULL_ATTENTION = "original_full"
+SPARSE_ATTENTION = "block_sparse"
+ATTENTION_MODES = ("auto", FULL_ATTENTION, SPARSE_ATTENTION)
+
+# BigBird silently runs full attention below (5 + 2 * num_random_blocks) * block_size tokens
+# (704 with the default 64-token blocks and 3 random blocks), so sparse is never chosen there
+MIN_SPARSE_TOKENS = 704
+
+DEFAULT_CALIBRATION_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models", "attention_calibration.json")
+
+
+class AttentionPolicy:
+    """
+    Chooses full or block-sparse attention for a padded input length. A
+    calibration file gives the fastest mode per length bucket. Without one,
+    auto keeps full attention (the mode the model was trained with) unless an
+    explicit `threshold` > 0 opts inputs longer than that into block-sparse.
+    """
+
+    def __init__(self, mode: str = "auto", threshold: int = 0, buckets: Optional[List[Tuple[int, str]]] = None):
+        if mode not in ATTENTION_MODES:
+            raise ValueError(f"Unknown attention mode {mode!r} (choose from {', '.join(ATTENTION_MODES)})")
+        self.mode = mode
+        self.threshold = threshold
+        self.buckets = sorted(buckets) if buckets else None
+
+    @classmethod
+    def load(cls, mode: str = "auto", threshold: int = 0, path: str = DEFAULT_CALIBRATION_PATH) -> "AttentionPolicy":
+        """Policy from a calibrate_attention.py result, or the explicit threshold (if any) without one"""
+        if mode != "auto" or not os.path.exists(path):
+            return cls(mode, threshold)
+        with open(path) as f:
+            calibration = json.load(f)
+        buckets = [(bucket["max_tokens"], bucket["mode"]) for bucket in calibration.get("buckets", [])]
+        return cls(mode, calibration.get("threshold", threshold), buckets)
+
+    def choose(self, tokens: int) -> str:
+        if self.mode != "auto":
+            return self.mode
+        if tokens <= MIN_SPARSE_TOKENS:
+            return FULL_ATTENTION
+        if self.buckets:
+            for max_tokens, mode in self.buckets:
+                if tokens <= max_tokens:
+                    return mode
+            return self.buckets[-1][1]
+        # Uncalibrated: block-sparse only when the operator asked for it
+        return SPARSE_ATTENTION if 0 < self.threshold < tokens else FULL_ATTENTION
+
+    def describe(self) -> str:
+        if self.mode != "auto":
+            return self.mode
+        if self.buckets:
+            return "auto (calibrated: " + ", ".join(f"<={n}: {m}" for n, m in self.buckets) + ")"
+        if self.threshold > 0:
+            return f"auto (block_sparse above {self.threshold} tokens)"
+        return "auto (uncalibrated: original_full)"
+
+
+class EagerBackend:
+    """Runs the PyTorch model directly"""
+    name = "eager"
+
+    def __init__(self, model, device):
+        self.model = model
+        self.device = device
+        self.revision = getattr(model.config, "_commit_hash", None)
+        # The attention type is model-wide state: passes in one mode may overlap,
+        # but switching waits until every pass in the other mode has finished
+        self._attention = getattr(model.config, "attention_type", FULL_ATTENTION)
+        self._active = 0
+        self._switch = threading.Condition()
+
+    def _enter(self, attention: Optional[str]):
+        with self._switch:
+            while attention and attention != self._attention and self._active:
+                self._switch.wait()
+            if attention and attention != self._attention:
+                self.model.bert.set_attention_type(attention)
+                self._attention = attention
+            self._active += 1
+
+    def _exit(self):
+        with self._switch:
+            self._active -= 1
+            if not self._active:
+                self._switch.notify_all()
+
+    def logits(self, tokenized, attention: Optional[str] = None) -> "torch.Tensor":
+        import torch
+
+        self._enter(attention)
+        try:
+            with torch.no_grad():
+                inputs = {key: tokenized[key].to(self.device) for key in ONNX_INPUTS}
+                # bfloat16/float16 weights still decode from float32 logits
+                return self.model(**inputs, return_dict=True).logits.detach().cpu().float()
+        finally:
+            self._exit()
+
+
+class QuantizedBackend(EagerBackend):
+    """Dynamic int8 quantization of every nn.Linear; weights are quantized once at load"""
+    name = "int8"
+
+    def __init__(self, model):
+        import torch
+
+        quantized = torch.ao.quantization.quantize_dynamic(model.cpu(), {torch.nn.Linear}, dtype=torch.qint8)
+        quantized.eval()
+        super().__init__(quantized, torch.device("cpu"))
+        self.revision = getattr(model.config, "_commit_hash", None)
+
+
+class OnnxBackend:
+    """ONNX Runtime session over the exported model"""
+    name = "onnx"
+
+    def __init__(self, path: str, num_threads: Optional[int] = None):
+        import onnxruntime as ort
+        import torch
+
+        if not os.path.exists(path):
+            raise FileNotFoundError(
+                f"ONNX model not found at {path}; run scripts/export_codon_model.py first"
+            )
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = num_threads or torch.get_num_threads()
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.revision = self.session.get_modelmeta().custom_metadata_map.get("revision")
+
+    def logits(self, tokenized, attention: Optional[str] = None) -> "torch.Tensor":
+        """The exported graph has full attention baked in, so `attention` is ignored"""
+        import torch
+
+        feeds = {key: tokenized[key].cpu().numpy().astype("int64") for key in ONNX_INPUTS}
+        return torch.from_numpy(self.session.run(["logits"], feeds)[0])
+
+
+def load_backend(name: str, model=None, device=None, onnx_path: str = DEFAULT_ONNX_PATH):
+    """Build the named backend; eager and int8 need the loaded PyTorch model"""
+    if name == "eager":
+        return EagerBackend(model, device)
+    if name == "int8":
+        return QuantizedBackend(model)
+    if name == "onnx":
+        return OnnxBackend(onnx_path)
+    raise ValueError(f"Unknown inference backend {name!r} (choose from {', '.join(BACKENDS)})")
@@ -0,0 +1,521 @@
+"""
+Optimize a multi-FASTA file of proteins offline, without the HTTP server.
+
+Uses the server's own model loading (codon_api.load_weights_blocking),
+batched inference (codon_api.run_inference_batch) and post-processing
+(codon_api.build_optimization_response). The weights are loaded once and
+shared copy-on-write by N forked worker processes, each with a fixed torch
+thread count and, with --pin, its own set of cores. Records are streamed
+from the input in chunks, so memory stays flat for genome-scale files, and
+results are written in completion order as they arrive.
+
+Every --checkpoint-every records the outputs are flushed and the positions
+of the finished records in the input are appended to a checkpoint file
+(positions rather than ids, since FASTA ids need not be unique). An
+interrupted run started again with the same arguments truncates the outputs
+to the last checkpoint and skips every record already done.
+
+Usage:
+    python scripts/codon_batch.py proteome.faa --organism "Escherichia coli general" --output out/ecoli
+    python scripts/codon_batch.py proteome.faa.gz --organism 83333 --output out/run --workers 8 --threads 4 --pin
+    python scripts/codon_batch.py proteome.faa --organism ... --output out/run --formats fasta tsv parquet
+
+Output (for --output out/run):
+    out/run.fasta            optimized DNA, one entry per sequence
+    out/run.tsv              per-sequence metrics, warnings and errors
+    out/run.parquet/         the TSV columns as Parquet, one part file per checkpoint (needs pyarrow)
+    out/run.checkpoint       finished record positions and output sizes, for resuming
+"""
+
+import argparse
+import gzip
+import json
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import codon_api
+from codon_inference import InferenceItem
+from fasta import iter_fasta
+
+FORMATS = ("fasta", "tsv", "parquet")
+TSV_COLUMNS = (
+    "id", "sequence_index", "status", "protein_length", "dna", "gc_content", "gc_window_min",
+    "gc_window_max", "cai", "engine", "warning", "error",
+)
+FLOAT_COLUMNS = ("gc_content", "gc_window_min", "gc_window_max", "cai")
+
+# (ordinal, record_id, protein) records handed to a worker in one message; the
+# ordinal is the record's position in the input and identifies it even when ids repeat
+Chunk = List[Tuple[int, str, str]]
+
+
+def open_text(path):
+    """Open a FASTA file for reading, transparently decompressing .gz"""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt")
+    return open(path)
+
+
+def cell(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return f"{value:.6g}"
+    return str(value).replace("\t", " ").replace("\n", " ")
+
+
+class FileWriter:
+    """Append-only output whose durable size is recorded in the checkpoint"""
+
+    def __init__(self, path: str, header: bytes = b""):
+        self.path = path
+        self.header = header
+        self.file = None
+
+    def restore(self, state: Optional[int]):
+        """Cut off anything written after the last checkpoint (or start a new file)"""
+        self.file = open(self.path, "r+b" if state is not None and os.path.exists(self.path) else "wb")
+        self.file.truncate(state or 0)
+        self.file.seek(0, os.SEEK_END)
+        if not state:
+            self.file.write(self.header)
+
+    def write(self, rows: List[dict]):
+        self.file.write(b"".join(self.format(row) for row in rows))
+
+    def commit(self) -> int:
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return self.file.tell()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+class FastaWriter(FileWriter):
+    def format(self, row: dict) -> bytes:
+        if row["status"] != "ok":
+            return b""
+        name = row["id"] if row["sequence_index"] == 1 else f"{row['id']}_{row['sequence_index']}"
+        description = f"gc={cell(row['gc_content'])} cai={cell(row['cai'])}"
+        dna = row["dna"]
+        lines = [dna[i:i + 80] for i in range(0, len(dna), 80)]
+        return (f">{name} {description}\n" + "\n".join(lines) + "\n").encode()
+
+
+class TsvWriter(FileWriter):
+    def __init__(self, path: str):
+        super().__init__(path, ("\t".join(TSV_COLUMNS) + "\n").encode())
+
+    def format(self, row: dict) -> bytes:
+        return ("\t".join(cell(row[column]) for column in TSV_COLUMNS) + "\n").encode()
+
+
+class ParquetWriter:
+    """A directory of Parquet part files; each commit closes one part"""
+
+    def __init__(self, path: str):
+        import pyarrow  # noqa: F401 (fail before any work is done)
+
+        self.path = path
+        self.rows: List[dict] = []
+        self.parts = 0
+
+    def restore(self, state: Optional[int]):
+        os.makedirs(self.path, exist_ok=True)
+        self.parts = state or 0
+        # Parts beyond the checkpoint belong to records that will be redone
+        for name in os.listdir(self.path):
+            if name.startswith("part-") and (not name.endswith(".parquet") or int(name[5:10]) >= self.parts):
+                os.remove(os.path.join(self.path, name))
+
+    def write(self, rows: List[dict]):
+        self.rows.extend(rows)
+
+    def commit(self) -> int:
+        if self.rows:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            # An explicit schema keeps every part identical even when a column is all null
+            schema = pa.schema([
+                (column, pa.int64() if column in ("sequence_index", "protein_length")
+                 else pa.float64() if column in FLOAT_COLUMNS else pa.string())
+                for column in TSV_COLUMNS
+            ])
+            table = pa.Table.from_pylist(self.rows, schema=schema)
+            final = os.path.join(self.path, f"part-{self.parts:05d}.parquet")
+            pq.write_table(table, final + ".tmp")
+            os.replace(final + ".tmp", final)
+            self.parts += 1
+            self.rows = []
+        return self.parts
+
+    def close(self):
+        pass
+
+
+class Checkpoint:
+    """Append-only log of finished record ordinals and the output sizes that include them"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done = set()
+        self.state: Dict[str, int] = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break  # torn final line from an interrupted write
+                    self.done.update(entry["records"])
+                    self.state = entry["outputs"]
+        self.file = open(path, "a")
+
+    def append(self, ordinals: List[int], outputs: Dict[str, int]):
+        self.file.write(json.dumps({"records": ordinals, "outputs": outputs}) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.done.update(ordinals)
+        self.state = outputs
+
+    def close(self):
+        self.file.close()
+
+
+def response_rows(record_id: str, protein: str, response) -> List[dict]:
+    """One output row per returned sequence (one error row for a failed record)"""
+    base = {"id": record_id, "protein_length": len(protein), "engine": response.engine,
+            "warning": response.warning, "error": response.error}
+    sequences = response.sequences or ([response.dna_sequence] if response.dna_sequence else [])
+    if not response.success or not sequences:
+        return [{**base, "sequence_index": 1, "status": "failed", "dna": None, "gc_content": None,
+                 "gc_window_min": None, "gc_window_max": None, "cai": None,
+                 "error": response.error or "No sequence returned"}]
+    metrics = response.metrics or [{}] * len(sequences)
+    return [
+        {**base, "sequence_index": i, "status": "ok", "dna": dna,
+         "gc_content": m.get("gc_content"), "gc_window_min": m.get("gc_window_min"),
+         "gc_window_max": m.get("gc_window_max"), "cai": m.get("cai")}
+        for i, (dna, m) in enumerate(zip(sequences, metrics), start=1)
+    ]
+
+
+def run_chunk(chunk: Chunk, options: dict) -> List[Tuple[int, List[dict]]]:
+    """Predict and post-process one chunk; a failing batch is retried record by record"""
+    requests = []
+    for ordinal, record_id, protein in chunk:
+        try:
+            request = codon_api.OptimizationRequest(protein=protein, **options["request"])
+        except ValueError as e:
+            request = e
+        requests.append((ordinal, record_id, protein, request))
+
+    valid = [(ordinal, request) for ordinal, _, _, request in requests
+             if isinstance(request, codon_api.OptimizationRequest)]
+    items = [
+        InferenceItem(
+            protein=request.protein,
+            organism_id=options["organism_id"],
+            organism_name=options["organism_name"],
+            deterministic=request.deterministic and not request.best_of,
+            temperature=request.temperature,
+            top_p=request.top_p,
+            num_sequences=max(request.best_of, request.num_sequences),
+            unique=request.unique_sequences,
+        )
+        for _, request in valid
+    ]
+    try:
+        predictions = codon_api.run_inference_batch(items) if items else []
+    except Exception:
+        predictions = []
+        for item in items:
+            try:
+                predictions.append(codon_api.run_inference_batch([item])[0])
+            except Exception as e:
+                predictions.append(e)
+
+    responses = {}
+    for (ordinal, request), prediction in zip(valid, predictions):
+        if isinstance(prediction, Exception):
+            responses[ordinal] = codon_api.OptimizationResponse(success=False, error=str(prediction))
+        else:
+            responses[ordinal] = codon_api.build_optimization_response(request, prediction)
+
+    results = []
+    for ordinal, record_id, protein, request in requests:
+        response = responses.get(ordinal)
+        if response is None:
+            response = codon_api.OptimizationResponse(success=False, error=str(request))
+        results.append((ordinal, response_rows(record_id, protein, response)))
+    return results
+
+
+def worker_main(index: int, tasks, results, threads: int, cores: Optional[List[int]], options: dict):
+    """Worker process: pin, size the torch thread pool, then optimize chunks until told to stop"""
+    if cores:
+        os.sched_setaffinity(0, cores)
+    import torch
+
+    torch.set_num_threads(threads)
+    if codon_api.backend is None:
+        # ONNX Runtime sessions do not survive fork, so each worker builds its own
+        codon_api.load_weights_blocking()
+
+    while True:
+        chunk = tasks.get()
+        if chunk is None:
+            break
+        started = time.perf_counter()
+        results.put((index, run_chunk(chunk, options), time.perf_counter() - started))
+
+
+def feed(path: str, done: set, tasks, chunk_size: int, workers: int, counts: dict):
+    """Reader thread: stream records, skip finished ones, and queue chunks for the workers"""
+    chunk: Chunk = []
+    with open_text(path) as f:
+        for ordinal, (record_id, protein) in enumerate(iter_fasta(f)):
+            if ordinal in done:
+                counts["skipped"] += 1
+                continue
+            chunk.append((ordinal, record_id, protein))
+            counts["residues"] += len(protein)
+            if len(chunk) >= chunk_size:
+                tasks.put(chunk)
+                counts["chunks"] += 1
+                chunk = []
+    if chunk:
+        tasks.put(chunk)
+        counts["chunks"] += 1
+    for _ in range(workers):
+        tasks.put(None)
+    counts["finished"] = True
+
+
+def core_sets(workers: int, threads: int) -> List[Optional[List[int]]]:
+    """Disjoint cores for each worker, from the cores this process may use"""
+    available = sorted(os.sched_getaffinity(0))
+    if len(available) < workers * threads:
+        print(f"⚠ {workers} workers x {threads} threads exceeds {len(available)} available cores; not pinning")
+        return [None] * workers
+    return [available[i * threads:(i + 1) * threads] for i in range(workers)]
+
+
+def run(args) -> bool:
+    print("=" * 60)
+    print("CodonTransformer Batch Optimization")
+    print("=" * 60)
+
+    if args.num_sequences > 1 and not args.sample and not args.best_of:
+        print("⚠ --num-sequences above 1 needs --sample (or --best-of); argmax gives one sequence")
+        return False
+
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    workers = max(1, args.workers or max(1, cpus // (args.threads or 4)))
+    threads = max(1, args.threads or cpus // workers)
+    chunk_size = max(1, args.chunk_size or codon_api.MAX_BATCH_SIZE * 2)
+
+    codon_api.INFERENCE_BACKEND = args.backend
+    codon_api.ONNX_PATH = args.onnx_path
+    codon_api.MODEL_DIR = args.model_dir
+    codon_api.MAX_BATCH_SIZE = args.max_batch_size
+    codon_api.WINDOW_SIZE = args.window_size
+    codon_api.TORCH_THREADS = threads
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    writers = {}
+    for name in dict.fromkeys(args.formats):
+        if name == "parquet":
+            try:
+                writers[name] = ParquetWriter(args.output + ".parquet")
+            except ImportError:
+                print("⚠ Parquet output needs pyarrow (pip install pyarrow)")
+                return False
+        else:
+            writers[name] = (FastaWriter if name == "fasta" else TsvWriter)(f"{args.output}.{name}")
+
+    checkpoint_path = args.output + ".checkpoint"
+    if args.restart and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    elif not os.path.exists(checkpoint_path) and any(os.path.exists(w.path) for w in writers.values()):
+        print(f"⚠ Outputs for {args.output} exist without a checkpoint; pass --restart to overwrite them")
+        return False
+    checkpoint = Checkpoint(checkpoint_path)
+    # A format added on resume would hold only the records still to do
+    added = [name for name in writers if checkpoint.done and name not in checkpoint.state]
+    if added:
+        print(f"⚠ The checkpointed run did not write {', '.join(added)}; "
+              "rerun with its formats or pass --restart to redo every record")
+        checkpoint.close()
+        return False
+    for name, writer in writers.items():
+        writer.restore(checkpoint.state.get(name) if checkpoint.done else None)
+    if checkpoint.done:
+        print(f"\nResuming: {len(checkpoint.done)} records already done")
+
+    print(f"\nLoading model ({args.backend}) once for {workers} workers x {threads} threads...")
+    started = time.perf_counter()
+    if args.backend != "onnx":
+        import torch
+
+        # One intra-op thread while loading, so no thread pool exists when the workers fork;
+        # each worker sizes its own in worker_main
+        torch.set_num_threads(1)
+        codon_api.load_weights_blocking()
+    from CodonTransformer.CodonPrediction import validate_and_convert_organism
+
+    organism_id, organism_name = validate_and_convert_organism(
+        int(args.organism) if args.organism.isdigit() else args.organism
+    )
+    print(f"Organism: {organism_name}; loaded in {time.perf_counter() - started:.1f} s")
+
+    options = {
+        "organism_id": organism_id,
+        "organism_name": organism_name,
+        "request": {
+            "organism": organism_name,
+            "deterministic": not args.sample,
+            "temperature": args.temperature,
+            "top_p": args.top_p,
+            "num_sequences": args.num_sequences,
+            "best_of": args.best_of,
+            "avoid_restriction_sites": args.avoid_sites,
+            "engine": "model",
+        },
+    }
+
+    context = multiprocessing.get_context("fork")
+    tasks = context.Queue(maxsize=workers * 2)
+    results = context.Queue()
+    cores = core_sets(workers, threads) if args.pin else [None] * workers
+    processes = [
+        context.Process(target=worker_main, args=(i, tasks, results, threads, cores[i], options), daemon=True)
+        for i in range(workers)
+    ]
+    for process in processes:
+        process.start()
+
+    counts = {"skipped": 0, "chunks": 0, "residues": 0, "finished": False}
+    reader = threading.Thread(
+        target=feed, args=(args.input, checkpoint.done, tasks, chunk_size, workers, counts), daemon=True,
+    )
+    reader.start()
+
+    run_started = time.perf_counter()
+    received = succeeded = failed = sequences = 0
+    per_worker = [0] * workers
+    failures: List[Tuple[str, str]] = []
+    uncommitted: List[int] = []
+    last_report = run_started
+
+    def commit():
+        outputs = {name: writer.commit() for name, writer in writers.items()}
+        checkpoint.append(uncommitted, outputs)
+        uncommitted.clear()
+
+    try:
+        while not counts["finished"] or received < counts["chunks"]:
+            try:
+                index, chunk_results, seconds = results.get(timeout=1.0)
+            except queue.Empty:
+                dead = [p for p in processes if not p.is_alive() and p.exitcode not in (0, None)]
+                if dead:
+                    print(f"⚠ Worker exited with status {dead[0].exitcode}; rerun to resume from the checkpoint")
+                    return False
+                continue
+            received += 1
+            for ordinal, rows in chunk_results:
+                for writer in writers.values():
+                    writer.write(rows)
+                uncommitted.append(ordinal)
+                per_worker[index] += 1
+                if rows[0]["status"] == "ok":
+                    succeeded += 1
+                    sequences += len(rows)
+                else:
+                    failed += 1
+                    failures.append((rows[0]["id"], rows[0]["error"]))
+            if len(uncommitted) >= args.checkpoint_every:
+                commit()
+
+            now = time.perf_counter()
+            if now - last_report >= 10:
+                last_report = now
+                done = succeeded + failed
+                print(f"  {done} records ({done / (now - run_started):.1f}/s), {failed} failed")
+        commit()
+    finally:
+        for writer in writers.values():
+            writer.close()
+        checkpoint.close()
+        for process in processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+
+    elapsed = time.perf_counter() - run_started
+    done = succeeded + failed
+    print("\nSummary:")
+    print(f"  Records:      {done} processed, {counts['skipped']} skipped (already done)")
+    print(f"  Succeeded:    {succeeded} ({sequences} sequences)")
+    print(f"  Failed:       {failed}")
+    print(f"  Wall time:    {elapsed:.1f} s")
+    if elapsed > 0 and done:
+        print(f"  Throughput:   {done / elapsed:.2f} records/s, {counts['residues'] / elapsed:,.0f} residues/s")
+    print(f"  Per worker:   {', '.join(str(n) for n in per_worker)}")
+    for record_id, error in failures[:10]:
+        print(f"  ⚠ {record_id}: {error}")
+    if len(failures) > 10:
+        print(f"  ... and {len(failures) - 10} more (see {args.output}.tsv)" if "tsv" in writers else
+              f"  ... and {len(failures) - 10} more")
+    for name, writer in writers.items():
+        print(f"  {name:<12}{writer.path}")
+
+    print("\n" + "=" * 60)
+    print("✓ Batch complete" if not failed else f"⚠ Batch complete with {failed} failed record(s)")
+    print("=" * 60)
+    return failed == 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("input", help="Protein multi-FASTA file (.gz is decompressed)")
+    parser.add_argument("--organism", required=True, help="Target organism name or ID")
+    parser.add_argument("--output", required=True, help="Output path prefix (extensions are added)")
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=["fasta", "tsv"], help="Output formats")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Worker processes (default: available cores divided by --threads, or by 4)")
+    parser.add_argument("--threads", type=int, default=0,
+                        help="torch intra-op threads per worker (default: available cores divided by workers)")
+    parser.add_argument("--pin", action="store_true", help="Pin each worker to its own set of cores")
+    parser.add_argument("--chunk-size", type=int, default=0,
+                        help="Records sent to a worker at a time (default: twice --max-batch-size)")
+    parser.add_argument("--max-batch-size", type=int, default=codon_api.MAX_BATCH_SIZE,
+                        help="Rows per model forward pass")
+    parser.add_argument("--window-size", type=int, default=codon_api.WINDOW_SIZE,
+                        help="Split proteins longer than this many tokens into overlapping windows")
+    parser.add_argument("--checkpoint-every", type=int, default=500,
+                        help="Records between output flushes and checkpoint entries")
+    parser.add_argument("--restart", action="store_true", help="Ignore any checkpoint and overwrite the outputs")
+    parser.add_argument("--sample", action="store_true", help="Sample with --temperature/--top-p instead of argmax")
+    parser.add_argument("--temperature", type=float, default=0.2)
+    parser.add_argument("--top-p", type=float, default=0.95)
+    parser.add_argument("--num-sequences", type=int, default=1, help="Sequences per protein")
+    parser.add_argument("--best-of", type=int, default=0,
+                        help="Sample this many candidates per protein and keep the best --num-sequences")
+    parser.add_argument("--avoid-sites", nargs="*", default=[], help="Restriction enzymes to remove (e.g. BsaI BbsI)")
+    parser.add_argument("--backend", choices=codon_api.BACKENDS, default=codon_api.INFERENCE_BACKEND)
+    parser.add_argument("--onnx-path", default=codon_api.ONNX_PATH)
+    parser.add_argument("--model-dir", default=codon_api.MODEL_DIR,
+                        help="Local model directory with safetensors weights (no network access)")
+    args = parser.parse_args()
+
+    success = run(args)
+    exit(0 if success else 1)
@@ -0,0 +1,223 @@
+"""
+Result cache for deterministic codon optimization.
+
+Entries are keyed on a hash of the normalized request plus the model
+revision. A bounded in-memory LRU tier (with TTL) sits in front of an
+optional SQLite tier that survives restarts. Concurrent identical
+requests are coalesced so only the first one computes. From the event loop,
+the SQLite tier is only touched in worker threads (get_or_compute never
+blocks on disk I/O).
+"""
+
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+def make_cache_key(fields: Dict[str, Any], model_revision: str) -> str:
+    """Hash the normalized request fields together with the model revision"""
+    payload = json.dumps({"request": fields, "model": model_revision}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResultCache:
+    """Two-tier (memory LRU + optional SQLite) cache of JSON-serializable results"""
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 86400.0, db_path: Optional[str] = None):
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl_seconds if ttl_seconds > 0 else None
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # _lock guards the memory tier and stats, _db_lock the SQLite connection;
+        # the memory tier never waits on a disk lookup running in another thread
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self.stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "evictions": 0,
+        }
+
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl is not None and time.time() - created > self.ttl
+
+    def _remember(self, key: str, value: Any, created: float):
+        self._memory[key] = (created, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def _get_memory(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created, value = entry
+                if not self._expired(created):
+                    self._memory.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return value
+                del self._memory[key]
+            return None
+
+    def _get_disk(self, key: str) -> Optional[Any]:
+        """Disk lookup (promoting a hit to memory); blocking, so run in a thread from async code"""
+        with self._db_lock:
+            if self._db is None:
+                return None
+            row = self._db.execute("SELECT value, created FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value_json, created = row
+            if self._expired(created):
+                self._db.execute("DELETE FROM results WHERE key = ?", (key,))
+                self._db.commit()
+                return None
+        value = json.loads(value_json)
+        with self._lock:
+            self._remember(key, value, created)
+            self.stats["disk_hits"] += 1
+        return value
+
+    def _put_disk(self, key: str, value: Any, created: float):
+        with self._db_lock:
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO results (key, value, created) VALUES (?, ?, ?)",
+                    (key, json.dumps(value), created),
+                )
+                self._db.commit()
+
+    def _miss(self):
+        with self._lock:
+            self.stats["misses"] += 1
+
+    def get(self, key: str) -> Optional[Any]:
+        """Look a key up in memory, then on disk (promoting disk hits to memory)"""
+        value = self._get_memory(key)
+        if value is None:
+            value = self._get_disk(key)
+        if value is None:
+            self._miss()
+        return value
+
+    def put(self, key: str, value: Any):
+        """Store a value in both tiers"""
+        created = time.time()
+        with self._lock:
+            self._remember(key, value, created)
+        self._put_disk(key, value, created)
+
+    async def aget(self, key: str) -> Optional[Any]:
+        """get() for the event loop: a memory miss goes to disk in a worker thread"""
+        value = self._get_memory(key)
+        if value is None and self._db is not None:
+            value = await asyncio.to_thread(self._get_disk, key)
+        if value is None:
+            self._miss()
+        return value
+
+    async def aput(self, key: str, value: Any):
+        """put() for the event loop: the SQLite write runs in a worker thread"""
+        created = time.time()
+        with self._lock:
+            self._remember(key, value, created)
+        if self._db is not None:
+            await asyncio.to_thread(self._put_disk, key, value, created)
+
+    async def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        store_if: Callable[[Any], bool] = lambda value: True,
+    ) -> Any:
+        """
+        Return the cached value for key, or run compute() once for all
+        concurrent callers asking for the same key.
+        """
+        value = await self.aget(key)
+        if value is not None:
+            return value
+
+        # The computation runs as its own task so a caller that disconnects
+        # does not cancel it for the others waiting on the same key
+        inflight = self._inflight.get(key)
+        if inflight is None:
+            inflight = asyncio.ensure_future(self._compute(key, compute, store_if))
+            self._inflight[key] = inflight
+        else:
+            self.stats["coalesced"] += 1
+        return await asyncio.shield(inflight)
+
+    async def _compute(self, key: str, compute: Callable[[], Awaitable[Any]], store_if: Callable[[Any], bool]) -> Any:
+        try:
+            value = await compute()
+            if store_if(value):
+                await self.aput(key, value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def invalidate(self, key: str) -> bool:
+        """Remove one entry from both tiers; returns whether it existed"""
+        with self._lock:
+            existed = self._memory.pop(key, None) is not None
+        with self._db_lock:
+            if self._db is not None:
+                cursor = self._db.execute("DELETE FROM results WHERE key = ?", (key,))
+                self._db.commit()
+                existed = existed or cursor.rowcount > 0
+        return existed
+
+    def clear(self) -> int:
+        """Remove every entry from both tiers; returns how many were removed"""
+        with self._lock:
+            keys = set(self._memory)
+            self._memory.clear()
+        with self._db_lock:
+            if self._db is not None:
+                keys.update(row[0] for row in self._db.execute("SELECT key FROM results"))
+                self._db.execute("DELETE FROM results")
+                self._db.commit()
+        return len(keys)
+
+    def summary(self, include_disk: bool = True) -> Dict[str, Any]:
+        """Counters and sizes for the stats endpoint (disk_entries is None without include_disk)"""
+        lookups = self.stats["memory_hits"] + self.stats["disk_hits"] + self.stats["misses"]
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        with self._db_lock:
+            disk_entries = (
+                self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+                if self._db is not None and include_disk else None
+            )
+        with self._lock:
+            return {
+                **self.stats,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_entries": disk_entries,
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+            }
+
+    def close(self):
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
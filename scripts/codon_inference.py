@@ -0,0 +1,422 @@
+"""
+Batched CodonTransformer inference for the local API server.
+
+`predict_batch` runs a single padded forward pass over several proteins on
+any backend from codon_backends, and `InferenceBatcher` gathers concurrent
+/optimize calls into those batches. Long proteins are split into overlapping
+windows that ride along as extra batch rows and are stitched back together.
+
+torch and CodonTransformer are imported on first use so that the server can
+start answering liveness probes before the heavy imports have finished.
+"""
+
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Callable, Deque, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    import torch
+
+# Extra sampling rounds when unique sequences are requested and duplicates came up
+MAX_DEDUP_ROUNDS = 4
+
+# Longest row the model takes: tokenize() truncates at 2048 tokens including [CLS] and [SEP]
+MAX_WINDOW_TOKENS = 2046
+
+# Residues the model has tokens for; a stop ("*" or "_") may only end the protein
+AMINO_ACIDS = frozenset("ACDEFGHIKLMNPQRSTVWY")
+
+
+@dataclass
+class InferenceItem:
+    """A single protein waiting for a prediction"""
+    protein: str
+    organism_id: int
+    organism_name: str
+    deterministic: bool = True
+    temperature: float = 0.2
+    top_p: float = 0.95
+    num_sequences: int = 1
+    # Drop duplicate sequences (may then return fewer than num_sequences)
+    unique: bool = False
+    # Bulk work (batch endpoint, jobs) that yields to interactive requests
+    background: bool = False
+    enqueued_at: float = field(default_factory=time.monotonic)
+    # Number of overlapping windows the protein was split into
+    windows: int = 1
+    # Seconds spent per stage (queue_wait, tokenize, forward, decode), filled in as the item is served
+    timings: Dict[str, float] = field(default_factory=dict)
+
+
+def check_protein(protein: str) -> str:
+    """
+    Normalize a protein (whitespace removed, upper case) and reject what the
+    model cannot encode: an empty sequence or residues outside AMINO_ACIDS.
+    """
+    residues = "".join(protein.split()).upper()
+    core = residues.rstrip("*_")
+    if not core:
+        raise ValueError("Protein sequence cannot be empty")
+    invalid = sorted(set(core) - AMINO_ACIDS)
+    if invalid:
+        raise ValueError(f"Invalid amino acid(s) in protein sequence: {', '.join(invalid)}")
+    return residues
+
+
+def sample_nucleus(logits: "torch.Tensor", temperature: float, top_p: float) -> List[int]:
+    """Draw one token per position from (seq_len, vocab) logits with temperature/top-p sampling"""
+    return sample_nucleus_many(logits, temperature, top_p, 1)[0]
+
+
+def sample_nucleus_many(logits: "torch.Tensor", temperature: float, top_p: float, num_samples: int) -> List[List[int]]:
+    """
+    Draw num_samples sequences from one set of (seq_len, vocab) logits.
+    The softmax, sort and top-p cut run once; all samples come from a single
+    multinomial call over the filtered distributions.
+    """
+    import torch
+
+    if temperature <= 0:
+        return [logits.argmax(dim=-1).tolist()] * num_samples
+
+    probs = torch.softmax(logits / temperature, dim=-1)
+    probs_sorted, probs_idx = torch.sort(probs, dim=-1, descending=True)
+    cumulative = torch.cumsum(probs_sorted, dim=-1)
+    # Keep the smallest prefix whose mass reaches top_p (always keeps the top token)
+    probs_sorted[cumulative - probs_sorted > top_p] = 0.0
+    probs_sorted.div_(probs_sorted.sum(dim=-1, keepdim=True))
+    choice = torch.multinomial(probs_sorted, num_samples=num_samples, replacement=True)
+    return torch.gather(probs_idx, -1, choice).t().tolist()
+
+
+def draw_samples(item: InferenceItem, logits: "torch.Tensor") -> List[List[int]]:
+    """Token indices for every sequence the item asks for, optionally without duplicates"""
+    if item.deterministic:
+        best = logits.argmax(dim=-1).tolist()
+        return [best] if item.unique else [best] * item.num_sequences
+
+    samples = sample_nucleus_many(logits, item.temperature, item.top_p, item.num_sequences)
+    if not item.unique:
+        return samples
+
+    # Low temperatures repeat themselves; top up with extra draws, a bounded number of times
+    distinct = list(dict.fromkeys(map(tuple, samples)))
+    for _ in range(MAX_DEDUP_ROUNDS):
+        if len(distinct) >= item.num_sequences:
+            break
+        extra = sample_nucleus_many(logits, item.temperature, item.top_p, 2 * item.num_sequences)
+        distinct = list(dict.fromkeys(distinct + [tuple(s) for s in extra]))
+    return [list(s) for s in distinct[:item.num_sequences]]
+
+
+def decode_indices(indices: List[int]) -> str:
+    """Convert predicted token indices into a DNA string"""
+    from CodonTransformer.CodonUtils import INDEX2TOKEN
+
+    return "".join(INDEX2TOKEN[i][-3:] for i in indices).strip().upper()
+
+
+def split_windows(length: int, window: int, overlap: int) -> List[Tuple[int, int]]:
+    """
+    (start, end) token ranges of at most `window` tokens covering [0, length),
+    consecutive ranges sharing at least `overlap` tokens. The last range is
+    aligned to the end so it gets a full window of context.
+    """
+    if window <= 0 or length <= window:
+        return [(0, length)]
+    overlap = min(max(0, overlap), window // 2)
+    step = window - overlap
+    starts = list(range(0, length - window, step)) + [length - window]
+    return [(start, start + window) for start in starts]
+
+
+def stitch_windows(pieces: List["torch.Tensor"], windows: List[Tuple[int, int]]) -> "torch.Tensor":
+    """
+    Join per-window (tokens, vocab) logits into one sequence. Each overlap is
+    split at its midpoint, so every position comes from the window in which it
+    sits furthest from an edge.
+    """
+    import torch
+
+    if len(pieces) == 1:
+        return pieces[0]
+    kept = []
+    for i, ((start, end), piece) in enumerate(zip(windows, pieces)):
+        keep_from = start if i == 0 else (windows[i - 1][1] + start) // 2
+        keep_to = end if i == len(windows) - 1 else (end + windows[i + 1][0]) // 2
+        kept.append(piece[keep_from - start:keep_to - start])
+    return torch.cat(kept, dim=0)
+
+
+def predict_batch(
+    backend,
+    tokenizer,
+    items: List[InferenceItem],
+    window: int = 0,
+    overlap: int = 128,
+    max_rows: Optional[int] = None,
+    attention_policy=None,
+) -> list:
+    """
+    Predict DNA for several proteins with one padded forward pass.
+    Returns one entry per item, shaped like `predict_dna_sequence` output:
+    a single DNASequencePrediction, or a list when num_sequences > 1.
+
+    Proteins longer than `window` tokens (or than the model's MAX_WINDOW_TOKENS)
+    are split into overlapping windows that run as extra rows of the batch and
+    are stitched back together, so attention cost grows linearly with length.
+    With max_rows the rows are run `max_rows` at a time, grouped by length.
+    An AttentionPolicy (codon_backends) picks full or block-sparse attention
+    for each forward pass from its padded length.
+    """
+    from CodonTransformer.CodonData import get_merged_seq
+    from CodonTransformer.CodonPrediction import tokenize
+    from CodonTransformer.CodonUtils import DNASequencePrediction
+
+    window = min(window, MAX_WINDOW_TOKENS) if window > 0 else MAX_WINDOW_TOKENS
+
+    # Windows are cut from the merged token string, so only the real end of
+    # the protein carries the stop token that get_merged_seq appends
+    merged = [get_merged_seq(protein=item.protein, dna="") for item in items]
+    rows: List[Tuple[int, str]] = []
+    item_windows: List[List[Tuple[int, int]]] = []
+    item_rows: List[List[int]] = []
+    for i, (item, seq) in enumerate(zip(items, merged)):
+        tokens = seq.split(" ")
+        windows = split_windows(len(tokens), window, overlap)
+        item_windows.append(windows)
+        item_rows.append(list(range(len(rows), len(rows) + len(windows))))
+        rows.extend((i, " ".join(tokens[start:end])) for start, end in windows)
+
+    # Similar lengths share a forward pass, which keeps padding down
+    order = sorted(range(len(rows)), key=lambda r: rows[r][1].count(" "))
+    chunk = max_rows if max_rows and max_rows > 0 else len(rows)
+    row_logits: Dict[int, "torch.Tensor"] = {}
+    tokenize_seconds = forward_seconds = 0.0
+    for first in range(0, len(order), chunk):
+        chunk_rows = order[first:first + chunk]
+        started = time.perf_counter()
+        tokenized = tokenize(
+            [{"idx": r, "codons": rows[r][1], "organism": items[rows[r][0]].organism_id} for r in chunk_rows],
+            tokenizer=tokenizer,
+        )
+        tokenized_at = time.perf_counter()
+        attention = attention_policy.choose(tokenized["input_ids"].shape[1]) if attention_policy else None
+        logits = backend.logits(tokenized, attention=attention)
+        forward_seconds += time.perf_counter() - tokenized_at
+        tokenize_seconds += tokenized_at - started
+        lengths = tokenized["attention_mask"].sum(dim=1).tolist()
+        for position, r in enumerate(chunk_rows):
+            # Drop [CLS], [SEP] and any padding added for shorter rows
+            row_logits[r] = logits[position, 1:int(lengths[position]) - 1, :]
+
+    for item, windows in zip(items, item_windows):
+        item.timings["tokenize"] = tokenize_seconds
+        item.timings["forward"] = forward_seconds
+        item.windows = len(windows)
+
+    results = []
+    mark = time.perf_counter()
+    for item, seq, windows, row_ids in zip(items, merged, item_windows, item_rows):
+        item_logits = stitch_windows([row_logits[r] for r in row_ids], windows)
+
+        # One forward pass per protein; every requested sequence is drawn from the same logits
+        predictions = [
+            DNASequencePrediction(
+                organism=item.organism_name,
+                protein=item.protein,
+                processed_input=seq,
+                predicted_dna=decode_indices(indices),
+            )
+            for indices in draw_samples(item, item_logits)
+        ]
+        results.append(predictions[0] if item.num_sequences == 1 else predictions)
+        decoded_at = time.perf_counter()
+        item.timings["decode"] = decoded_at - mark
+        mark = decoded_at
+
+    return results
+
+
+class QueueFullError(Exception):
+    """Raised when the inference queue cannot accept more work"""
+
+    def __init__(self, retry_after: float):
+        super().__init__("Inference queue is full")
+        self.retry_after = retry_after
+
+
+class InferenceBatcher:
+    """
+    Micro-batching scheduler in front of the model.
+
+    Requests are queued and flushed as one batch as soon as `max_batch_size`
+    items are waiting or the oldest item has waited `max_wait_ms`. Each caller
+    gets back only its own result.
+
+    Batches run on a dedicated thread pool with `concurrency` inference slots,
+    so the event loop never blocks on torch. At most `max_queue_size` items may
+    wait for a slot; beyond that `submit` raises QueueFullError, unless the
+    caller asks to block until there is room (used by bulk endpoints).
+
+    Background items wait in a separate lane of the same size. A batch is
+    filled from the interactive lane first, but always takes at least one
+    background item when any are waiting, so bulk work cannot crowd out
+    single requests and still makes progress under sustained load.
+    """
+
+    def __init__(
+        self,
+        run_batch: Callable[[List[InferenceItem]], list],
+        max_batch_size: int = 8,
+        max_wait_ms: float = 10.0,
+        concurrency: int = 1,
+        max_queue_size: int = 64,
+    ):
+        self.run_batch = run_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.concurrency = max(1, concurrency)
+        self.max_queue_size = max(1, max_queue_size)
+        self.in_flight = 0
+        self._batch_seconds = 1.0  # running average, seeds Retry-After before the first batch
+        self._pending: Deque[Tuple[InferenceItem, asyncio.Future]] = deque()
+        self._background: Deque[Tuple[InferenceItem, asyncio.Future]] = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._space: Optional[asyncio.Event] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._tasks: set = set()
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="inference")
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._pending) + len(self._background)
+
+    def start(self):
+        """Start the batching loop (must be called from the running event loop)"""
+        self._wakeup = asyncio.Event()
+        self._space = asyncio.Event()
+        self._slots = asyncio.Semaphore(self.concurrency)
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the batching loop and fail anything still queued"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        for queue in (self._pending, self._background):
+            while queue:
+                _, future = queue.popleft()
+                if not future.done():
+                    future.set_exception(RuntimeError("Inference scheduler stopped"))
+        self._executor.shutdown(wait=False)
+
+    def retry_after(self) -> float:
+        """Estimated seconds until the current queue drains"""
+        batches = len(self._pending) / (self.max_batch_size * self.concurrency) + 1
+        return max(1.0, batches * self._batch_seconds)
+
+    def estimated_wait(self) -> float:
+        """Rough seconds before a newly queued interactive item starts its forward pass"""
+        if not self._pending and not self.in_flight:
+            return 0.0
+        batches_ahead = len(self._pending) / (self.max_batch_size * self.concurrency)
+        return (batches_ahead + (1.0 if self.in_flight else 0.0)) * self._batch_seconds
+
+    async def submit(self, item: InferenceItem, block: bool = False):
+        """
+        Queue an item and wait for its prediction.
+        With block=True a full queue delays the caller instead of raising.
+        """
+        queue = self._background if item.background else self._pending
+        while len(queue) >= self.max_queue_size:
+            if not block:
+                raise QueueFullError(self.retry_after())
+            self._space.clear()
+            await self._space.wait()
+
+        future = asyncio.get_running_loop().create_future()
+        item.enqueued_at = time.monotonic()
+        queue.append((item, future))
+        self._wakeup.set()
+        return await future
+
+    async def _next_batch(self) -> List[Tuple[InferenceItem, asyncio.Future]]:
+        while not self._pending and not self._background:
+            self._wakeup.clear()
+            await self._wakeup.wait()
+
+        # Wait for more items until the batch is full or the oldest item's deadline passes
+        deadline = min(queue[0][0].enqueued_at for queue in (self._pending, self._background) if queue) + self.max_wait
+        while self.queue_depth < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+
+        batch = []
+        reserved = 1 if self._background and self.max_batch_size > 1 else 0
+        self._take(self._pending, batch, self.max_batch_size - reserved)
+        self._take(self._background, batch, self.max_batch_size)
+        self._space.set()
+        return batch
+
+    @staticmethod
+    def _take(queue: Deque[Tuple[InferenceItem, asyncio.Future]], batch: list, limit: int):
+        while queue and len(batch) < limit:
+            item, future = queue.popleft()
+            if not future.cancelled():
+                batch.append((item, future))
+
+    async def _run(self):
+        while True:
+            # Hold a slot before collecting, so work accumulates into bigger
+            # batches while every slot is busy
+            await self._slots.acquire()
+            try:
+                batch = await self._next_batch()
+            except BaseException:
+                self._slots.release()
+                raise
+            if not batch:
+                self._slots.release()
+                continue
+
+            task = asyncio.create_task(self._execute(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _execute(self, batch: List[Tuple[InferenceItem, asyncio.Future]]):
+        loop = asyncio.get_running_loop()
+        items = [item for item, _ in batch]
+        self.in_flight += len(items)
+        started = time.monotonic()
+        for item in items:
+            item.timings["queue_wait"] = started - item.enqueued_at
+        try:
+            results = await loop.run_in_executor(self._executor, self.run_batch, items)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        else:
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            self._batch_seconds = 0.8 * self._batch_seconds + 0.2 * (time.monotonic() - started)
+            self.in_flight -= len(items)
+            self._slots.release()
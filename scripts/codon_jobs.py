@@ -0,0 +1,435 @@
+"""
+Asynchronous optimization jobs for the codon optimization server.
+
+A job is a list of optimization requests submitted in one call. `JobStore`
+keeps jobs and their per-record results in SQLite, so they survive a restart
+and can be fetched long after the submitting client has gone. `JobScheduler`
+feeds records from every active job to the inference scheduler a few at a
+time: higher priority jobs first and, within a priority, the client with the
+least work in flight, so one large submission cannot monopolize the model.
+Progress events are published to subscribers as each record finishes.
+
+Each job row records which store instance (one random id per process) runs
+it, and a heartbeat the owner refreshes every few seconds. Several server
+workers can share one store: a scheduler only takes over unfinished jobs
+whose heartbeat has gone stale, never those a live sibling is still running,
+and a restarted server resumes its own jobs even when it runs under the same
+pid as before (PID 1 in a container).
+"""
+
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+ACTIVE_STATES = ("queued", "running")
+FINAL_STATES = ("completed", "failed", "cancelled")
+
+_SUMMARY_KEYS = ("id", "client", "priority", "status", "created", "started", "finished", "total", "succeeded", "failed", "error")
+_SUMMARY_COLUMNS = ", ".join(_SUMMARY_KEYS)
+
+# Seconds between owner heartbeats, and without one after which another process takes a job over
+HEARTBEAT_SECONDS = 15.0
+STALE_SECONDS = 60.0
+
+
+class JobStore:
+    """
+    SQLite-backed jobs and per-record results (an empty path keeps them in memory).
+    Jobs created or claimed through this store are owned by `owner`, a random
+    id unless one is given.
+    """
+
+    def __init__(self, db_path: str = "", owner: Optional[str] = None):
+        self.owner = owner or uuid.uuid4().hex
+        self._db = sqlite3.connect(db_path or ":memory:", check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            if db_path:
+                self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, client TEXT NOT NULL, priority INTEGER NOT NULL, status TEXT NOT NULL, "
+                "created REAL NOT NULL, started REAL, finished REAL, total INTEGER NOT NULL, "
+                "succeeded INTEGER NOT NULL DEFAULT 0, failed INTEGER NOT NULL DEFAULT 0, error TEXT, owner TEXT, heartbeat REAL)"
+            )
+            existing = {row[1] for row in self._db.execute("PRAGMA table_info(jobs)")}
+            for column, kind in (("owner", "TEXT"), ("heartbeat", "REAL")):
+                if column not in existing:
+                    self._db.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS job_records ("
+                "job_id TEXT NOT NULL, idx INTEGER NOT NULL, record_id TEXT NOT NULL, "
+                "request TEXT NOT NULL, result TEXT, PRIMARY KEY (job_id, idx))"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def _summary(row) -> Dict[str, Any]:
+        summary = dict(zip(_SUMMARY_KEYS, row))
+        summary["done"] = summary["succeeded"] + summary["failed"]
+        return summary
+
+    def create(self, client: str, priority: int, records: List[Tuple[str, Dict[str, Any]]]) -> Dict[str, Any]:
+        """Store a new queued job, owned by this store, with its records and return its summary"""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (id, client, priority, status, created, total, owner, heartbeat) "
+                "VALUES (?, ?, ?, 'queued', ?, ?, ?, ?)",
+                (job_id, client, priority, now, len(records), self.owner, now),
+            )
+            self._db.executemany(
+                "INSERT INTO job_records (job_id, idx, record_id, request) VALUES (?, ?, ?, ?)",
+                [(job_id, index, record_id, json.dumps(fields)) for index, (record_id, fields) in enumerate(records)],
+            )
+            self._db.commit()
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute(f"SELECT {_SUMMARY_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._summary(row) if row else None
+
+    def status(self, job_id: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row[0] if row else None
+
+    def heartbeat(self) -> Set[str]:
+        """Refresh the heartbeat of every unfinished job this store owns; returns the unfinished jobs other owners hold"""
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET heartbeat = ? WHERE owner = ? AND status IN ('queued', 'running')",
+                (time.time(), self.owner),
+            )
+            self._db.commit()
+            rows = self._db.execute(
+                "SELECT id FROM jobs WHERE owner IS NOT ? AND status IN ('queued', 'running')", (self.owner,)
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def claim_orphaned(self, stale_seconds: float = STALE_SECONDS) -> List[Dict[str, Any]]:
+        """Take over unfinished jobs of other owners whose heartbeat is older than stale_seconds, oldest first"""
+        now = time.time()
+        with self._lock:
+            # IMMEDIATE holds the write lock, so two workers claiming together cannot both take a job
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                ids = [row[0] for row in self._db.execute(
+                    "SELECT id FROM jobs WHERE status IN ('queued', 'running') AND owner IS NOT ? "
+                    "AND (heartbeat IS NULL OR heartbeat < ?) ORDER BY created",
+                    (self.owner, now - stale_seconds),
+                )]
+                self._db.executemany(
+                    "UPDATE jobs SET owner = ?, heartbeat = ? WHERE id = ?", [(self.owner, now, job_id) for job_id in ids]
+                )
+                self._db.commit()
+            except BaseException:
+                self._db.rollback()
+                raise
+        return [job for job in map(self.get, ids) if job is not None]
+
+    def release(self):
+        """Mark this store's unfinished jobs as ownerless, so the next start resumes them at once"""
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET heartbeat = NULL WHERE owner = ? AND status IN ('queued', 'running')", (self.owner,)
+            )
+            self._db.commit()
+
+    def pending_records(self, job_id: str) -> List[Tuple[int, str, Dict[str, Any]]]:
+        """(index, record id, request fields) of the records that have no result yet"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT idx, record_id, request FROM job_records WHERE job_id = ? AND result IS NULL ORDER BY idx",
+                (job_id,),
+            ).fetchall()
+        return [(index, record_id, json.loads(request)) for index, record_id, request in rows]
+
+    def set_status(self, job_id: str, status: str, error: Optional[str] = None) -> bool:
+        """Move a job to a new state; final states are never left"""
+        now = time.time()
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE jobs SET status = ?, error = COALESCE(?, error), "
+                "started = CASE WHEN ? = 'running' THEN COALESCE(started, ?) ELSE started END, "
+                "finished = CASE WHEN ? IN ('completed', 'failed', 'cancelled') THEN ? ELSE finished END "
+                "WHERE id = ? AND status IN ('queued', 'running')",
+                (status, error, status, now, status, now, job_id),
+            )
+            self._db.commit()
+        return cursor.rowcount > 0
+
+    def save_result(self, job_id: str, index: int, success: bool, result: Dict[str, Any]):
+        """Store one record's result and count it towards the job's progress"""
+        column = "succeeded" if success else "failed"
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE job_records SET result = ? WHERE job_id = ? AND idx = ? AND result IS NULL",
+                (json.dumps(result), job_id, index),
+            )
+            if cursor.rowcount:
+                self._db.execute(f"UPDATE jobs SET {column} = {column} + 1 WHERE id = ?", (job_id,))
+            self._db.commit()
+
+    def results(self, job_id: str, offset: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
+        """Finished records in submission order, each tagged with its index and record id"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT idx, record_id, result FROM job_records WHERE job_id = ? AND result IS NOT NULL "
+                "ORDER BY idx LIMIT ? OFFSET ?",
+                (job_id, limit, offset),
+            ).fetchall()
+        return [{"index": index, "id": record_id, **json.loads(result)} for index, record_id, result in rows]
+
+    def delete(self, job_id: str) -> bool:
+        with self._lock:
+            self._db.execute("DELETE FROM job_records WHERE job_id = ?", (job_id,))
+            cursor = self._db.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+            self._db.commit()
+        return cursor.rowcount > 0
+
+    def purge(self, older_than: float) -> int:
+        """Delete finished jobs whose results are older than the given timestamp"""
+        with self._lock:
+            ids = [row[0] for row in self._db.execute(
+                "SELECT id FROM jobs WHERE status IN ('completed', 'failed', 'cancelled') AND finished < ?",
+                (older_than,),
+            )]
+            for job_id in ids:
+                self._db.execute("DELETE FROM job_records WHERE job_id = ?", (job_id,))
+                self._db.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+            self._db.commit()
+        return len(ids)
+
+    def counts(self) -> Dict[str, int]:
+        """Number of stored jobs per state"""
+        with self._lock:
+            rows = self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return dict(rows)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+@dataclass
+class _ActiveJob:
+    id: str
+    client: str
+    priority: int
+    created: float
+    pending: Deque[Tuple[int, str, Dict[str, Any]]]
+    tasks: Set[asyncio.Task] = field(default_factory=set)
+    started: bool = False
+
+
+class JobScheduler:
+    """
+    Runs stored jobs record by record through `run_record`, which returns
+    (success, JSON-serializable result). At most `concurrency` records are in
+    flight across all jobs. Every `heartbeat_seconds` the scheduler refreshes
+    the heartbeat of its jobs, drops any another process has taken over, and
+    (when recovering) claims jobs whose owner has gone quiet for `stale_seconds`.
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        run_record: Callable[[Dict[str, Any]], Awaitable[Tuple[bool, Dict[str, Any]]]],
+        concurrency: int = 8,
+        heartbeat_seconds: float = HEARTBEAT_SECONDS,
+        stale_seconds: float = STALE_SECONDS,
+    ):
+        self.store = store
+        self.run_record = run_record
+        self.concurrency = max(1, concurrency)
+        self.heartbeat_seconds = heartbeat_seconds
+        self.stale_seconds = stale_seconds
+        self._jobs: Dict[str, _ActiveJob] = {}
+        self._in_flight_by_client: Dict[str, int] = {}
+        self._last_served: Dict[str, int] = {}
+        self._served = 0
+        self._in_flight = 0
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def owns(self, job_id: str) -> bool:
+        """Whether this process is running the job (other workers only see the store)"""
+        return job_id in self._jobs
+
+    def start(self, recover: bool = True):
+        """Start dispatching (from the running event loop), resuming orphaned jobs if asked"""
+        self._wakeup = asyncio.Event()
+        if recover:
+            self._adopt(self.store.claim_orphaned(self.stale_seconds))
+        self._worker = asyncio.create_task(self._run())
+        self._heartbeat = asyncio.create_task(self._keep_alive(recover))
+
+    async def stop(self):
+        """Stop dispatching; interrupted records stay pending and resume on the next start"""
+        self._stopping = True
+        for task in (self._worker, self._heartbeat):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._worker = self._heartbeat = None
+        tasks = [task for job in self._jobs.values() for task in job.tasks]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.store.release()
+
+    def submit(self, client: str, priority: int, records: List[Tuple[str, Dict[str, Any]]]) -> Dict[str, Any]:
+        """Persist a job and queue it; returns its summary"""
+        job = self.store.create(client, priority, records)
+        self._activate(job)
+        return job
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued or running job; finished records keep their results"""
+        if not self.store.set_status(job_id, "cancelled"):
+            return False
+        job = self._jobs.get(job_id)
+        if job is not None:
+            job.pending.clear()
+            for task in job.tasks:
+                task.cancel()
+            if not job.tasks:
+                self._retire(job)
+        return True
+
+    def subscribe(self, job_id: str) -> asyncio.Queue:
+        """Queue receiving (event, data) tuples for one job"""
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(job_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, job_id: str, queue: asyncio.Queue):
+        subscribers = self._subscribers.get(job_id)
+        if subscribers is not None:
+            subscribers.discard(queue)
+            if not subscribers:
+                del self._subscribers[job_id]
+
+    def _publish(self, job_id: str, event: str, data: Dict[str, Any]):
+        for queue in self._subscribers.get(job_id, ()):
+            queue.put_nowait((event, data))
+
+    def _adopt(self, jobs: List[Dict[str, Any]]):
+        for job in jobs:
+            self._activate(job)
+        if jobs:
+            print(f"Resuming {len(jobs)} unfinished job(s)")
+
+    async def _keep_alive(self, recover: bool):
+        while True:
+            await asyncio.sleep(self.heartbeat_seconds)
+            try:
+                others = await asyncio.to_thread(self.store.heartbeat)
+                # A job another process claimed while this one stalled is no longer ours to run
+                for job in list(self._jobs.values()):
+                    if job.id in others:
+                        job.pending.clear()
+                        del self._jobs[job.id]
+                if recover:
+                    self._adopt(await asyncio.to_thread(self.store.claim_orphaned, self.stale_seconds))
+            except sqlite3.Error as e:
+                print(f"Warning: job heartbeat failed: {e}")
+
+    def _activate(self, job: Dict[str, Any]):
+        pending = deque(self.store.pending_records(job["id"]))
+        self._jobs[job["id"]] = _ActiveJob(job["id"], job["client"], job["priority"], job["created"], pending)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _pick(self) -> Optional[_ActiveJob]:
+        """Highest priority first; then the client with least in flight, least recently served; then oldest job"""
+        candidates = [job for job in self._jobs.values() if job.pending]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda job: (
+            -job.priority,
+            self._in_flight_by_client.get(job.client, 0),
+            self._last_served.get(job.client, -1),
+            job.created,
+        ))
+
+    async def _run(self):
+        while True:
+            while self._in_flight < self.concurrency:
+                job = self._pick()
+                if job is None:
+                    break
+                # Another worker process may have cancelled the job in the shared store
+                if self.store.status(job.id) == "cancelled":
+                    job.pending.clear()
+                    if not job.tasks:
+                        self._retire(job)
+                    continue
+                self._dispatch(job, *job.pending.popleft())
+            self._wakeup.clear()
+            await self._wakeup.wait()
+
+    def _dispatch(self, job: _ActiveJob, index: int, record_id: str, fields: Dict[str, Any]):
+        if not job.started:
+            job.started = True
+            self.store.set_status(job.id, "running")
+        self._in_flight += 1
+        self._in_flight_by_client[job.client] = self._in_flight_by_client.get(job.client, 0) + 1
+        self._served += 1
+        self._last_served[job.client] = self._served
+        task = asyncio.create_task(self._run_one(job, index, record_id, fields))
+        job.tasks.add(task)
+
+    async def _run_one(self, job: _ActiveJob, index: int, record_id: str, fields: Dict[str, Any]):
+        try:
+            success, result = await self.run_record(fields)
+        except asyncio.CancelledError:
+            # Cancelled job or shutdown: the record keeps no result
+            result = None
+        except Exception as e:
+            success, result = False, {"success": False, "error": str(e)}
+
+        if result is not None:
+            self.store.save_result(job.id, index, success, result)
+            self._publish(job.id, "record", {"index": index, "id": record_id, "success": success})
+            self._publish(job.id, "progress", self.store.get(job.id))
+
+        job.tasks.discard(asyncio.current_task())
+        self._in_flight -= 1
+        self._in_flight_by_client[job.client] -= 1
+        if not self._in_flight_by_client[job.client]:
+            del self._in_flight_by_client[job.client]
+        # A job dropped from _jobs was taken over by another process, which finishes it
+        if not job.pending and not job.tasks and not self._stopping and self._jobs.get(job.id) is job:
+            self._retire(job)
+        self._wakeup.set()
+
+    def _retire(self, job: _ActiveJob):
+        """Drop a job with no work left and publish its final state"""
+        self._jobs.pop(job.id, None)
+        summary = self.store.get(job.id)
+        if summary is None:
+            return
+        # A job fails only when none of its records succeeded
+        if self.store.set_status(job.id, "failed" if summary["failed"] and not summary["succeeded"] else "completed"):
+            summary = self.store.get(job.id)
+        self._publish(job.id, "end", summary)
@@ -0,0 +1,247 @@
+"""
+Model lifecycle for the codon optimization server.
+
+`ModelLifecycle` tracks whether the model weights are resident and how many
+forward passes are using them. A watcher thread unloads them once they have
+been idle for `idle_seconds`, or as soon as they are idle while the process
+is over its memory budget. The next forward pass reloads them lazily and
+measures the cost. Loading is refused up front (`MemoryBudgetError`) when
+the current RSS plus the expected size of the weights would exceed the budget.
+
+`save_snapshot` / `load_snapshot` give reloads a fast path: the weights,
+already in the serving precision, are written once with torch.save and read
+back with torch.load(mmap=True) into a model built on the meta device, so a
+reload maps the file instead of copying a gigabyte of tensors, and pages
+come straight from the OS page cache when the file is still warm.
+"""
+
+import gc
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+from codon_metrics import process_rss_bytes
+
+PRECISIONS = ("float32", "bfloat16", "float16")
+
+UNLOADED = "unloaded"
+LOADING = "loading"
+LOADED = "loaded"
+UNLOADING = "unloading"
+
+
+class MemoryBudgetError(RuntimeError):
+    """Loading the model would take the process over its memory budget"""
+
+
+def trim_memory():
+    """Return freed heap pages to the OS (glibc only; a no-op elsewhere)"""
+    try:
+        import ctypes
+
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+class ModelLifecycle:
+    """Lazy load, idle unload and a memory budget around one model"""
+
+    def __init__(
+        self,
+        load: Callable[[], None],
+        unload: Callable[[], None],
+        idle_seconds: float = 0,
+        memory_budget_bytes: int = 0,
+        estimate_bytes: Callable[[], Optional[int]] = lambda: None,
+        rss: Callable[[], Optional[int]] = process_rss_bytes,
+    ):
+        self._load = load
+        self._unload = unload
+        self.idle_seconds = idle_seconds
+        self.memory_budget_bytes = memory_budget_bytes
+        self.estimate_bytes = estimate_bytes
+        self.rss = rss
+
+        self.state = UNLOADED
+        self.in_use = 0
+        self.last_used = time.monotonic()
+        self.loads = 0
+        self.unloads = 0
+        self.last_load_seconds: Optional[float] = None
+        self.last_unload_reason: Optional[str] = None
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+
+    def mark_loaded(self, seconds: Optional[float] = None):
+        """Record weights that were loaded outside the lifecycle (at startup)"""
+        with self._cond:
+            self.state = LOADED
+            self.last_load_seconds = seconds
+            self.last_used = time.monotonic()
+
+    def start(self):
+        """Start the idle/budget watcher (only needed when either is configured)"""
+        if (self.idle_seconds > 0 or self.memory_budget_bytes > 0) and self._watcher is None:
+            self._stop.clear()
+            self._watcher = threading.Thread(target=self._watch, name="model-lifecycle", daemon=True)
+            self._watcher.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join(timeout=5)
+            self._watcher = None
+
+    @contextmanager
+    def use(self):
+        """Hold the weights for one forward pass, reloading them first if they were unloaded"""
+        self.ensure_loaded()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.in_use -= 1
+                self.last_used = time.monotonic()
+
+    def ensure_loaded(self):
+        """Wait for any load/unload in progress, load if needed, and take a usage slot"""
+        with self._cond:
+            while self.state in (LOADING, UNLOADING):
+                self._cond.wait()
+            if self.state == LOADED:
+                self.in_use += 1
+                return
+            if not self.can_load():
+                raise MemoryBudgetError(
+                    f"Loading the model needs ~{self.estimate_bytes() / 2**20:.0f} MB on top of "
+                    f"{self.rss() / 2**20:.0f} MB resident, over the {self.memory_budget_bytes / 2**20:.0f} MB budget"
+                )
+            self.state = LOADING
+
+        started = time.perf_counter()
+        try:
+            self._load()
+        except BaseException:
+            with self._cond:
+                self.state = UNLOADED
+                self._cond.notify_all()
+            raise
+        seconds = time.perf_counter() - started
+        print(f"Model reloaded in {seconds * 1000:.0f} ms")
+        with self._cond:
+            self.state = LOADED
+            self.loads += 1
+            self.last_load_seconds = seconds
+            self.in_use += 1
+            self._cond.notify_all()
+
+    def load_in_background(self):
+        """Start a reload without waiting for it (requests meanwhile can be served another way)"""
+        if self.state != UNLOADED:
+            return
+
+        def load():
+            try:
+                with self.use():
+                    pass
+            except MemoryBudgetError as e:
+                print(f"Warning: {e}")
+            except Exception as e:
+                print(f"Error reloading model: {e}")
+
+        threading.Thread(target=load, name="model-reload", daemon=True).start()
+
+    def unload(self, reason: str) -> bool:
+        """Drop the weights if they are loaded and no forward pass is using them"""
+        with self._cond:
+            if self.state != LOADED or self.in_use:
+                return False
+            self.state = UNLOADING
+        try:
+            self._unload()
+            gc.collect()
+            trim_memory()
+        finally:
+            with self._cond:
+                self.state = UNLOADED
+                self.unloads += 1
+                self.last_unload_reason = reason
+                self._cond.notify_all()
+        print(f"Model unloaded ({reason}); resident memory now {(self.rss() or 0) / 2**20:.0f} MB")
+        return True
+
+    def can_load(self) -> bool:
+        """Whether the expected weights fit in the memory budget next to the current RSS"""
+        if self.memory_budget_bytes <= 0:
+            return True
+        rss, needed = self.rss(), self.estimate_bytes()
+        return rss is None or needed is None or rss + needed <= self.memory_budget_bytes
+
+    def over_budget(self) -> bool:
+        rss = self.rss()
+        return self.memory_budget_bytes > 0 and rss is not None and rss > self.memory_budget_bytes
+
+    def idle_for(self) -> float:
+        return 0.0 if self.in_use else time.monotonic() - self.last_used
+
+    def _watch(self):
+        interval = max(1.0, min(self.idle_seconds / 4, 30.0)) if self.idle_seconds > 0 else 5.0
+        while not self._stop.wait(interval):
+            if self.state != LOADED or self.in_use:
+                continue
+            if self.idle_seconds > 0 and self.idle_for() >= self.idle_seconds:
+                self.unload(f"idle for {self.idle_for():.0f} s")
+            elif self.over_budget():
+                self.unload("over the memory budget")
+
+    def summary(self) -> Dict[str, object]:
+        rss = self.rss()
+        return {
+            "state": self.state,
+            "in_use": self.in_use,
+            "idle_seconds": round(self.idle_for(), 1),
+            "idle_unload_seconds": self.idle_seconds or None,
+            "loads": self.loads,
+            "unloads": self.unloads,
+            "last_unload_reason": self.last_unload_reason,
+            "last_load_ms": round(self.last_load_seconds * 1000, 1) if self.last_load_seconds is not None else None,
+            "rss_bytes": rss,
+            "memory_budget_bytes": self.memory_budget_bytes or None,
+            "over_budget": self.over_budget(),
+        }
+
+
+def save_snapshot(model, path: str):
+    """Write every parameter and buffer of a model (tied tensors once) for load_snapshot"""
+    import torch
+
+    if os.path.exists(path):
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tensors = dict(model.named_parameters(remove_duplicate=False))
+    tensors.update(model.named_buffers(remove_duplicate=False))
+    tmp = f"{path}.tmp{os.getpid()}"
+    # torch.save keeps shared storages shared, so tied weights are stored once
+    torch.save({name: tensor.detach() for name, tensor in tensors.items()}, tmp)
+    os.replace(tmp, path)
+
+
+def load_snapshot(model_class, config, path: str):
+    """A model whose tensors are memory-mapped from a save_snapshot file"""
+    import torch
+
+    tensors = torch.load(path, mmap=True, weights_only=True)
+    with torch.device("meta"):
+        model = model_class(config)
+    for name, tensor in tensors.items():
+        module_name, _, attr = name.rpartition(".")
+        module = model.get_submodule(module_name)
+        if attr in module._parameters:
+            module._parameters[attr] = torch.nn.Parameter(tensor, requires_grad=False)
+        else:
+            module._buffers[attr] = tensor
+    return model.eval()
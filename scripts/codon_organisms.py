@@ -0,0 +1,137 @@
+"""
+Organism lookup for the codon optimization server.
+
+`OrganismIndex` is built once from CodonTransformer's ORGANISM2ID table. Names
+are normalized (lower case, punctuation folded to spaces) and indexed two ways:
+a sorted word list answers prefix queries by binary search, and a trigram
+posting list finds substring and misspelled matches without scanning every
+name. Results are ranked exact > name prefix > word prefix > substring >
+fuzzy, and ranked result lists are memoized per query so repeated
+autocomplete keystrokes are dictionary lookups.
+"""
+
+import bisect
+import hashlib
+import json
+import re
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+# Fraction of the query's trigrams a name must share to count as a fuzzy match
+FUZZY_THRESHOLD = 0.6
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+def normalize(text: str) -> str:
+    """Lower case, with runs of punctuation and whitespace folded to one space"""
+    return _NON_ALNUM.sub(" ", text.lower()).strip()
+
+
+def trigrams(normalized: str) -> List[str]:
+    """Distinct trigrams of a normalized string, padded so word starts and ends count"""
+    padded = f" {normalized} "
+    return list(dict.fromkeys(padded[i:i + 3] for i in range(len(padded) - 2)))
+
+
+@dataclass(frozen=True)
+class OrganismMatch:
+    name: str
+    id: int
+    score: float
+
+
+class OrganismIndex:
+    """Prefix and trigram index over organism names with relevance-ranked search"""
+
+    def __init__(self, organisms: Dict[str, int], memo_size: int = 4096):
+        self.names: List[str] = list(organisms)
+        self.ids: List[int] = [int(organisms[name]) for name in self.names]
+        self._normalized: List[str] = [normalize(name) for name in self.names]
+        self._by_id: Dict[int, int] = {organism_id: i for i, organism_id in enumerate(self.ids)}
+
+        # (key, entry, whole_name) sorted by key; whole names let multi-word prefixes match
+        words = set()
+        for entry, normalized in enumerate(self._normalized):
+            words.add((normalized, entry, True))
+            for word in normalized.split():
+                words.add((word, entry, False))
+        self._words: List[Tuple[str, int, bool]] = sorted(words)
+        self._word_keys: List[str] = [key for key, _, _ in self._words]
+
+        postings: Dict[str, List[int]] = {}
+        for entry, normalized in enumerate(self._normalized):
+            for gram in trigrams(normalized):
+                postings.setdefault(gram, []).append(entry)
+        self._postings: Dict[str, Tuple[int, ...]] = {gram: tuple(entries) for gram, entries in postings.items()}
+
+        self._memo: "OrderedDict[str, List[OrganismMatch]]" = OrderedDict()
+        self._memo_size = memo_size
+
+        # The full listing never changes, so it is serialized and hashed once
+        self.list_payload = json.dumps({"organisms": self.names, "count": len(self.names)}).encode()
+        self.etag = '"' + hashlib.sha256(self.list_payload).hexdigest()[:32] + '"'
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def name(self, organism_id: int) -> Optional[str]:
+        """Organism name for an ID, or None if unknown"""
+        entry = self._by_id.get(int(organism_id))
+        return self.names[entry] if entry is not None else None
+
+    def search(self, query: str, limit: int = 50, offset: int = 0) -> Tuple[int, List[OrganismMatch]]:
+        """Total number of matches and the requested page of them, best first"""
+        key = normalize(query)
+        ranked = self._memo.get(key)
+        if ranked is None:
+            ranked = self._rank(key)
+            self._memo[key] = ranked
+            while len(self._memo) > self._memo_size:
+                self._memo.popitem(last=False)
+        else:
+            self._memo.move_to_end(key)
+        return len(ranked), ranked[offset:offset + limit]
+
+    def _rank(self, query: str) -> List[OrganismMatch]:
+        if not query:
+            return [OrganismMatch(name, organism_id, 0.0) for name, organism_id in zip(self.names, self.ids)]
+
+        scores: Dict[int, float] = {}
+
+        def offer(entry: int, score: float):
+            if score > scores.get(entry, -1.0):
+                scores[entry] = score
+
+        # A numeric query may be an organism ID
+        if query.isdigit() and int(query) in self._by_id:
+            offer(self._by_id[int(query)], 1.0)
+
+        # Prefixes: binary search for the block of keys starting with the query
+        start = bisect.bisect_left(self._word_keys, query)
+        for key, entry, whole_name in self._words[start:]:
+            if not key.startswith(query):
+                break
+            coverage = len(query) / len(self._normalized[entry])
+            if whole_name:
+                offer(entry, 1.0 if key == query else 0.8 + 0.2 * coverage)
+            else:
+                offer(entry, 0.6 + 0.2 * coverage)
+
+        # Substrings and typos: names sharing enough of the query's trigrams
+        grams = trigrams(query)
+        if len(query) >= 3:
+            shared = Counter()
+            for gram in grams:
+                shared.update(self._postings.get(gram, ()))
+            for entry, count in shared.items():
+                containment = count / len(grams)
+                normalized = self._normalized[entry]
+                if query in normalized:
+                    offer(entry, 0.4 + 0.2 * len(query) / len(normalized))
+                elif containment >= FUZZY_THRESHOLD:
+                    offer(entry, 0.4 * containment)
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], len(self.names[item[0]]), self.names[item[0]]))
+        return [OrganismMatch(self.names[entry], self.ids[entry], round(score, 4)) for entry, score in ranked]
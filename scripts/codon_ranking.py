@@ -0,0 +1,123 @@
+"""
+Generate-and-rank scoring for the codon optimization server.
+
+A best_of request samples a pool of candidate sequences from one forward pass
+and keeps the best few under a weighted objective. Every objective term is
+computed for the whole pool at once with codon_analytics' flat-array
+operations, so scoring hundreds of candidates is a handful of NumPy passes
+rather than a Python loop per sequence.
+
+The score is `w_cai * CAI - sum(w_term * penalty_term)`, with penalties:
+    gc           |GC content - gc_target|
+    gc_window    how far the sliding-window GC extremes leave [low, high]
+    sites        hits of the forbidden restriction sites (both strands)
+    homopolymer  bases by which the longest single-base run exceeds the limit
+    repeats      fraction of k-mers that occur more than once in the sequence
+"""
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import codon_analytics
+
+OBJECTIVE_TERMS = ("cai", "gc", "gc_window", "sites", "homopolymer", "repeats")
+
+DEFAULT_OBJECTIVE: Dict[str, float] = {
+    "cai": 1.0,
+    "gc": 2.0,
+    "gc_window": 2.0,
+    "sites": 1.0,
+    "homopolymer": 0.25,
+    "repeats": 1.0,
+}
+
+
+@dataclass(frozen=True)
+class RankingTargets:
+    gc_target: float = 0.5
+    gc_window: int = 50
+    gc_window_low: float = 0.3
+    gc_window_high: float = 0.7
+    max_homopolymer: int = 5
+    repeat_k: int = 12
+
+
+def resolve_objective(weights: Optional[Dict[str, float]]) -> Dict[str, float]:
+    """Default weights with the caller's overrides applied; unknown terms are an error"""
+    unknown = sorted(set(weights or {}) - set(OBJECTIVE_TERMS))
+    if unknown:
+        raise ValueError(f"Unknown objective term(s) {', '.join(unknown)}; expected {', '.join(OBJECTIVE_TERMS)}")
+    return {**DEFAULT_OBJECTIVE, **(weights or {})}
+
+
+def score_candidates(
+    sequences: Sequence[str],
+    objective: Dict[str, float],
+    cai_weights: Optional[np.ndarray] = None,
+    site_motifs: Sequence[str] = (),
+    targets: RankingTargets = RankingTargets(),
+) -> Dict[str, np.ndarray]:
+    """Per-sequence metrics and the weighted objective ("score"), one array per key"""
+    batch = codon_analytics.encode(sequences)
+    gc = codon_analytics.gc_content(batch)
+    extremes = codon_analytics.gc_window_extremes(batch, targets.gc_window)
+    cai = codon_analytics.cai(batch, cai_weights) if cai_weights is not None else np.zeros(batch.size)
+    sites = codon_analytics.motif_counts(batch, site_motifs) if site_motifs else np.zeros(batch.size, dtype=np.int64)
+    longest = codon_analytics.longest_homopolymer(batch)
+    repeats = codon_analytics.repeat_fraction(batch, targets.repeat_k)
+
+    penalties = {
+        "gc": np.abs(gc - targets.gc_target),
+        "gc_window": (np.maximum(targets.gc_window_low - extremes[:, 0], 0.0)
+                      + np.maximum(extremes[:, 1] - targets.gc_window_high, 0.0)),
+        "sites": sites,
+        "homopolymer": np.maximum(longest - targets.max_homopolymer, 0),
+        "repeats": repeats,
+    }
+    score = objective["cai"] * cai
+    for term, penalty in penalties.items():
+        score = score - objective[term] * penalty
+
+    return {
+        "score": score,
+        "cai": cai,
+        "gc_content": gc,
+        "gc_window_min": extremes[:, 0],
+        "gc_window_max": extremes[:, 1],
+        "site_hits": sites,
+        "longest_homopolymer": longest,
+        "repeat_fraction": repeats,
+    }
+
+
+def rank_candidates(
+    sequences: Sequence[str],
+    top_k: int,
+    objective: Dict[str, float],
+    cai_weights: Optional[np.ndarray] = None,
+    site_motifs: Sequence[str] = (),
+    targets: RankingTargets = RankingTargets(),
+) -> Tuple[int, List[Tuple[int, Dict[str, float]]]]:
+    """
+    Number of distinct candidates, and the best top_k of them as (index into
+    sequences, scores) pairs, best first. Duplicates are scored once.
+    """
+    first_index = {}
+    for i, sequence in enumerate(sequences):
+        first_index.setdefault(sequence, i)
+    distinct = list(first_index)
+
+    scores = score_candidates(distinct, objective, cai_weights, site_motifs, targets)
+    # Stable sort keeps sampling order among ties
+    order = np.argsort(-scores["score"], kind="stable")[:top_k]
+
+    ranked = []
+    for rank, j in enumerate(order.tolist(), start=1):
+        entry = {"rank": rank}
+        for key, values in scores.items():
+            value = values[j]
+            entry[key] = int(value) if np.issubdtype(values.dtype, np.integer) else round(float(value), 6)
+        ranked.append((first_index[distinct[j]], entry))
+    return len(distinct), ranked
@@ -0,0 +1,344 @@
+"""
+Restriction site scanning for the codon optimization server.
+
+`SiteScanner` compiles every requested recognition site, and its reverse
+complement, into one Aho-Corasick automaton over A/C/G/T. It reports every
+hit in a single pass over the sequence. Degenerate IUPAC sites (R, Y, N, ...)
+and bracketed base classes such as GT[AC][GT]AC are expanded when the
+automaton is built. `SiteTracker` keeps the hit set of a sequence being
+edited up to date by rescanning only the window around each change, and
+`repair_sites` finds the cheapest synonymous recoding that removes every hit.
+"""
+
+import itertools
+import json
+import os
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+IUPAC_CODES: Dict[str, str] = {
+    'A': 'A', 'C': 'C', 'G': 'G', 'T': 'T', 'U': 'T',
+    'R': 'AG', 'Y': 'CT', 'S': 'CG', 'W': 'AT', 'K': 'GT', 'M': 'AC',
+    'B': 'CGT', 'D': 'AGT', 'H': 'ACT', 'V': 'ACG', 'N': 'ACGT',
+}
+
+COMPLEMENT: Dict[str, str] = {'A': 'T', 'C': 'G', 'G': 'C', 'T': 'A'}
+
+BASE_INDEX: Dict[str, int] = {'A': 0, 'C': 1, 'G': 2, 'T': 3, 'a': 0, 'c': 1, 'g': 2, 't': 3}
+
+# Upper bound on concrete sequences a single degenerate site may expand to
+MAX_SITE_EXPANSIONS = 65536
+
+
+def parse_site(pattern: str) -> List[str]:
+    """
+    Parse a recognition site into one string of allowed bases per position.
+    Accepts IUPAC codes and bracketed classes, e.g. 'GT[AC][GT]AC' or 'RGGNCCY'.
+    """
+    positions = []
+    i = 0
+    pattern = pattern.upper()
+    while i < len(pattern):
+        ch = pattern[i]
+        if ch == '[':
+            close = pattern.find(']', i)
+            if close == -1:
+                raise ValueError(f"Unclosed '[' in restriction site {pattern!r}")
+            allowed = set()
+            for code in pattern[i + 1:close]:
+                if code not in IUPAC_CODES:
+                    raise ValueError(f"Invalid base {code!r} in restriction site {pattern!r}")
+                allowed.update(IUPAC_CODES[code])
+            positions.append(''.join(sorted(allowed)))
+            i = close + 1
+            continue
+        if ch not in IUPAC_CODES:
+            raise ValueError(f"Invalid base {ch!r} in restriction site {pattern!r}")
+        positions.append(IUPAC_CODES[ch])
+        i += 1
+
+    if not positions:
+        raise ValueError("Empty restriction site")
+    return positions
+
+
+def reverse_complement_site(positions: Sequence[str]) -> List[str]:
+    """Reverse complement of a parsed (possibly degenerate) site"""
+    return [''.join(sorted(COMPLEMENT[b] for b in allowed)) for allowed in reversed(positions)]
+
+
+def expand_site(positions: Sequence[str]) -> List[str]:
+    """All concrete sequences matched by a parsed site"""
+    count = 1
+    for allowed in positions:
+        count *= len(allowed)
+    if count > MAX_SITE_EXPANSIONS:
+        raise ValueError(f"Restriction site is too degenerate ({count} expansions)")
+    return [''.join(combo) for combo in itertools.product(*positions)]
+
+
+def site_words(sites: Iterable[str]) -> List[str]:
+    """Every concrete sequence matched by any of the sites, on either strand"""
+    words: Set[str] = set()
+    for site in sites:
+        forward = parse_site(site)
+        words.update(expand_site(forward))
+        words.update(expand_site(reverse_complement_site(forward)))
+    return sorted(words)
+
+
+def load_enzyme_sites(path: str) -> Dict[str, str]:
+    """Read enzyme name -> recognition site from a restriction_enzymes.json file"""
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        data = json.load(f)
+    return {
+        name: info["recognition_site"]
+        for name, info in data.get("enzymes", {}).items()
+        if info.get("recognition_site")
+    }
+
+
+@dataclass(frozen=True)
+class SiteHit:
+    """One occurrence of a recognition site; end is exclusive"""
+    name: str
+    start: int
+    end: int
+    strand: str
+
+
+class SiteScanner:
+    """Aho-Corasick automaton over a fixed set of restriction sites (both strands)"""
+
+    def __init__(self, sites: Dict[str, str]):
+        self.names: List[str] = list(sites)
+        self.max_length = 0
+
+        goto: List[List[int]] = [[-1] * 4]
+        outputs: List[list] = [[]]
+        for name_index, name in enumerate(self.names):
+            forward = parse_site(sites[name])
+            reverse = reverse_complement_site(forward)
+            self.max_length = max(self.max_length, len(forward))
+
+            # Palindromic sites are reported once, on the forward strand
+            strands = [('+', forward)] if reverse == forward else [('+', forward), ('-', reverse)]
+            for strand, positions in strands:
+                payload = (name_index, strand, len(positions))
+                for word in expand_site(positions):
+                    node = 0
+                    for ch in word:
+                        b = BASE_INDEX[ch]
+                        if goto[node][b] == -1:
+                            goto.append([-1] * 4)
+                            outputs.append([])
+                            goto[node][b] = len(goto) - 1
+                        node = goto[node][b]
+                    if payload not in outputs[node]:
+                        outputs[node].append(payload)
+
+        # Breadth-first pass: failure links, folded into a complete transition table
+        fail = [0] * len(goto)
+        queue = deque()
+        for b in range(4):
+            child = goto[0][b]
+            if child == -1:
+                goto[0][b] = 0
+            else:
+                queue.append(child)
+        while queue:
+            node = queue.popleft()
+            for b in range(4):
+                child = goto[node][b]
+                if child == -1:
+                    goto[node][b] = goto[fail[node]][b]
+                else:
+                    fail[child] = goto[fail[node]][b]
+                    outputs[child].extend(p for p in outputs[fail[child]] if p not in outputs[child])
+                    queue.append(child)
+
+        self._delta = goto
+        self._outputs: List[Optional[Tuple]] = [tuple(out) if out else None for out in outputs]
+
+    def scan(self, seq: Sequence[str], start: int = 0, end: Optional[int] = None) -> List[SiteHit]:
+        """Every site hit lying entirely within seq[start:end], in one pass"""
+        end = len(seq) if end is None else min(end, len(seq))
+        delta = self._delta
+        outputs = self._outputs
+        names = self.names
+        hits = []
+        state = 0
+        for i in range(max(0, start), end):
+            b = BASE_INDEX.get(seq[i])
+            if b is None:
+                # Ambiguous bases in the sequence never match
+                state = 0
+                continue
+            state = delta[state][b]
+            out = outputs[state]
+            if out is not None:
+                for name_index, strand, length in out:
+                    hits.append(SiteHit(names[name_index], i - length + 1, i + 1, strand))
+        return hits
+
+    def advance(self, state: int, text: str) -> Tuple[int, int]:
+        """Feed text to the automaton from state; returns (new_state, sites completed)"""
+        delta = self._delta
+        outputs = self._outputs
+        completed = 0
+        for ch in text:
+            b = BASE_INDEX.get(ch)
+            if b is None:
+                state = 0
+                continue
+            state = delta[state][b]
+            if outputs[state] is not None:
+                completed += len(outputs[state])
+        return state, completed
+
+    def present(self, seq: Sequence[str]) -> Set[str]:
+        """Names of the sites found anywhere in seq"""
+        return {hit.name for hit in self.scan(seq)}
+
+    def tracker(self, seq: str) -> "SiteTracker":
+        return SiteTracker(self, seq)
+
+
+class SiteTracker:
+    """
+    Mutable sequence with an always-current set of site hits.
+    Each edit rescans only the bases within one site length of the change:
+    restarting the automaton max_length - 1 bases before the edit finds every
+    site that could overlap it, exactly as a scan from the start would.
+    """
+
+    def __init__(self, scanner: SiteScanner, seq: str):
+        self.scanner = scanner
+        self.seq = list(seq)
+        self._by_start: Dict[int, List[SiteHit]] = {}
+        self._counts: Dict[str, int] = {name: 0 for name in scanner.names}
+        self._add(scanner.scan(self.seq))
+
+    def _add(self, hits: Iterable[SiteHit]):
+        for hit in hits:
+            self._by_start.setdefault(hit.start, []).append(hit)
+            self._counts[hit.name] += 1
+
+    def hits(self) -> List[SiteHit]:
+        return [hit for start in sorted(self._by_start) for hit in self._by_start[start]]
+
+    def present(self) -> List[str]:
+        """Names of sites currently present, in scanner order"""
+        return [name for name in self.scanner.names if self._counts[name] > 0]
+
+    def sequence(self) -> str:
+        return ''.join(self.seq)
+
+    def replace(self, pos: int, text: str) -> None:
+        """Overwrite seq[pos:pos+len(text)] and update the hits around it"""
+        edit_end = pos + len(text)
+        reach = self.scanner.max_length - 1
+
+        # Drop hits overlapping the edited bases
+        for start in range(max(0, pos - reach), edit_end):
+            hits = self._by_start.get(start)
+            if not hits:
+                continue
+            kept = [hit for hit in hits if hit.end <= pos]
+            for hit in hits:
+                if hit.end > pos:
+                    self._counts[hit.name] -= 1
+            if kept:
+                self._by_start[start] = kept
+            else:
+                del self._by_start[start]
+
+        self.seq[pos:edit_end] = list(text)
+
+        window = self.scanner.scan(self.seq, pos - reach, edit_end + reach)
+        self._add(hit for hit in window if hit.start < edit_end and hit.end > pos)
+
+
+@dataclass
+class SiteRepair:
+    """Result of `repair_sites`"""
+    sequence: str
+    changes: int
+    cost: float
+    remaining_hits: int
+
+
+def repair_sites(
+    scanner: SiteScanner,
+    dna: str,
+    synonyms: Dict[str, List[str]],
+    change_costs: Optional[Dict[str, float]] = None,
+) -> SiteRepair:
+    """
+    Cheapest synonymous recoding of dna that avoids every site in scanner.
+
+    Viterbi pass over codons where the state is the automaton state reached
+    so far (the suffix that could still grow into a site). Paths are ranked
+    by (site hits, change cost), so the result removes every site whenever
+    that is possible at all; a non-zero remaining_hits proves it is not.
+    Each change costs change_costs[codon] (default 1), so the minimum is the
+    fewest codon changes unless costs are given. Runtime is linear in length.
+    """
+    full = len(dna) - len(dna) % 3
+    codons = [dna[i:i + 3] for i in range(0, full, 3)]
+    tail = dna[full:]
+
+    frontier: Dict[int, Tuple[int, float]] = {0: (0, 0.0)}
+    backpointers: List[Dict[int, Tuple[int, str]]] = []
+    transitions: Dict[Tuple[int, str], Tuple[int, int]] = {}
+
+    for codon in codons:
+        # The original codon goes first so ties keep the input unchanged
+        options = [codon] + [alt for alt in synonyms.get(codon, ()) if alt != codon]
+        step_cost = {
+            alt: 0.0 if alt == codon else (change_costs.get(alt, 1.0) if change_costs else 1.0)
+            for alt in options
+        }
+
+        next_frontier: Dict[int, Tuple[int, float]] = {}
+        pointers: Dict[int, Tuple[int, str]] = {}
+        for state, (hits, cost) in frontier.items():
+            for alt in options:
+                key = (state, alt)
+                moved = transitions.get(key)
+                if moved is None:
+                    moved = transitions[key] = scanner.advance(state, alt)
+                next_state, completed = moved
+                score = (hits + completed, cost + step_cost[alt])
+                best = next_frontier.get(next_state)
+                if best is None or score < best:
+                    next_frontier[next_state] = score
+                    pointers[next_state] = (state, alt)
+
+        backpointers.append(pointers)
+        frontier = next_frontier
+
+    # A trailing partial codon is kept as-is but can still complete a site
+    if tail:
+        frontier_with_tail = {}
+        for state, (hits, cost) in frontier.items():
+            next_state, completed = scanner.advance(state, tail)
+            frontier_with_tail[state] = (hits + completed, cost)
+        end_state = min(frontier_with_tail, key=frontier_with_tail.get)
+        hits, cost = frontier_with_tail[end_state]
+    else:
+        end_state = min(frontier, key=frontier.get)
+        hits, cost = frontier[end_state]
+
+    chosen = []
+    state = end_state
+    for pointers in reversed(backpointers):
+        state, alt = pointers[state]
+        chosen.append(alt)
+    chosen.reverse()
+
+    changes = sum(1 for old, new in zip(codons, chosen) if old != new)
+    return SiteRepair(sequence="".join(chosen) + tail, changes=changes, cost=cost, remaining_hits=hits)
@@ -0,0 +1,174 @@
+"""
+Model-free codon optimization for the codon optimization server.
+
+`CodonTableEngine` back-translates proteins from per-organism codon usage
+tables (files like src/data/ecoli_codon_usage.json). Each table is compiled
+into per-amino-acid codon and cumulative-frequency arrays, and a whole batch
+of proteins is translated with a few NumPy lookups, so answers take well
+under a millisecond. The server uses it when the model is loading or its
+queue is too long. Strategies:
+
+    max_cai          the most frequent codon for every amino acid
+    harmonize        codons in proportion to the organism's usage, spread evenly
+                     along the protein (deterministic)
+    weighted_random  codons drawn at random with the organism's usage frequencies
+"""
+
+import glob
+import json
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from codon_analytics import AA_LUT, CODONS
+from codon_organisms import normalize
+
+STRATEGIES = ("max_cai", "harmonize", "weighted_random")
+
+DEFAULT_TABLE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "data")
+
+AMINO_ACIDS = "ACDEFGHIKLMNPQRSTVWY*"
+MAX_SYNONYMS = 6
+
+# Residue byte -> amino acid index; '_' is CodonTransformer's stop token
+AA_INDEX = np.full(256, -1, dtype=np.int64)
+for _index, _aa in enumerate(AMINO_ACIDS):
+    AA_INDEX[ord(_aa)] = _index
+AA_INDEX[ord("_")] = AMINO_ACIDS.index("*")
+
+CODON_BYTES = np.frombuffer("".join(CODONS).encode("ascii"), dtype=np.uint8).reshape(64, 3)
+
+# Fractional part of k/phi: successive values fill [0, 1) evenly in any prefix
+_GOLDEN = (np.sqrt(5.0) - 1.0) / 2.0
+
+
+@dataclass
+class TablePrediction:
+    """One table-engine sequence, shaped like CodonTransformer's predictions"""
+    organism: str
+    protein: str
+    predicted_dna: str
+    strategy: str
+
+
+class CodonUsageTable:
+    """Codon frequencies of one organism compiled into per-amino-acid lookup arrays"""
+
+    def __init__(self, organism: str, frequencies: Dict[str, float], aliases: Sequence[str] = ()):
+        self.organism = organism
+        self.aliases = list(aliases)
+        self.choices = np.zeros((len(AMINO_ACIDS), MAX_SYNONYMS), dtype=np.int64)
+        # Padding past an amino acid's last codon is never selected (u < 1 <= 2)
+        self.cumulative = np.full((len(AMINO_ACIDS), MAX_SYNONYMS), 2.0)
+        self.best = np.zeros(len(AMINO_ACIDS), dtype=np.int64)
+
+        for aa_index, aa in enumerate(AMINO_ACIDS):
+            codons = [i for i, codon in enumerate(CODONS) if chr(AA_LUT[i]) == aa]
+            weights = np.array([max(frequencies.get(CODONS[i], 0.0), 0.0) for i in codons])
+            if weights.sum() <= 0:
+                weights = np.ones(len(codons))
+            weights = weights / weights.sum()
+            self.choices[aa_index, :len(codons)] = codons
+            self.cumulative[aa_index, :len(codons)] = np.cumsum(weights)
+            self.cumulative[aa_index, len(codons) - 1] = 1.0
+            self.best[aa_index] = codons[int(np.argmax(weights))]
+
+    @classmethod
+    def load(cls, path: str) -> "CodonUsageTable":
+        """Read a codon usage JSON file ({"organism", "codons": {codon: {"frequency"}}, optional "aliases"})"""
+        with open(path) as f:
+            data = json.load(f)
+        frequencies = {codon.upper(): info["frequency"] for codon, info in data["codons"].items()}
+        return cls(data["organism"], frequencies, data.get("aliases", ()))
+
+    def pick(self, aa: np.ndarray, u: np.ndarray) -> np.ndarray:
+        """Codon index per residue for amino acid indices and uniform draws in [0, 1)"""
+        slot = (u[:, None] >= self.cumulative[aa]).sum(axis=1)
+        return self.choices[aa, slot]
+
+
+class CodonTableEngine:
+    """Per-organism codon usage tables and vectorized back-translation"""
+
+    def __init__(self, tables: Sequence[CodonUsageTable] = ()):
+        self.tables = list(tables)
+
+    @classmethod
+    def load_directory(cls, directory: str = DEFAULT_TABLE_DIR) -> "CodonTableEngine":
+        """Every *_codon_usage.json table in a directory (unreadable files are skipped)"""
+        tables = []
+        for path in sorted(glob.glob(os.path.join(directory, "*_codon_usage.json"))):
+            try:
+                tables.append(CodonUsageTable.load(path))
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Warning: skipping codon usage table {path}: {e}")
+        return cls(tables)
+
+    @property
+    def organisms(self) -> List[str]:
+        return [table.organism for table in self.tables]
+
+    def table_for(self, organism: str) -> Optional[CodonUsageTable]:
+        """
+        The table for an organism name: an exact or alias match, else a table of
+        the same species (e.g. "Escherichia coli general" uses the E. coli K-12 table)
+        """
+        key = normalize(organism)
+        for table in self.tables:
+            if key in (normalize(name) for name in [table.organism] + table.aliases):
+                return table
+        words = key.split()
+        for table in self.tables:
+            if len(words) >= 2 and normalize(table.organism).split()[:2] == words[:2]:
+                return table
+        return None
+
+    def optimize(
+        self,
+        proteins: Sequence[str],
+        table: CodonUsageTable,
+        strategy: str = "max_cai",
+        rng: Optional[np.random.Generator] = None,
+    ) -> List[str]:
+        """
+        Back-translate proteins (each gets one stop codon) into DNA, all in one pass.
+        Raises ValueError for residues outside the 20 standard amino acids.
+        """
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown strategy {strategy!r}; expected one of {', '.join(STRATEGIES)}")
+        cleaned = ["".join(protein.split()).upper().rstrip("*_") + "*" for protein in proteins]
+        lengths = np.fromiter((len(p) for p in cleaned), dtype=np.int64, count=len(cleaned))
+        aa = AA_INDEX[np.frombuffer("".join(cleaned).encode("ascii", "replace"), dtype=np.uint8)]
+        if (aa < 0).any():
+            bad = sorted({p[i] for p in cleaned for i in range(len(p)) if AA_INDEX[ord(p[i]) & 0xFF] < 0})
+            raise ValueError(f"Invalid amino acid(s) for table-based optimization: {', '.join(bad)}")
+
+        if strategy == "max_cai":
+            codons = table.best[aa]
+        elif strategy == "weighted_random":
+            codons = table.pick(aa, (rng or np.random.default_rng()).random(len(aa)))
+        else:
+            codons = table.pick(aa, harmonized_draws(aa, lengths))
+
+        dna = CODON_BYTES[codons].tobytes().decode("ascii")
+        offsets = np.concatenate(([0], np.cumsum(lengths * 3)))
+        return [dna[offsets[i]:offsets[i + 1]] for i in range(len(cleaned))]
+
+
+def harmonized_draws(aa: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """
+    Low-discrepancy draw per residue: the k-th occurrence of an amino acid in a
+    protein gets frac(k / phi), so each protein uses every codon in proportion
+    to its frequency, interleaved rather than in blocks.
+    """
+    protein = np.repeat(np.arange(len(lengths)), lengths)
+    key = protein * len(AMINO_ACIDS) + aa
+    order = np.argsort(key, kind="stable")
+    sorted_key = key[order]
+    group_start = np.flatnonzero(np.concatenate(([True], sorted_key[1:] != sorted_key[:-1])))
+    group_sizes = np.diff(np.append(group_start, len(key)))
+    occurrence = np.empty(len(key), dtype=np.int64)
+    occurrence[order] = np.arange(len(key)) - np.repeat(group_start, group_sizes)
+    return np.mod((occurrence + 1) * _GOLDEN, 1.0)
@@ -6,22 +6,148 @@ that match the original pycaret model, then exports to ONNX for use with ONNX Ru
 
 The model achieves ~93% accuracy (R² = 0.93) matching the original.
 
+The ten cross-validation folds train in parallel processes, each with a share
+of the cores as its CatBoost thread count so the machine is not
+oversubscribed. Trained artifacts are cached under scripts/.model_cache/ in
+a directory named by a hash of the dataset, features, parameters and CatBoost
+version; when none of those changed, training and export are skipped and the
+cached model is copied into place.
+
 Usage:
     python scripts/convert_model_to_onnx.py
+    python scripts/convert_model_to_onnx.py --jobs 4     # at most 4 folds at once
+    python scripts/convert_model_to_onnx.py --no-cache   # always retrain
+    python scripts/convert_model_to_onnx.py --sweep --tolerance 0.01 --report sweep.json
+
+--sweep builds compact variants (shallower trees, fewer iterations, pruned
+tree counts), benchmarks each under onnxruntime for single-row latency and
+throughput at batch sizes 1 to 10,000, and exports the smallest, then
+fastest, variant whose CV R² is within --tolerance of the baseline.
 
 Output:
     public/models/water_solubility_model.onnx
 """
 
+import argparse
+import hashlib
+import json
+import multiprocessing
 import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
 import numpy as np
 import pandas as pd
 from catboost import CatBoostRegressor
-from sklearn.model_selection import train_test_split, cross_val_score
+from sklearn.model_selection import KFold, train_test_split
 from sklearn.metrics import r2_score, mean_absolute_error, mean_squared_error
 
-
-def train_and_export():
+FEATURE_NAMES = ["MolLogP", "MolWt", "NumRotatableBonds", "AromaticProportion"]
+TARGET = "LogS"
+CV_FOLDS = 10
+
+# Parameters similar to default pycaret CatBoost settings
+MODEL_PARAMS = {
+    "iterations": 1000,
+    "learning_rate": 0.1,
+    "depth": 6,
+    "loss_function": "RMSE",
+    "random_seed": 42,
+}
+HOLDOUT_PARAMS = {**MODEL_PARAMS, "early_stopping_rounds": 50}
+SPLIT = {"test_size": 0.2, "random_state": 42}
+
+ONNX_EXPORT_PARAMETERS = {
+    'onnx_domain': 'ai.catboost',
+    'onnx_model_version': 1,
+}
+
+# Candidate models for --sweep: training parameter overrides and an optional
+# tree count to prune to (the first N trees carry most of a boosted model)
+VARIANTS = {
+    "baseline": {"params": {}, "trees": None},
+    "depth4": {"params": {"depth": 4}, "trees": None},
+    "depth5-500": {"params": {"depth": 5, "iterations": 500}, "trees": None},
+    "iter300": {"params": {"iterations": 300}, "trees": None},
+    "pruned500": {"params": {}, "trees": 500},
+    "pruned250": {"params": {}, "trees": 250},
+    "depth4-pruned300": {"params": {"depth": 4}, "trees": 300},
+}
+BENCHMARK_BATCH_SIZES = (1, 10, 100, 1000, 10000)
+DEFAULT_TOLERANCE = 0.01
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".model_cache")
+
+
+@contextmanager
+def stage(timings, name):
+    """Record the wall time of a pipeline stage"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = time.perf_counter() - start
+
+
+def available_cpus():
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def artifact_key(data_path, settings=None):
+    """Hash of everything that determines the trained model and its export"""
+    import catboost
+
+    digest = hashlib.sha256()
+    with open(data_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    digest.update(json.dumps({
+        "features": FEATURE_NAMES,
+        "target": TARGET,
+        "cv_folds": CV_FOLDS,
+        "onnx": ONNX_EXPORT_PARAMETERS,
+        "catboost": catboost.__version__,
+        **(settings or {"model": MODEL_PARAMS, "holdout": HOLDOUT_PARAMS, "split": SPLIT}),
+    }, sort_keys=True).encode())
+    return digest.hexdigest()[:16]
+
+
+def fit_model(X, y, params=MODEL_PARAMS, trees=None, thread_count=-1):
+    """Fit a CatBoost model, keeping only its first `trees` trees when pruning"""
+    model = CatBoostRegressor(**params, thread_count=thread_count, verbose=False)
+    model.fit(X, y, verbose=False)
+    if trees is not None and trees < model.tree_count_:
+        model.shrink(ntree_end=trees)
+    return model
+
+
+def fit_fold(X, y, train_index, test_index, thread_count, params=MODEL_PARAMS, trees=None):
+    """Train one cross-validation fold and return its R² (runs in a worker process)"""
+    model = fit_model(X[train_index], y[train_index], params, trees, thread_count)
+    return r2_score(y[test_index], model.predict(X[test_index]))
+
+
+def cross_validate(X, y, jobs, params=MODEL_PARAMS, trees=None):
+    """R² of each fold, with the folds spread over `jobs` processes sharing the cores"""
+    # Same unshuffled folds as cross_val_score(cv=10)
+    folds = list(KFold(n_splits=CV_FOLDS).split(X))
+    jobs = max(1, min(jobs, len(folds)))
+    thread_count = max(1, available_cpus() // jobs)
+    print(f"  {len(folds)} folds on {jobs} processes x {thread_count} CatBoost threads")
+    if jobs == 1:
+        return np.array([fit_fold(X, y, train, test, thread_count, params, trees) for train, test in folds])
+
+    # spawn: CatBoost's thread pool from the holdout fit must not be forked
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = [pool.submit(fit_fold, X, y, train, test, thread_count, params, trees) for train, test in folds]
+        return np.array([future.result() for future in futures])
+
+
+def train_and_export(jobs=None, use_cache=True, cache_dir=DEFAULT_CACHE_DIR):
     script_dir = os.path.dirname(os.path.abspath(__file__))
     data_path = os.path.join(script_dir, "delaney_processed.csv")
 
@@ -34,45 +160,91 @@ def train_and_export():
     print("Water Solubility Model Training & ONNX Export")
     print("=" * 60)
 
+    timings = {}
+
     # Load training data
     print(f"\nLoading training data from {data_path}...")
-    df = pd.read_csv(data_path)
+    with stage(timings, "load"):
+        df = pd.read_csv(data_path)
+        key = artifact_key(data_path)
     print(f"Dataset size: {len(df)} compounds")
 
     # Features and target
-    feature_names = ["MolLogP", "MolWt", "NumRotatableBonds", "AromaticProportion"]
+    feature_names = FEATURE_NAMES
     X = df[feature_names].values
-    y = df["LogS"].values
+    y = df[TARGET].values
 
     print(f"Features: {feature_names}")
     print(f"Target: LogS (log10 mol/L)")
 
+    artifact_dir = os.path.join(cache_dir, key)
+    if use_cache and os.path.exists(os.path.join(artifact_dir, "metrics.json")):
+        print(f"\n✓ Cached artifacts for {key} (dataset, features and parameters unchanged)")
+        with stage(timings, "cache"):
+            with open(os.path.join(artifact_dir, "metrics.json")) as f:
+                metrics = json.load(f)
+            shutil.copyfile(os.path.join(artifact_dir, "model.onnx"), output_path)
+            final_model = CatBoostRegressor()
+            final_model.load_model(os.path.join(artifact_dir, "model.cbm"))
+        print("\nCached Model Performance:")
+        print(f"  Test R² Score: {metrics['r2_test']:.4f}")
+        print(f"  CV R² Score: {metrics['cv_r2_mean']:.4f} (+/- {metrics['cv_r2_std'] * 2:.4f})")
+        print(f"  Final R² Score (training data): {metrics['r2_final']:.4f}")
+        print(f"Model copied to {output_path}")
+    else:
+        final_model, metrics = train(X, y, output_path, timings, jobs or available_cpus())
+        if use_cache:
+            with stage(timings, "cache"):
+                store_artifacts(artifact_dir, final_model, output_path, metrics, timings)
+            print(f"Cached artifacts as {key}")
+
+    verify(final_model, output_path, X, timings)
+
+    # File size
+    file_size = os.path.getsize(output_path)
+    print(f"\nONNX model size: {file_size / 1024:.1f} KB")
+
+    print("\nStage timings:")
+    for name, seconds in timings.items():
+        print(f"  {name:<18}{seconds:8.2f} s")
+    print(f"  {'total':<18}{sum(timings.values()):8.2f} s")
+
+    print("\n" + "=" * 60)
+    print("Export complete! Model ready for browser-based inference.")
+    print("=" * 60)
+
+    return True
+
+
+def store_artifacts(artifact_dir, final_model, output_path, metrics, timings):
+    """Write the model, its ONNX export and metrics into the cache (atomically)"""
+    staging = f"{artifact_dir}.tmp{os.getpid()}"
+    os.makedirs(staging, exist_ok=True)
+    final_model.save_model(os.path.join(staging, "model.cbm"))
+    shutil.copyfile(output_path, os.path.join(staging, "model.onnx"))
+    with open(os.path.join(staging, "metrics.json"), "w") as f:
+        json.dump({**metrics, "training_timings": dict(timings)}, f, indent=2)
+    shutil.rmtree(artifact_dir, ignore_errors=True)
+    os.replace(staging, artifact_dir)
+
+
+def train(X, y, output_path, timings, jobs):
+    """Holdout evaluation, parallel cross-validation, final fit and ONNX export"""
+
     # Split data (80/20 as in original)
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.2, random_state=42
-    )
+    X_train, X_test, y_train, y_test = train_test_split(X, y, **SPLIT)
     print(f"\nTrain set: {len(X_train)} samples")
     print(f"Test set: {len(X_test)} samples")
 
-    # Train CatBoost model
-    # Using parameters similar to default pycaret CatBoost settings
+    # Train CatBoost model (with early stopping on the test set)
     print("\nTraining CatBoost model...")
-    model = CatBoostRegressor(
-        iterations=1000,
-        learning_rate=0.1,
-        depth=6,
-        loss_function='RMSE',
-        random_seed=42,
-        verbose=False,
-        # Early stopping
-        early_stopping_rounds=50,
-    )
-
-    model.fit(
-        X_train, y_train,
-        eval_set=(X_test, y_test),
-        verbose=False
-    )
+    with stage(timings, "holdout"):
+        model = CatBoostRegressor(**HOLDOUT_PARAMS, verbose=False)
+        model.fit(
+            X_train, y_train,
+            eval_set=(X_test, y_test),
+            verbose=False
+        )
 
     # Evaluate on test set
     y_pred_test = model.predict(X_test)
@@ -86,31 +258,16 @@ def train_and_export():
     print(f"  RMSE: {rmse_test:.4f}")
 
     # Cross-validation for more robust estimate
-    print("\nRunning 10-fold cross-validation...")
-    cv_scores = cross_val_score(
-        CatBoostRegressor(
-            iterations=1000,
-            learning_rate=0.1,
-            depth=6,
-            loss_function='RMSE',
-            random_seed=42,
-            verbose=False,
-        ),
-        X, y, cv=10, scoring='r2'
-    )
+    print(f"\nRunning {CV_FOLDS}-fold cross-validation...")
+    with stage(timings, "cross_validation"):
+        cv_scores = cross_validate(X, y, jobs)
     print(f"  CV R² Score: {cv_scores.mean():.4f} (+/- {cv_scores.std() * 2:.4f})")
 
     # Train final model on all data for deployment
     print("\nTraining final model on all data...")
-    final_model = CatBoostRegressor(
-        iterations=1000,
-        learning_rate=0.1,
-        depth=6,
-        loss_function='RMSE',
-        random_seed=42,
-        verbose=False,
-    )
-    final_model.fit(X, y, verbose=False)
+    with stage(timings, "final"):
+        final_model = CatBoostRegressor(**MODEL_PARAMS, verbose=False)
+        final_model.fit(X, y, verbose=False)
 
     # Evaluate final model
     y_pred_all = final_model.predict(X)
@@ -125,17 +282,31 @@ def train_and_export():
 
     # Export to ONNX
     print(f"\nExporting to ONNX format...")
-    final_model.save_model(
-        output_path,
-        format="onnx",
-        export_parameters={
-            'onnx_domain': 'ai.catboost',
-            'onnx_model_version': 1,
-        }
-    )
+    with stage(timings, "export"):
+        final_model.save_model(
+            output_path,
+            format="onnx",
+            export_parameters=ONNX_EXPORT_PARAMETERS,
+        )
     print(f"Model saved to {output_path}")
 
-    # Verify ONNX model
+    metrics = {
+        "r2_test": float(r2_test),
+        "mae_test": float(mae_test),
+        "rmse_test": float(rmse_test),
+        "cv_r2": [float(score) for score in cv_scores],
+        "cv_r2_mean": float(cv_scores.mean()),
+        "cv_r2_std": float(cv_scores.std()),
+        "r2_final": float(r2_final),
+        "mae_final": float(mae_final),
+        "rmse_final": float(rmse_final),
+    }
+    return final_model, metrics
+
+
+def verify(final_model, output_path, X, timings):
+    """Check the ONNX export against CatBoost and print sample predictions"""
+    start = time.perf_counter()
     try:
         import onnxruntime as ort
 
@@ -188,18 +359,184 @@ def train_and_export():
 
     except ImportError:
         print("\nNote: Install onnxruntime to verify: pip install onnxruntime")
+    timings["verify"] = time.perf_counter() - start
+
+
+def build_variant(name, X, y, data_path, jobs, use_cache, cache_dir, timings):
+    """Cross-validate, fit and export one sweep variant (or reuse its cached artifacts)"""
+    variant = VARIANTS[name]
+    params = {**MODEL_PARAMS, **variant["params"]}
+    key = artifact_key(data_path, {"model": params, "trees": variant["trees"]})
+    artifact_dir = os.path.join(cache_dir, key)
+    if use_cache and os.path.exists(os.path.join(artifact_dir, "metrics.json")):
+        print(f"  {name}: cached ({key})")
+        with open(os.path.join(artifact_dir, "metrics.json")) as f:
+            return artifact_dir, json.load(f)
+
+    settings = [f"{k}={v}" for k, v in variant["params"].items()]
+    if variant["trees"]:
+        settings.append(f"pruned to {variant['trees']} trees")
+    print(f"  {name}: training ({', '.join(settings) or 'defaults'})")
+    with stage(timings, f"{name}: cross_validation"):
+        cv_scores = cross_validate(X, y, jobs, params, variant["trees"])
+    with stage(timings, f"{name}: final"):
+        model = fit_model(X, y, params, variant["trees"])
+    metrics = {
+        "variant": name,
+        "depth": params["depth"],
+        "trees": int(model.tree_count_),
+        "cv_r2": [float(score) for score in cv_scores],
+        "cv_r2_mean": float(cv_scores.mean()),
+        "cv_r2_std": float(cv_scores.std()),
+    }
+    with stage(timings, f"{name}: export"):
+        staging = f"{artifact_dir}.tmp{os.getpid()}"
+        os.makedirs(staging, exist_ok=True)
+        model.save_model(os.path.join(staging, "model.cbm"))
+        model.save_model(os.path.join(staging, "model.onnx"), format="onnx",
+                         export_parameters=ONNX_EXPORT_PARAMETERS)
+        with open(os.path.join(staging, "metrics.json"), "w") as f:
+            json.dump(metrics, f, indent=2)
+        shutil.rmtree(artifact_dir, ignore_errors=True)
+        os.replace(staging, artifact_dir)
+    return artifact_dir, metrics
+
+
+def benchmark(onnx_path, X, batch_sizes=BENCHMARK_BATCH_SIZES, min_seconds=0.2):
+    """Single-row latency and batched throughput under onnxruntime"""
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    # One thread, like ONNX Runtime Web's default wasm backend
+    options.intra_op_num_threads = 1
+    options.inter_op_num_threads = 1
+    session = ort.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+    input_name = session.get_inputs()[0].name
+    rows = X.astype(np.float32)
+
+    latencies = []
+    for i in range(500):
+        row = rows[i % len(rows)][None, :]
+        start = time.perf_counter()
+        session.run(None, {input_name: row})
+        latencies.append(time.perf_counter() - start)
+
+    throughput = {}
+    for batch_size in batch_sizes:
+        batch = np.resize(rows, (batch_size, rows.shape[1]))
+        session.run(None, {input_name: batch})  # warm up
+        runs = 0
+        start = time.perf_counter()
+        while runs < 3 or time.perf_counter() - start < min_seconds:
+            session.run(None, {input_name: batch})
+            runs += 1
+        throughput[batch_size] = batch_size * runs / (time.perf_counter() - start)
+
+    return {
+        "latency_p50_us": float(np.percentile(latencies, 50) * 1e6),
+        "latency_p95_us": float(np.percentile(latencies, 95) * 1e6),
+        "rows_per_second": {str(size): float(rate) for size, rate in throughput.items()},
+    }
+
+
+def select_variant(results, tolerance):
+    """The smallest (then fastest) variant whose CV R² is within tolerance of the baseline"""
+    floor = results["baseline"]["cv_r2_mean"] - tolerance
+    eligible = [r for r in results.values() if r["cv_r2_mean"] >= floor]
+    return min(eligible, key=lambda r: (r["size_bytes"], r["latency_p50_us"]))
+
+
+def sweep_and_export(jobs=None, use_cache=True, cache_dir=DEFAULT_CACHE_DIR, tolerance=DEFAULT_TOLERANCE,
+                     report_path=None):
+    """Build every variant, benchmark them, and export the smallest/fastest accurate one"""
+    try:
+        import onnxruntime  # noqa: F401
+    except ImportError:
+        print("⚠ The sweep benchmarks with onnxruntime: pip install onnxruntime")
+        return False
 
-    # File size
-    file_size = os.path.getsize(output_path)
-    print(f"\nONNX model size: {file_size / 1024:.1f} KB")
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    data_path = os.path.join(script_dir, "delaney_processed.csv")
+    output_dir = os.path.join(script_dir, "..", "public", "models")
+    os.makedirs(output_dir, exist_ok=True)
+    output_path = os.path.join(output_dir, "water_solubility_model.onnx")
+
+    print("=" * 60)
+    print("Water Solubility Model Variant Sweep")
+    print("=" * 60)
+
+    timings = {}
+    df = pd.read_csv(data_path)
+    X = df[FEATURE_NAMES].values
+    y = df[TARGET].values
+    print(f"\nBuilding {len(VARIANTS)} variants from {len(df)} compounds...")
+
+    results = {}
+    for name in VARIANTS:
+        artifact_dir, metrics = build_variant(name, X, y, data_path, jobs or available_cpus(), use_cache,
+                                              cache_dir, timings)
+        onnx_path = os.path.join(artifact_dir, "model.onnx")
+        with stage(timings, f"{name}: benchmark"):
+            results[name] = {
+                **metrics,
+                "variant": name,
+                "artifact_dir": artifact_dir,
+                "size_bytes": os.path.getsize(onnx_path),
+                **benchmark(onnx_path, X),
+            }
+
+    print(f"\n{'variant':<18}{'trees':>6}{'depth':>6}{'size KB':>9}{'CV R²':>8}{'p50 µs':>8}"
+          + "".join(f"{f'rows/s@{size}':>14}" for size in BENCHMARK_BATCH_SIZES))
+    for name, r in results.items():
+        print(f"{name:<18}{r['trees']:>6}{r['depth']:>6}{r['size_bytes'] / 1024:>9.1f}{r['cv_r2_mean']:>8.4f}"
+              f"{r['latency_p50_us']:>8.1f}"
+              + "".join(f"{r['rows_per_second'][str(size)]:>14,.0f}" for size in BENCHMARK_BATCH_SIZES))
+
+    chosen = select_variant(results, tolerance)
+    baseline = results["baseline"]
+    print(f"\nSelected {chosen['variant']} (CV R² within {tolerance} of baseline {baseline['cv_r2_mean']:.4f}):")
+    print(f"  Size: {chosen['size_bytes'] / 1024:.1f} KB vs {baseline['size_bytes'] / 1024:.1f} KB")
+    print(f"  Single-row latency: {chosen['latency_p50_us']:.1f} µs vs {baseline['latency_p50_us']:.1f} µs")
+    print(f"  CV R²: {chosen['cv_r2_mean']:.4f} vs {baseline['cv_r2_mean']:.4f}")
+
+    shutil.copyfile(os.path.join(chosen["artifact_dir"], "model.onnx"), output_path)
+    print(f"Model saved to {output_path}")
+    final_model = CatBoostRegressor()
+    final_model.load_model(os.path.join(chosen["artifact_dir"], "model.cbm"))
+    verify(final_model, output_path, X, timings)
+
+    if report_path:
+        with open(report_path, "w") as f:
+            json.dump({"tolerance": tolerance, "selected": chosen["variant"], "variants": results,
+                       "timings": timings}, f, indent=2)
+        print(f"\nReport written to {report_path}")
+
+    print("\nStage timings:")
+    for name, seconds in timings.items():
+        print(f"  {name:<32}{seconds:8.2f} s")
 
     print("\n" + "=" * 60)
     print("Export complete! Model ready for browser-based inference.")
     print("=" * 60)
-
     return True
 
 
 if __name__ == "__main__":
-    success = train_and_export()
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=0,
+                        help="Cross-validation folds trained at once (default: one per core, up to 10)")
+    parser.add_argument("--no-cache", action="store_true", help="Retrain even if cached artifacts match")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="Artifact cache directory")
+    parser.add_argument("--sweep", action="store_true",
+                        help="Build and benchmark the compact variants and export the smallest accurate one")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Largest CV R² drop from the baseline a --sweep variant may have")
+    parser.add_argument("--report", help="Write the --sweep results as JSON to this path")
+    args = parser.parse_args()
+
+    if args.sweep:
+        success = sweep_and_export(jobs=args.jobs or None, use_cache=not args.no_cache, cache_dir=args.cache_dir,
+                                   tolerance=args.tolerance, report_path=args.report)
+    else:
+        success = train_and_export(jobs=args.jobs or None, use_cache=not args.no_cache, cache_dir=args.cache_dir)
     exit(0 if success else 1)
@@ -0,0 +1,211 @@
+"""
+Export the CodonTransformer model for the optimized CPU backends and verify them.
+
+Exports BigBirdForMaskedLM (full attention) to ONNX, then runs a reference
+protein set through every backend (PyTorch eager, PyTorch dynamic int8 and
+ONNX Runtime) and compares them with eager: argmax codon agreement, maximum
+logit difference and per-request latency. The comparison is written to a JSON
+report next to the model, which documents the accuracy drift of each backend.
+
+Usage:
+    python scripts/export_codon_model.py
+    python scripts/export_codon_model.py --skip-export   # verify an existing export
+    python scripts/export_codon_model.py --save-local DIR   # offline safetensors copy
+
+Output:
+    scripts/models/codon_transformer.onnx
+    scripts/models/codon_backends_report.json
+
+Serve with:
+    python scripts/codon_api.py --backend onnx    (or --backend int8)
+    python scripts/codon_api.py --model-dir DIR   (memory-mapped local weights, no hub access)
+"""
+
+import argparse
+import json
+import os
+import statistics
+import time
+
+import torch
+from transformers import AutoTokenizer, BigBirdForMaskedLM
+from CodonTransformer.CodonData import get_merged_seq
+from CodonTransformer.CodonPrediction import tokenize
+
+from codon_backends import BACKENDS, DEFAULT_ONNX_PATH, ONNX_INPUTS, load_backend
+
+MODEL_ID = "adibvafa/CodonTransformer"
+REFERENCE_ORGANISM = "Escherichia coli general"
+
+# Proteins from src/constants/examples.ts plus two common expression targets
+REFERENCE_PROTEINS = {
+    "GFP": "MSKGEELFTGVVPILVELDGDVNGHKFSVSGEGEGDATYGKLTLKFICTTGKLPVPWPTLVTTFSYGVQCFSRYPDHMKQHDFFKSAMPEGYVQERTIFFKDDGNYKTRAEVKFEGDTLVNRIELKGIDFKEDGNILGHKLEYNYNSHNVYIMADKQKNGIKVNFKIRHNIEDGSVQLADHYQQNTPIGDGPVLLPDNHYLSTQSALSKDPNEKRDHMVLLEFVTAAGITHGMDELYK",
+    "Insulin": "MALWMRLLPLLALLALWGPDPAAAFVNQHLCGSHLVEALYLVCGERGFFYTPKTRREAEDLQVGQVELGGGPGAGSLQPLALEGSLQKRGIVEQCCTSICSLYQLENYCN",
+    "LL-37": "LLGDFFRKSKEKIGKEFKRIVQRIKDFLRNLVPRTES",
+    "Ubiquitin": "MQIFVKTLTGKTITLEVEPSDTIENVKAKIQDKEGIPPDQQRLIFAGKQLEDGRTLSDYNIQKESTLHLVLRLRGG",
+    "T4 lysozyme": "MNIFEMLRIDEGLRLKIYKDTEGYYTIGIGHLLTKSPSLNAAKSELDKAIGRNTNGVITKDEAEKLFNQDVDAAVRGILRNAKLKPVYDSLDAVRRCALINMVFQMGETGVAGFTNSLRMLQQKRWDEAAVNLAKSRWYNQTPNRAKRVITTFRTGTWDAYKNL",
+}
+
+
+class LogitsOnly(torch.nn.Module):
+    """Wraps the model so the exported graph has a single 'logits' output"""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask, token_type_ids):
+        return self.model(
+            input_ids=input_ids,
+            attention_mask=attention_mask,
+            token_type_ids=token_type_ids,
+            return_dict=True,
+        ).logits
+
+
+def tokenize_proteins(tokenizer, proteins, organism_id):
+    batch = [
+        {"idx": i, "codons": get_merged_seq(protein=protein, dna=""), "organism": organism_id}
+        for i, protein in enumerate(proteins)
+    ]
+    return tokenize(batch, tokenizer=tokenizer)
+
+
+def export_onnx(model, tokenizer, organism_id, output_path, revision):
+    import onnx
+
+    sample = tokenize_proteins(tokenizer, [REFERENCE_PROTEINS["Ubiquitin"]], organism_id)
+    dynamic = {0: "batch", 1: "sequence"}
+    torch.onnx.export(
+        LogitsOnly(model),
+        tuple(sample[key] for key in ONNX_INPUTS),
+        output_path,
+        input_names=list(ONNX_INPUTS),
+        output_names=["logits"],
+        dynamic_axes={**{key: dynamic for key in ONNX_INPUTS}, "logits": dynamic},
+        opset_version=17,
+        do_constant_folding=True,
+    )
+
+    # Record the source revision so the server can key its result cache on it
+    exported = onnx.load(output_path)
+    entry = exported.metadata_props.add()
+    entry.key = "revision"
+    entry.value = revision
+    onnx.save(exported, output_path)
+
+
+def save_local(directory):
+    """Save tokenizer, config and safetensors weights for offline, memory-mapped loading"""
+    print(f"Saving {MODEL_ID} to {directory}...")
+    os.makedirs(directory, exist_ok=True)
+    AutoTokenizer.from_pretrained(MODEL_ID).save_pretrained(directory)
+    BigBirdForMaskedLM.from_pretrained(MODEL_ID).save_pretrained(directory, safe_serialization=True)
+    print(f"Done. Start the server with: python scripts/codon_api.py --model-dir {directory}")
+    return True
+
+
+def compare_backend(backend, reference_logits, tokenized_inputs, repeats):
+    """Agreement with eager argmax codons, max logit drift and median latency"""
+    agree = total = 0
+    max_diff = 0.0
+    latencies = []
+    for name, tokenized in tokenized_inputs.items():
+        for _ in range(repeats):
+            start = time.perf_counter()
+            logits = backend.logits(tokenized)
+            latencies.append(time.perf_counter() - start)
+
+        reference = reference_logits[name]
+        length = int(tokenized["attention_mask"][0].sum()) - 2
+        predicted = logits[0, 1:1 + length].argmax(dim=-1)
+        expected = reference[0, 1:1 + length].argmax(dim=-1)
+        agree += int((predicted == expected).sum())
+        total += length
+        max_diff = max(max_diff, float((logits - reference).abs().max()))
+
+    return {
+        "codon_agreement": agree / total if total else 1.0,
+        "max_logit_diff": max_diff,
+        "median_latency_ms": statistics.median(latencies) * 1000,
+    }
+
+
+def export_and_verify(output_path, skip_export=False, repeats=5):
+    from CodonTransformer.CodonPrediction import validate_and_convert_organism
+
+    print("=" * 60)
+    print("CodonTransformer Backend Export & Verification")
+    print("=" * 60)
+
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    torch.set_grad_enabled(False)
+
+    print(f"\nLoading {MODEL_ID}...")
+    tokenizer = AutoTokenizer.from_pretrained(MODEL_ID)
+    model = BigBirdForMaskedLM.from_pretrained(MODEL_ID)
+    model.bert.set_attention_type("original_full")
+    model.eval()
+    revision = getattr(model.config, "_commit_hash", None) or MODEL_ID
+    organism_id, organism_name = validate_and_convert_organism(REFERENCE_ORGANISM)
+
+    if not skip_export:
+        print(f"\nExporting to ONNX format...")
+        export_onnx(model, tokenizer, organism_id, output_path, revision)
+        print(f"Model saved to {output_path} ({os.path.getsize(output_path) / 1024 ** 2:.1f} MB)")
+
+    tokenized_inputs = {
+        name: tokenize_proteins(tokenizer, [protein], organism_id)
+        for name, protein in REFERENCE_PROTEINS.items()
+    }
+    print(f"\nReference set: {len(REFERENCE_PROTEINS)} proteins for {organism_name}")
+
+    eager = load_backend("eager", model, torch.device("cpu"))
+    reference_logits = {name: eager.logits(tokenized) for name, tokenized in tokenized_inputs.items()}
+
+    report = {"model": MODEL_ID, "revision": revision, "organism": organism_name, "backends": {}}
+    for name in BACKENDS:
+        print(f"\nVerifying {name} backend...")
+        try:
+            backend = eager if name == "eager" else load_backend(name, model, onnx_path=output_path)
+        except (ImportError, FileNotFoundError) as e:
+            print(f"  Skipped: {e}")
+            continue
+        result = compare_backend(backend, reference_logits, tokenized_inputs, repeats)
+        report["backends"][name] = result
+        print(f"  Codon agreement with eager: {result['codon_agreement'] * 100:.2f}%")
+        print(f"  Max logit difference: {result['max_logit_diff']:.6f}")
+        print(f"  Median latency: {result['median_latency_ms']:.1f} ms")
+
+    eager_latency = report["backends"]["eager"]["median_latency_ms"]
+    print("\nSummary (vs eager):")
+    for name, result in report["backends"].items():
+        result["speedup"] = eager_latency / result["median_latency_ms"]
+        status = "✓" if result["codon_agreement"] >= 0.99 else "⚠"
+        print(f"  {status} {name:6s} {result['speedup']:.2f}x faster, "
+              f"{result['codon_agreement'] * 100:.2f}% codon agreement")
+
+    report_path = os.path.join(os.path.dirname(output_path), "codon_backends_report.json")
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport saved to {report_path}")
+
+    print("\n" + "=" * 60)
+    print("Verification complete!")
+    print("=" * 60)
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--output", default=DEFAULT_ONNX_PATH, help="Path of the exported ONNX model")
+    parser.add_argument("--skip-export", action="store_true", help="Only verify an existing export")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed runs per reference protein")
+    parser.add_argument("--save-local", metavar="DIR", help="Only save an offline safetensors copy of the model")
+    args = parser.parse_args()
+
+    if args.save_local:
+        success = save_local(args.save_local)
+    else:
+        success = export_and_verify(args.output, skip_export=args.skip_export, repeats=args.repeats)
+    exit(0 if success else 1)
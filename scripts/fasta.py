@@ -0,0 +1,152 @@
+"""
+Streaming FASTA readers shared by the codon optimization tools, and a
+streaming reader for JSON lists of batch records.
+Records are yielded one at a time so large inputs never sit in memory.
+"""
+
+import codecs
+import json
+from typing import Any, AsyncIterable, AsyncIterator, Iterable, Iterator, List, Optional, Tuple
+
+# Longest single JSON list element buffered while waiting for the rest of it
+MAX_JSON_ELEMENT_CHARS = 1 << 20
+
+
+def _record_id(header: str, index: int) -> str:
+    """First word of a FASTA header, or a positional id for an empty header"""
+    parts = header[1:].split()
+    return parts[0] if parts else f"record_{index + 1}"
+
+
+class _FastaAccumulator:
+    """Line-by-line FASTA state machine used by both readers"""
+
+    def __init__(self):
+        self.count = 0
+        self.record_id: Optional[str] = None
+        self.parts: List[str] = []
+
+    def feed(self, line: str) -> Optional[Tuple[str, str]]:
+        line = line.strip()
+        if not line or line.startswith(";"):
+            return None
+        if line.startswith(">"):
+            finished = self.finish()
+            self.record_id = _record_id(line, self.count)
+            return finished
+        if self.record_id is None:
+            self.record_id = f"record_{self.count + 1}"
+        self.parts.append("".join(line.split()))
+        return None
+
+    def finish(self) -> Optional[Tuple[str, str]]:
+        if self.record_id is None:
+            return None
+        record = (self.record_id, "".join(self.parts))
+        self.count += 1
+        self.record_id = None
+        self.parts = []
+        return record
+
+
+def iter_fasta(lines: Iterable[str]) -> Iterator[Tuple[str, str]]:
+    """Yield (record_id, sequence) pairs from an iterable of FASTA lines"""
+    acc = _FastaAccumulator()
+    for line in lines:
+        record = acc.feed(line)
+        if record is not None:
+            yield record
+    record = acc.finish()
+    if record is not None:
+        yield record
+
+
+async def aiter_fasta(chunks: AsyncIterable[bytes]) -> AsyncIterator[Tuple[str, str]]:
+    """Yield (record_id, sequence) pairs from an async stream of raw byte chunks"""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    acc = _FastaAccumulator()
+    buffer = ""
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            record = acc.feed(line)
+            if record is not None:
+                yield record
+
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        record = acc.feed(buffer)
+        if record is not None:
+            yield record
+    record = acc.finish()
+    if record is not None:
+        yield record
+
+
+class _JsonListAccumulator:
+    """Incremental parser for the elements of one top-level JSON list"""
+
+    def __init__(self):
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        # start -> first -> (value -> separator)* -> end
+        self.state = "start"
+
+    def feed(self, text: str, final: bool = False) -> List[Any]:
+        buffer = self.buffer + text
+        items = []
+        pos = 0
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n":
+                pos += 1
+            if pos == len(buffer):
+                break
+            ch = buffer[pos]
+            if self.state == "start":
+                if ch != "[":
+                    raise ValueError("Body is not a JSON list")
+                self.state = "first"
+                pos += 1
+            elif self.state == "first" and ch == "]":
+                self.state = "end"
+                pos += 1
+            elif self.state in ("first", "value"):
+                try:
+                    item, end = self.decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    if final:
+                        raise
+                    break  # the element continues in the next chunk
+                if not final and (end == len(buffer) or buffer[end] not in " \t\r\n,]"):
+                    break  # a number may continue in the next chunk
+                items.append(item)
+                self.state = "separator"
+                pos = end
+            elif self.state == "separator" and ch in ",]":
+                self.state = "value" if ch == "," else "end"
+                pos += 1
+            else:
+                raise ValueError(f"Unexpected {ch!r} in JSON list at character {pos}")
+
+        self.buffer = buffer[pos:]
+        if len(self.buffer) > MAX_JSON_ELEMENT_CHARS:
+            raise ValueError(f"JSON list element longer than {MAX_JSON_ELEMENT_CHARS} characters")
+        if final and self.state != "end":
+            raise ValueError("JSON list is not closed")
+        return items
+
+
+async def aiter_json_list(chunks: AsyncIterable[bytes]) -> AsyncIterator[Any]:
+    """
+    Yield the elements of a JSON list from an async stream of raw byte chunks.
+    Only the element being parsed is buffered. Raises ValueError for a body
+    that is not a well-formed JSON list.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    acc = _JsonListAccumulator()
+    async for chunk in chunks:
+        for item in acc.feed(decoder.decode(chunk)):
+            yield item
+    for item in acc.feed(decoder.decode(b"", final=True), final=True):
+        yield item
@@ -0,0 +1,347 @@
+"""
+Predict water solubility for a compound library from SMILES.
+
+Featurizes each SMILES into the four descriptors the solubility model was
+trained on (MolLogP, MolWt, NumRotatableBonds, AromaticProportion) with
+RDKit across a process pool. Scores them in large batches with the exported
+ONNX model (public/models/water_solubility_model.onnx) under onnxruntime,
+and streams the predictions to CSV or Parquet block by block.
+
+Descriptors are cached in a columnar file (scripts/.feature_cache/
+solubility_features.npz) keyed by InChIKey, or by SMILES for rows without
+one, so repeat screens of the same compounds skip featurization entirely.
+When the input has a measured Solubility (LogS) column, the prediction error
+against it is reported.
+
+Usage:
+    python scripts/predict_solubility.py                              # AqSolDB_v1.0_min.csv
+    python scripts/predict_solubility.py library.csv --output predictions.parquet
+    python scripts/predict_solubility.py library.csv --smiles-column smiles --workers 8
+
+Output:
+    solubility_predictions.csv (or --output; .parquet needs pyarrow)
+"""
+
+import argparse
+import csv
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_INPUT = os.path.join(SCRIPT_DIR, "..", "AqSolDB_v1.0_min.csv")
+DEFAULT_MODEL = os.path.join(SCRIPT_DIR, "..", "public", "models", "water_solubility_model.onnx")
+DEFAULT_CACHE = os.path.join(SCRIPT_DIR, ".feature_cache", "solubility_features.npz")
+
+# Same order as the training features in convert_model_to_onnx.py
+FEATURE_NAMES = ["MolLogP", "MolWt", "NumRotatableBonds", "AromaticProportion"]
+
+# Bump when featurize() changes so stale cached descriptors are discarded
+FEATURIZER_VERSION = 2
+
+OUTPUT_COLUMNS = [
+    "id", "name", "smiles", "inchikey", *FEATURE_NAMES,
+    "predicted_logS", "predicted_solubility_g_per_l", "measured_logS", "error",
+]
+
+Features = Tuple[float, float, float, float]
+
+
+def featurize(smiles: str) -> Tuple[Optional[Features], Optional[str]]:
+    """The four Delaney descriptors of one SMILES, or an error message"""
+    from rdkit import Chem
+    from rdkit.Chem import Crippen, Descriptors
+
+    mol = Chem.MolFromSmiles(smiles)
+    # An empty or blank SMILES parses to a molecule with no atoms, not None
+    if mol is None or mol.GetNumAtoms() == 0:
+        return None, "Invalid SMILES"
+    heavy_atoms = mol.GetNumHeavyAtoms()
+    aromatic_atoms = sum(1 for atom in mol.GetAtoms() if atom.GetIsAromatic())
+    return (
+        Crippen.MolLogP(mol),
+        Descriptors.MolWt(mol),
+        float(Descriptors.NumRotatableBonds(mol)),
+        aromatic_atoms / heavy_atoms if heavy_atoms else 0.0,
+    ), None
+
+
+def featurize_many(smiles: List[str]) -> List[Tuple[Optional[Features], Optional[str]]]:
+    """featurize() over a slice of the block (runs in a worker process)"""
+    from rdkit import RDLogger
+
+    RDLogger.DisableLog("rdApp.*")
+    results = []
+    for s in smiles:
+        try:
+            results.append(featurize(s))
+        except Exception as e:
+            results.append((None, str(e)))
+    return results
+
+
+class FeatureCache:
+    """Descriptors by compound key, stored as parallel columns in one .npz file"""
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self.rows: Dict[str, Tuple[Optional[Features], Optional[str]]] = {}
+        self.dirty = False
+        if path and os.path.exists(path):
+            data = np.load(path, allow_pickle=False)
+            if int(data["version"]) == FEATURIZER_VERSION and str(data["rdkit"]) == rdkit_version():
+                values = data["features"]
+                for key, row, error in zip(data["keys"].tolist(), values, data["errors"].tolist()):
+                    self.rows[key] = (None, error) if error else (tuple(row.tolist()), None)
+            else:
+                print("Feature cache is from another RDKit or featurizer version; recomputing")
+
+    def __len__(self):
+        return len(self.rows)
+
+    def get(self, key: str):
+        return self.rows.get(key)
+
+    def put(self, key: str, value):
+        self.rows[key] = value
+        self.dirty = True
+
+    def save(self):
+        if not self.path or not self.dirty:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        keys = list(self.rows)
+        features = np.array(
+            [value[0] if value[0] is not None else (np.nan,) * len(FEATURE_NAMES) for value in self.rows.values()],
+            dtype=np.float64,
+        ).reshape(len(keys), len(FEATURE_NAMES))
+        errors = [value[1] or "" for value in self.rows.values()]
+        tmp = self.path + ".tmp.npz"
+        np.savez_compressed(
+            tmp, keys=np.array(keys, dtype=str), features=features, errors=np.array(errors, dtype=str),
+            version=FEATURIZER_VERSION, rdkit=rdkit_version(),
+        )
+        os.replace(tmp, self.path)
+        self.dirty = False
+
+
+def rdkit_version() -> str:
+    import rdkit
+
+    return rdkit.__version__
+
+
+def compound_key(row: dict, smiles: str) -> str:
+    inchikey = (row.get("InChIKey") or "").strip()
+    return inchikey if inchikey else f"smiles:{smiles}"
+
+
+def parse_float(value) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class CsvOutput:
+    def __init__(self, path: str):
+        self.file = open(path, "w", newline="")
+        self.writer = csv.DictWriter(self.file, fieldnames=OUTPUT_COLUMNS)
+        self.writer.writeheader()
+
+    def write(self, rows: List[dict]):
+        self.writer.writerows(rows)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetOutput:
+    """One Parquet row group per block"""
+
+    def __init__(self, path: str):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.pa = pa
+        self.schema = pa.schema([
+            (column, pa.float64() if column in FEATURE_NAMES or column.startswith(("predicted", "measured"))
+             else pa.string())
+            for column in OUTPUT_COLUMNS
+        ])
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def write(self, rows: List[dict]):
+        self.writer.write_table(self.pa.Table.from_pylist(rows, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+def read_blocks(path: str, smiles_column: str, block_size: int):
+    """Stream the input CSV in blocks of rows"""
+    with open(path, newline="") as f:
+        reader = csv.DictReader(f)
+        if smiles_column not in (reader.fieldnames or []):
+            raise ValueError(f"{path} has no {smiles_column!r} column (columns: {', '.join(reader.fieldnames or [])})")
+        block = []
+        for row in reader:
+            block.append(row)
+            if len(block) >= block_size:
+                yield block
+                block = []
+        if block:
+            yield block
+
+
+def predict(args) -> bool:
+    print("=" * 60)
+    print("Water Solubility Batch Prediction")
+    print("=" * 60)
+
+    try:
+        import onnxruntime as ort
+        import rdkit  # noqa: F401
+    except ImportError as e:
+        print(f"⚠ {e.name} is required: pip install rdkit onnxruntime")
+        return False
+
+    output_path = args.output
+    try:
+        output = ParquetOutput(output_path) if output_path.endswith(".parquet") else CsvOutput(output_path)
+    except ImportError:
+        print("⚠ Parquet output needs pyarrow (pip install pyarrow)")
+        return False
+
+    session = ort.InferenceSession(args.model, providers=["CPUExecutionProvider"])
+    input_name = session.get_inputs()[0].name
+    cache = FeatureCache(None if args.no_cache else args.cache)
+    workers = args.workers or os.cpu_count() or 1
+    print(f"\nInput: {args.input}")
+    print(f"Model: {args.model}")
+    print(f"Feature cache: {len(cache)} compounds" if not args.no_cache else "Feature cache: disabled")
+
+    timings = {"featurize": 0.0, "score": 0.0, "write": 0.0}
+    counts = {"rows": 0, "predicted": 0, "cache_hits": 0, "featurized": 0, "failed": 0}
+    errors: Dict[str, int] = {}
+    measured: List[float] = []
+    predicted: List[float] = []
+    started = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        try:
+            for block in read_blocks(args.input, args.smiles_column, args.batch_size):
+                counts["rows"] += len(block)
+                smiles = [(row.get(args.smiles_column) or "").strip() for row in block]
+                keys = [compound_key(row, s) for row, s in zip(block, smiles)]
+
+                # Featurize cache misses across the pool, each distinct key once
+                start = time.perf_counter()
+                missing = list(dict.fromkeys(k for k in keys if cache.get(k) is None))
+                counts["cache_hits"] += sum(1 for k in keys if cache.get(k) is not None)
+                if missing:
+                    smiles_for = dict(zip(keys, smiles))
+                    todo = [smiles_for[k] for k in missing]
+                    size = max(1, len(todo) // (workers * 4))
+                    slices = [todo[i:i + size] for i in range(0, len(todo), size)]
+                    results = [r for part in pool.map(featurize_many, slices) for r in part]
+                    for key, result in zip(missing, results):
+                        cache.put(key, result)
+                    counts["featurized"] += len(missing)
+                features = [cache.get(k) for k in keys]
+                timings["featurize"] += time.perf_counter() - start
+
+                # One onnxruntime call per block
+                start = time.perf_counter()
+                valid = [i for i, (values, _) in enumerate(features) if values is not None]
+                log_s = np.empty(0, dtype=np.float32)
+                if valid:
+                    X = np.array([features[i][0] for i in valid], dtype=np.float32)
+                    log_s = session.run(None, {input_name: X})[0].reshape(-1)
+                timings["score"] += time.perf_counter() - start
+
+                start = time.perf_counter()
+                predictions = dict(zip(valid, log_s.tolist()))
+                rows = []
+                for i, row in enumerate(block):
+                    values, error = features[i]
+                    measured_log_s = parse_float(row.get(args.measured_column))
+                    out = {
+                        "id": row.get(args.id_column) or str(counts["rows"] - len(block) + i + 1),
+                        "name": row.get("Name"),
+                        "smiles": smiles[i],
+                        "inchikey": row.get("InChIKey"),
+                        **dict(zip(FEATURE_NAMES, values or (None,) * len(FEATURE_NAMES))),
+                        "predicted_logS": predictions.get(i),
+                        "predicted_solubility_g_per_l": (
+                            10 ** predictions[i] * values[1] if i in predictions else None
+                        ),
+                        "measured_logS": measured_log_s,
+                        "error": error,
+                    }
+                    if i in predictions:
+                        counts["predicted"] += 1
+                        if measured_log_s is not None:
+                            measured.append(measured_log_s)
+                            predicted.append(predictions[i])
+                    else:
+                        counts["failed"] += 1
+                        errors[error] = errors.get(error, 0) + 1
+                    rows.append(out)
+                output.write(rows)
+                timings["write"] += time.perf_counter() - start
+
+                elapsed = time.perf_counter() - started
+                print(f"  {counts['rows']} rows ({counts['rows'] / elapsed:,.0f}/s), "
+                      f"{counts['cache_hits']} cached, {counts['failed']} failed")
+        finally:
+            output.close()
+            cache.save()
+
+    elapsed = time.perf_counter() - started
+    print("\nSummary:")
+    print(f"  Rows:         {counts['rows']} ({counts['predicted']} predicted, {counts['failed']} failed)")
+    print(f"  Features:     {counts['cache_hits']} from cache, {counts['featurized']} computed on {workers} processes")
+    print(f"  Wall time:    {elapsed:.2f} s ({counts['rows'] / max(elapsed, 1e-9):,.0f} rows/s)")
+    for stage, seconds in timings.items():
+        print(f"    {stage:<12}{seconds:8.2f} s")
+    for error, n in sorted(errors.items(), key=lambda item: -item[1])[:5]:
+        print(f"  ⚠ {n} x {error}")
+
+    if measured:
+        y, p = np.array(measured), np.array(predicted)
+        residual = p - y
+        r2 = 1 - np.sum(residual ** 2) / np.sum((y - y.mean()) ** 2) if len(y) > 1 else float("nan")
+        print(f"\nAgainst measured LogS ({len(y)} compounds):")
+        print(f"  R² Score: {r2:.4f}")
+        print(f"  MAE: {np.mean(np.abs(residual)):.4f}")
+        print(f"  RMSE: {np.sqrt(np.mean(residual ** 2)):.4f}")
+
+    print(f"\nPredictions written to {output_path}")
+    print("\n" + "=" * 60)
+    print("✓ Prediction complete" if counts["predicted"] else "⚠ No compounds could be predicted")
+    print("=" * 60)
+    return counts["predicted"] > 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("input", nargs="?", default=DEFAULT_INPUT, help="CSV file with a SMILES column")
+    parser.add_argument("--output", default="solubility_predictions.csv",
+                        help="Output file (.csv, or .parquet with pyarrow)")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="ONNX solubility model")
+    parser.add_argument("--smiles-column", default="SMILES")
+    parser.add_argument("--id-column", default="ID")
+    parser.add_argument("--measured-column", default="Solubility", help="Measured LogS column, if any")
+    parser.add_argument("--workers", type=int, default=0, help="Featurization processes (default: one per core)")
+    parser.add_argument("--batch-size", type=int, default=8192, help="Rows featurized, scored and written per block")
+    parser.add_argument("--cache", default=DEFAULT_CACHE, help="Feature cache file")
+    parser.add_argument("--no-cache", action="store_true", help="Neither read nor update the feature cache")
+    args = parser.parse_args()
+
+    success = predict(args)
+    exit(0 if success else 1)
@@ -0,0 +1,50 @@
+import math
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from codon_analytics import _AMINO_ACIDS, CODONS, analyze, cai, gc_content, relative_adaptiveness, translate
+
+
+def reference_translate(dna: str) -> str:
+    dna = dna.upper()
+    return "".join(_AMINO_ACIDS.get(dna[i:i + 3], "X") for i in range(0, len(dna) - len(dna) % 3, 3))
+
+
+def reference_gc(dna: str) -> float:
+    valid = [b for b in dna.upper() if b in "ACGT"]
+    return sum(b in "GC" for b in valid) / len(valid) if valid else 0.0
+
+
+def reference_cai(dna: str, weights: dict) -> float:
+    codons = [dna[i:i + 3].upper() for i in range(0, len(dna) - len(dna) % 3, 3)]
+    if len(codons) > 2:
+        codons = codons[1:-1]
+    logs = [math.log(weights[c]) for c in codons if c in weights]
+    return math.exp(sum(logs) / len(logs)) if logs else 0.0
+
+
+def random_dna(rng: random.Random) -> str:
+    return "".join(rng.choice("ACGTacgtN") for _ in range(rng.randrange(0, 40)))
+
+
+def test_matches_per_character_reference():
+    rng = random.Random(7)
+    sequences = [random_dna(rng) for _ in range(200)]
+    usage = {codon: rng.uniform(1, 50) for codon in CODONS}
+    weights = relative_adaptiveness(usage)
+    by_codon = dict(zip(CODONS, weights.tolist()))
+
+    assert translate(sequences) == [reference_translate(s) for s in sequences]
+    assert np.allclose(gc_content(sequences), [reference_gc(s) for s in sequences])
+    assert np.allclose(cai(sequences, weights), [reference_cai(s, by_codon) for s in sequences])
+
+
+def test_lowercase_dna_is_analyzed_like_uppercase():
+    dna = "ATGGCTAAAGGCTTATAA"
+    upper, lower = analyze([dna, dna.lower()], relative_adaptiveness({c: 1.0 for c in CODONS}))
+    assert lower == upper
+    assert lower["protein"] == "MAKGL*"
+    assert lower["gc_content"] > 0
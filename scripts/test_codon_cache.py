@@ -0,0 +1,127 @@
+import asyncio
+import random
+import threading
+import time
+from collections import OrderedDict
+
+from codon_cache import ResultCache, make_cache_key
+
+
+class ReferenceCache:
+    """Plain LRU dict with the same capacity, used to check the memory tier"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        return None
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+
+def test_memory_tier_matches_reference_lru():
+    rng = random.Random(31)
+    cache, reference = ResultCache(max_entries=8), ReferenceCache(8)
+    for step in range(2000):
+        key = str(rng.randrange(20))
+        if rng.random() < 0.5:
+            assert cache.get(key) == reference.get(key)
+        else:
+            cache.put(key, {"step": step})
+            reference.put(key, {"step": step})
+    assert cache.summary()["memory_entries"] == len(reference.entries)
+
+
+def test_disk_tier_survives_restart_and_expires(tmp_path):
+    path = str(tmp_path / "cache.db")
+    first = ResultCache(max_entries=2, db_path=path)
+    for i in range(5):
+        first.put(str(i), {"n": i})
+    first.close()
+
+    second = ResultCache(max_entries=2, db_path=path)
+    assert [second.get(str(i)) for i in range(5)] == [{"n": i} for i in range(5)]
+    assert second.stats["disk_hits"] == 5
+    assert second.summary()["disk_entries"] == 5
+    assert second.summary(include_disk=False)["disk_entries"] is None
+    second.close()
+
+    expired = ResultCache(ttl_seconds=1e-9, db_path=path)
+    time.sleep(0.01)
+    assert expired.get("0") is None
+    assert expired.summary()["disk_entries"] == 4
+    assert expired.invalidate("1") and not expired.invalidate("1")
+    assert expired.clear() == 3
+
+
+def test_concurrent_requests_compute_once(tmp_path):
+    cache = ResultCache(db_path=str(tmp_path / "cache.db"))
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        return {"success": True}
+
+    async def main():
+        return await asyncio.gather(*[cache.get_or_compute("k", compute) for _ in range(10)])
+
+    assert asyncio.run(main()) == [{"success": True}] * 10
+    assert len(calls) == 1
+    assert cache.stats["coalesced"] == 9
+    assert ResultCache(db_path=str(tmp_path / "cache.db")).get("k") == {"success": True}
+
+
+def test_failed_results_are_not_stored(tmp_path):
+    cache = ResultCache(db_path=str(tmp_path / "cache.db"))
+
+    async def compute():
+        return {"success": False}
+
+    asyncio.run(cache.get_or_compute("k", compute, store_if=lambda value: value["success"]))
+    assert cache.get("k") is None
+
+
+def test_disk_tier_does_not_block_the_event_loop(tmp_path):
+    cache = ResultCache(db_path=str(tmp_path / "cache.db"))
+    cache.put("k", {"n": 1})
+    with cache._lock:
+        cache._memory.clear()
+
+    async def main():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.005)
+
+        ticker = asyncio.ensure_future(tick())
+        await asyncio.sleep(0)
+        # Hold the SQLite connection as a slow disk would; the lookup must wait in a thread
+        release = threading.Timer(0.1, cache._db_lock.release)
+        cache._db_lock.acquire()
+        release.start()
+        value = await cache.get_or_compute("k", lambda: None)
+        ticker.cancel()
+        return value, ticks
+
+    value, ticks = asyncio.run(main())
+    assert value == {"n": 1}
+    assert ticks >= 5
+
+
+def test_cache_key_depends_on_fields_and_revision():
+    key = make_cache_key({"protein": "MKV", "organism": 1}, "rev")
+    assert key == make_cache_key({"organism": 1, "protein": "MKV"}, "rev")
+    assert key != make_cache_key({"protein": "MKV", "organism": 1}, "rev+fp16")
+    assert key != make_cache_key({"protein": "MKA", "organism": 1}, "rev")
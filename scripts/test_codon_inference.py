@@ -0,0 +1,55 @@
+import pytest
+
+from codon_inference import check_protein
+
+
+def test_check_protein_normalizes():
+    assert check_protein(" mkv\nlaa* ") == "MKVLAA*"
+    assert check_protein("MKV_") == "MKV_"
+
+
+@pytest.mark.parametrize("protein", ["", "   ", "*", "__"])
+def test_check_protein_rejects_empty(protein):
+    with pytest.raises(ValueError, match="empty"):
+        check_protein(protein)
+
+
+@pytest.mark.parametrize("protein", ["MKVBZ", "MK1V", "MK*V", "ATG-GCC"])
+def test_check_protein_rejects_invalid_residues(protein):
+    with pytest.raises(ValueError, match="Invalid amino acid"):
+        check_protein(protein)
+
+
+def test_optimization_request_validation():
+    pytest.importorskip("fastapi")
+    pydantic = pytest.importorskip("pydantic")
+    from codon_api import OptimizationRequest
+
+    request = OptimizationRequest(protein="MKV*", organism="Escherichia coli general")
+    assert request.protein == "MKV*"
+    OptimizationRequest(protein="MKV", organism=1, deterministic=False, num_sequences=3)
+    OptimizationRequest(protein="MKV", organism=1, num_sequences=3, best_of=10)
+
+    for fields in (
+        {"protein": ""},
+        {"protein": "MKVXQ"},
+        {"protein": "MKV", "deterministic": True, "num_sequences": 2},
+    ):
+        with pytest.raises(pydantic.ValidationError):
+            OptimizationRequest(organism=1, **fields)
+
+
+def test_optimize_rejects_invalid_requests_with_422():
+    pytest.importorskip("fastapi")
+    pytest.importorskip("httpx")
+    from fastapi.testclient import TestClient
+
+    from codon_api import app
+
+    client = TestClient(app)
+    for body in (
+        {"protein": "", "organism": 1},
+        {"protein": "MKV?", "organism": 1},
+        {"protein": "MKV", "organism": 1, "num_sequences": 2},
+    ):
+        assert client.post("/optimize", json=body).status_code == 422
@@ -0,0 +1,110 @@
+import asyncio
+import sqlite3
+
+from codon_jobs import JobScheduler, JobStore
+
+
+def test_restart_under_the_same_pid_claims_unfinished_jobs(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    first = JobStore(path)
+    job = first.create("client", 0, [("a", {"protein": "MKV"}), ("b", {"protein": "MAA"})])
+    first.set_status(job["id"], "running")
+    first.close()
+
+    # A restarted container runs the new server as the same pid; only the instance id differs
+    restarted = JobStore(path)
+    assert restarted.claim_orphaned(stale_seconds=3600) == []
+    claimed = restarted.claim_orphaned(stale_seconds=0)
+    assert [j["id"] for j in claimed] == [job["id"]]
+    assert restarted.claim_orphaned(stale_seconds=0) == []
+
+
+def test_live_owner_keeps_its_jobs(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    owner, sibling = JobStore(path), JobStore(path)
+    job = owner.create("client", 0, [("a", {})])
+    assert owner.heartbeat() == set()
+    assert sibling.claim_orphaned(stale_seconds=60) == []
+    assert sibling.heartbeat() == {job["id"]}
+
+
+def test_released_jobs_resume_at_once(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    first = JobStore(path)
+    job = first.create("client", 0, [("a", {})])
+    first.release()
+    assert [j["id"] for j in JobStore(path).claim_orphaned(stale_seconds=3600)] == [job["id"]]
+
+
+def test_store_without_owner_columns_is_migrated(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    db = sqlite3.connect(path)
+    db.execute(
+        "CREATE TABLE jobs (id TEXT PRIMARY KEY, client TEXT NOT NULL, priority INTEGER NOT NULL, "
+        "status TEXT NOT NULL, created REAL NOT NULL, started REAL, finished REAL, total INTEGER NOT NULL, "
+        "succeeded INTEGER NOT NULL DEFAULT 0, failed INTEGER NOT NULL DEFAULT 0, error TEXT)"
+    )
+    db.execute("INSERT INTO jobs (id, client, priority, status, created, total) VALUES ('old', 'c', 0, 'running', 1, 0)")
+    db.commit()
+    db.close()
+    assert [j["id"] for j in JobStore(path).claim_orphaned()] == ["old"]
+
+
+def test_scheduler_resumes_pending_records_after_restart(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    first = JobStore(path)
+    job = first.create("client", 0, [(str(i), {"n": i}) for i in range(5)])
+    first.save_result(job["id"], 0, True, {"success": True, "n": 0})
+    first.release()
+    first.close()
+
+    seen = []
+
+    async def run_record(fields):
+        seen.append(fields["n"])
+        return True, {"success": True, "n": fields["n"]}
+
+    async def main():
+        store = JobStore(path)
+        scheduler = JobScheduler(store, run_record, concurrency=2)
+        scheduler.start()
+        for _ in range(100):
+            if store.status(job["id"]) == "completed":
+                break
+            await asyncio.sleep(0.01)
+        await scheduler.stop()
+        return store
+
+    store = asyncio.run(main())
+    assert sorted(seen) == [1, 2, 3, 4]
+    summary = store.get(job["id"])
+    assert (summary["status"], summary["succeeded"]) == ("completed", 5)
+    assert [r["n"] for r in store.results(job["id"])] == [0, 1, 2, 3, 4]
+
+
+def test_scheduler_drops_a_job_another_process_took_over(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    started = []
+
+    async def run_record(fields):
+        started.append(fields["n"])
+        await asyncio.sleep(0.05)
+        return True, {"success": True}
+
+    async def main():
+        store = JobStore(path)
+        scheduler = JobScheduler(store, run_record, concurrency=1, heartbeat_seconds=0.02)
+        scheduler.start(recover=False)
+        job = scheduler.submit("client", 0, [(str(i), {"n": i}) for i in range(50)])
+        await asyncio.sleep(0.01)
+        # Another process finds the heartbeat stale and claims the job
+        assert [j["id"] for j in JobStore(path).claim_orphaned(stale_seconds=0)] == [job["id"]]
+        await asyncio.sleep(0.2)
+        owned = scheduler.owns(job["id"])
+        await scheduler.stop()
+        return owned, store.status(job["id"])
+
+    owned, status = asyncio.run(main())
+    assert not owned
+    assert status == "running"
+    assert len(started) < 5
@@ -0,0 +1,113 @@
+import math
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from codon_analytics import CODONS, relative_adaptiveness
+from codon_ranking import DEFAULT_OBJECTIVE, RankingTargets, rank_candidates, resolve_objective, score_candidates
+
+TARGETS = RankingTargets(gc_target=0.45, gc_window=8, gc_window_low=0.35, gc_window_high=0.6,
+                         max_homopolymer=3, repeat_k=4)
+MOTIFS = ["GGTCTC", "GAGACC", "GAATTC", "CTG"]
+
+
+def reference_scores(dna, objective, weights, motifs, targets):
+    """One sequence scored character by character"""
+    valid = [b for b in dna if b in "ACGT"]
+    gc = sum(b in "GC" for b in valid) / len(valid) if valid else 0.0
+
+    w = targets.gc_window
+    windows = [sum(b in "GC" for b in dna[i:i + w]) / w for i in range(len(dna) - w + 1)]
+    low, high = (min(windows), max(windows)) if windows else (gc, gc)
+
+    codons = [dna[i:i + 3] for i in range(0, len(dna) - len(dna) % 3, 3)]
+    if len(codons) > 2:
+        codons = codons[1:-1]
+    logs = [math.log(weights[c]) for c in codons if c in weights]
+    cai = math.exp(sum(logs) / len(logs)) if logs else 0.0
+
+    sites = sum(dna.startswith(m, i) for m in set(motifs) for i in range(len(dna)))
+
+    longest, run = 0, 0
+    for i, b in enumerate(dna):
+        run = run + 1 if i and b == dna[i - 1] else 1
+        if b in "ACGT":
+            longest = max(longest, run)
+
+    k = targets.repeat_k
+    kmers = [dna[i:i + k] for i in range(len(dna) - k + 1) if set(dna[i:i + k]) <= set("ACGT")]
+    repeats = sum(kmers.count(x) > 1 for x in kmers) / len(kmers) if kmers else 0.0
+
+    penalties = {
+        "gc": abs(gc - targets.gc_target),
+        "gc_window": max(targets.gc_window_low - low, 0.0) + max(high - targets.gc_window_high, 0.0),
+        "sites": sites,
+        "homopolymer": max(longest - targets.max_homopolymer, 0),
+        "repeats": repeats,
+    }
+    score = objective["cai"] * cai - sum(objective[term] * p for term, p in penalties.items())
+    return {
+        "score": score, "cai": cai, "gc_content": gc, "gc_window_min": low, "gc_window_max": high,
+        "site_hits": sites, "longest_homopolymer": longest, "repeat_fraction": repeats,
+    }
+
+
+def random_pool(rng, size):
+    pool = ["".join(rng.choice("ACGT" * 6 + "N") for _ in range(rng.randrange(0, 40))) for _ in range(size)]
+    # Duplicates are scored once and reported at their first index
+    return pool + [rng.choice(pool) for _ in range(size // 4)]
+
+
+def test_scores_match_per_sequence_reference():
+    rng = random.Random(21)
+    weights = relative_adaptiveness({codon: rng.uniform(1, 50) for codon in CODONS})
+    by_codon = dict(zip(CODONS, weights.tolist()))
+    objective = resolve_objective({"cai": 1.5, "repeats": 0.5})
+    pool = random_pool(rng, 200)
+
+    scores = score_candidates(pool, objective, weights, MOTIFS, TARGETS)
+    for i, dna in enumerate(pool):
+        expected = reference_scores(dna, objective, by_codon, MOTIFS, TARGETS)
+        for key, value in expected.items():
+            assert scores[key][i] == pytest.approx(value), (dna, key)
+
+
+def test_ranking_matches_exhaustive_sort():
+    rng = random.Random(22)
+    weights = relative_adaptiveness({codon: rng.uniform(1, 50) for codon in CODONS})
+    by_codon = dict(zip(CODONS, weights.tolist()))
+    for _ in range(20):
+        pool = random_pool(rng, 30)
+        top_k = rng.randrange(1, 40)
+        distinct, ranked = rank_candidates(pool, top_k, DEFAULT_OBJECTIVE, weights, MOTIFS, TARGETS)
+
+        first = {}
+        for i, dna in enumerate(pool):
+            first.setdefault(dna, i)
+        reference = sorted(
+            ((-reference_scores(dna, DEFAULT_OBJECTIVE, by_codon, MOTIFS, TARGETS)["score"], i)
+             for dna, i in first.items()),
+        )
+        assert distinct == len(first)
+        assert [entry["rank"] for _, entry in ranked] == list(range(1, min(top_k, distinct) + 1))
+        # Equal scores may differ in the last bits, so compare the score sequence and the picks per score
+        assert [entry["score"] for _, entry in ranked] == pytest.approx([-s for s, _ in reference[:top_k]], abs=1e-5)
+        for index, entry in ranked:
+            assert entry["score"] == pytest.approx(
+                reference_scores(pool[index], DEFAULT_OBJECTIVE, by_codon, MOTIFS, TARGETS)["score"], abs=1e-5)
+            assert first[pool[index]] == index
+
+
+def test_ties_keep_sampling_order():
+    pool = ["ATGAAGTAA", "ATGGAATAA", "ATGAAGTAA", "ATGGAATAA"]
+    distinct, ranked = rank_candidates(pool, 5, resolve_objective({"cai": 0.0}), targets=TARGETS)
+    assert distinct == 2
+    assert [index for index, _ in ranked] == [0, 1]
+
+
+def test_unknown_objective_term_is_rejected():
+    assert resolve_objective(None) == DEFAULT_OBJECTIVE
+    with pytest.raises(ValueError, match="speed"):
+        resolve_objective({"speed": 1.0})
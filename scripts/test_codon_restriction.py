@@ -0,0 +1,136 @@
+import itertools
+import random
+import re
+
+import pytest
+
+from codon_restriction import (
+    SiteHit, SiteScanner, expand_site, parse_site, repair_sites, reverse_complement_site, site_words,
+)
+
+SITES = {
+    "BsaI": "GGTCTC",
+    "EcoRI": "GAATTC",      # palindrome
+    "AccI": "GT[AC][GT]AC",  # bracketed classes, palindromic as a set
+    "BsrI": "ACTGG",
+    "SfiI": "GGCCNNNNNGGCC",
+    "Deg": "RGCY",
+}
+
+
+def brute_force_hits(sites, seq):
+    """Regex search of every site on both strands, at every offset"""
+    hits = set()
+    for name, site in sites.items():
+        forward = parse_site(site)
+        reverse = reverse_complement_site(forward)
+        strands = [("+", forward)] if reverse == forward else [("+", forward), ("-", reverse)]
+        for strand, positions in strands:
+            pattern = re.compile("(?=(" + "".join(f"[{allowed}]" for allowed in positions) + "))")
+            for match in pattern.finditer(seq):
+                hits.add(SiteHit(name, match.start(), match.start() + len(positions), strand))
+    return hits
+
+
+def random_dna(rng, length, alphabet="ACGT"):
+    return "".join(rng.choice(alphabet) for _ in range(length))
+
+
+def test_parse_site_expands_iupac_and_brackets():
+    assert parse_site("gt[ac][gt]ac") == ["G", "T", "AC", "GT", "A", "C"]
+    assert parse_site("RYN") == ["AG", "CT", "ACGT"]
+    assert sorted(expand_site(parse_site("GT[AC][GT]AC"))) == ["GTAGAC", "GTATAC", "GTCGAC", "GTCTAC"]
+    for bad in ("", "GT[AC", "GTZ", "G[X]"):
+        with pytest.raises(ValueError):
+            parse_site(bad)
+
+
+def test_reverse_complement_and_site_words():
+    assert reverse_complement_site(parse_site("GGTCTC")) == list("GAGACC")
+    assert reverse_complement_site(parse_site("RGCY")) == ["AG", "G", "C", "CT"]
+    assert site_words(["GGTCTC"]) == ["GAGACC", "GGTCTC"]
+    assert site_words(["GAATTC"]) == ["GAATTC"]
+
+
+def test_palindromic_sites_are_reported_once():
+    scanner = SiteScanner({"EcoRI": "GAATTC", "AccI": "GT[AC][GT]AC"})
+    assert scanner.scan("AAGAATTCAA") == [SiteHit("EcoRI", 2, 8, "+")]
+    assert scanner.scan("GTATAC") == [SiteHit("AccI", 0, 6, "+")]
+
+
+def test_scan_matches_brute_force():
+    rng = random.Random(1)
+    scanner = SiteScanner(SITES)
+    for _ in range(300):
+        seq = random_dna(rng, rng.randrange(0, 120), "ACGT" * 8 + "N")
+        assert set(scanner.scan(seq)) == brute_force_hits(SITES, seq)
+        start, end = sorted(rng.randrange(0, len(seq) + 1) for _ in range(2))
+        expected = {hit for hit in brute_force_hits(SITES, seq) if hit.start >= start and hit.end <= end}
+        assert set(scanner.scan(seq, start, end)) == expected
+
+
+def test_lower_case_sequence_is_scanned():
+    assert SiteScanner({"BsaI": "GGTCTC"}).present("aaggtctcaa") == {"BsaI"}
+
+
+def test_tracker_matches_full_rescan_after_edits():
+    rng = random.Random(2)
+    scanner = SiteScanner(SITES)
+    for _ in range(50):
+        seq = random_dna(rng, 150)
+        tracker = scanner.tracker(seq)
+        for _ in range(30):
+            pos = rng.randrange(0, len(seq) - 3)
+            text = random_dna(rng, rng.randrange(1, 4))
+            seq = seq[:pos] + text + seq[pos + len(text):]
+            tracker.replace(pos, text)
+            assert tracker.sequence() == seq
+            assert set(tracker.hits()) == brute_force_hits(SITES, seq)
+            assert set(tracker.present()) == {hit.name for hit in tracker.hits()}
+
+
+SYNONYMS = {
+    "GGT": ["GGT", "GGC", "GGA", "GGG"], "GGC": ["GGT", "GGC", "GGA", "GGG"],
+    "CTC": ["CTC", "CTG", "CTT", "TTA"], "CTG": ["CTC", "CTG", "CTT", "TTA"],
+    "GAA": ["GAA", "GAG"], "GAG": ["GAA", "GAG"],
+    "TTC": ["TTC", "TTT"], "TTT": ["TTC", "TTT"],
+    "ATG": ["ATG"], "TGG": ["TGG"],
+}
+
+
+def brute_force_repair(scanner, dna, costs):
+    """Best (hits, cost) over every synonymous recoding"""
+    codons = [dna[i:i + 3] for i in range(0, len(dna) - len(dna) % 3, 3)]
+    tail = dna[len(codons) * 3:]
+    best = None
+    for choice in itertools.product(*[SYNONYMS.get(codon, [codon]) for codon in codons]):
+        cost = sum(costs.get(new, 1.0) for old, new in zip(codons, choice) if old != new)
+        score = (len(scanner.scan("".join(choice) + tail)), cost)
+        best = score if best is None or score < best else best
+    return best
+
+
+@pytest.mark.parametrize("weighted", [False, True])
+def test_repair_is_optimal_against_brute_force(weighted):
+    rng = random.Random(3)
+    scanner = SiteScanner({"BsaI": "GGTCTC", "EcoRI": "GAATTC", "Deg": "CTS"})
+    pool = sorted(SYNONYMS)
+    costs = {codon: rng.choice([0.5, 1.0, 3.0]) for codon in pool} if weighted else {}
+    for _ in range(150):
+        dna = "".join(rng.choice(pool) for _ in range(rng.randrange(1, 7))) + rng.choice(["", "G", "GG"])
+        repair = repair_sites(scanner, dna, SYNONYMS, costs or None)
+        hits, cost = brute_force_repair(scanner, dna, costs)
+
+        assert len(repair.sequence) == len(dna)
+        assert all(repair.sequence[i:i + 3] in SYNONYMS.get(dna[i:i + 3], [dna[i:i + 3]])
+                   for i in range(0, len(dna) - 2, 3))
+        # remaining_hits is exact, and zero exactly when some recoding avoids every site
+        assert repair.remaining_hits == len(scanner.scan(repair.sequence)) == hits
+        assert repair.cost == pytest.approx(cost)
+        assert repair.changes == sum(1 for i in range(0, len(dna) - 2, 3) if repair.sequence[i:i + 3] != dna[i:i + 3])
+
+
+def test_repair_keeps_a_clean_sequence_unchanged():
+    scanner = SiteScanner({"BsaI": "GGTCTC"})
+    repair = repair_sites(scanner, "ATGGAATTT", SYNONYMS)
+    assert (repair.sequence, repair.changes, repair.remaining_hits) == ("ATGGAATTT", 0, 0)
@@ -0,0 +1,118 @@
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from codon_analytics import AA_LUT, CODONS
+from codon_tables import AMINO_ACIDS, CodonTableEngine, CodonUsageTable, harmonized_draws
+
+SYNONYMS = {aa: [codon for i, codon in enumerate(CODONS) if chr(AA_LUT[i]) == aa] for aa in AMINO_ACIDS}
+
+
+def random_table(rng):
+    # Ties and zero-frequency codons included; an all-zero amino acid falls back to uniform
+    frequencies = {codon: rng.choice([0.0, 0.1, 0.25, 0.25, 0.4]) for codon in CODONS}
+    for codon in SYNONYMS["W"]:
+        frequencies[codon] = 0.0
+    return CodonUsageTable("Testus organismus", frequencies), frequencies
+
+
+def reference_weights(frequencies, aa):
+    weights = [max(frequencies.get(codon, 0.0), 0.0) for codon in SYNONYMS[aa]]
+    return weights if sum(weights) > 0 else [1.0] * len(weights)
+
+
+def reference_pick(frequencies, aa, u):
+    """Walk the synonyms until their cumulative share passes u"""
+    weights = reference_weights(frequencies, aa)
+    total, running = sum(weights), 0.0
+    for codon, weight in zip(SYNONYMS[aa], weights):
+        running += weight / total
+        if u < running:
+            return codon
+    return SYNONYMS[aa][-1]
+
+
+def random_protein(rng):
+    return "".join(rng.choice(AMINO_ACIDS[:-1]) for _ in range(rng.randrange(0, 60)))
+
+
+def codons_of(dna):
+    return [dna[i:i + 3] for i in range(0, len(dna), 3)]
+
+
+def test_max_cai_picks_the_most_frequent_synonym():
+    rng = random.Random(11)
+    for _ in range(20):
+        table, frequencies = random_table(rng)
+        proteins = [random_protein(rng) for _ in range(10)]
+        for protein, dna in zip(proteins, CodonTableEngine([table]).optimize(proteins, table)):
+            expected = []
+            for aa in protein + "*":
+                weights = reference_weights(frequencies, aa)
+                expected.append(SYNONYMS[aa][weights.index(max(weights))])
+            assert codons_of(dna) == expected
+
+
+def test_pick_matches_per_residue_reference():
+    rng = random.Random(12)
+    table, frequencies = random_table(rng)
+    aa = np.array([rng.randrange(len(AMINO_ACIDS)) for _ in range(2000)])
+    u = np.array([rng.random() for _ in range(2000)])
+    picked = [CODONS[i] for i in table.pick(aa, u)]
+    assert picked == [reference_pick(frequencies, AMINO_ACIDS[a], x) for a, x in zip(aa, u)]
+
+
+@pytest.mark.parametrize("strategy", ["max_cai", "harmonize", "weighted_random"])
+def test_every_strategy_back_translates_within_synonyms(strategy):
+    rng = random.Random(13)
+    table, frequencies = random_table(rng)
+    proteins = [random_protein(rng) for _ in range(50)] + [" mk v*", "MKV_"]
+    dna = CodonTableEngine([table]).optimize(proteins, table, strategy, np.random.default_rng(0))
+    for protein, seq in zip(proteins, dna):
+        residues = "".join(protein.split()).upper().rstrip("*_") + "*"
+        assert len(seq) == 3 * len(residues)
+        for aa, codon in zip(residues, codons_of(seq)):
+            assert codon in SYNONYMS[aa]
+            assert reference_weights(frequencies, aa)[SYNONYMS[aa].index(codon)] > 0
+
+
+def test_harmonize_matches_reference_draws():
+    rng = random.Random(14)
+    table, frequencies = random_table(rng)
+    proteins = [random_protein(rng) for _ in range(20)]
+    dna = CodonTableEngine([table]).optimize(proteins, table, "harmonize")
+    golden = (5 ** 0.5 - 1) / 2
+    for protein, seq in zip(proteins, dna):
+        seen = {}
+        expected = []
+        for aa in protein + "*":
+            seen[aa] = seen.get(aa, 0) + 1
+            expected.append(reference_pick(frequencies, aa, (seen[aa] * golden) % 1.0))
+        assert codons_of(seq) == expected
+
+
+def test_harmonize_uses_codons_in_proportion():
+    table = CodonUsageTable("Testus organismus", {"GCT": 0.5, "GCC": 0.25, "GCA": 0.25, "GCG": 0.0})
+    (dna,) = CodonTableEngine([table]).optimize(["A" * 400], table, "harmonize")
+    counts = {codon: codons_of(dna).count(codon) for codon in SYNONYMS["A"]}
+    assert counts["GCG"] == 0
+    assert abs(counts["GCT"] - 200) <= 2 and abs(counts["GCC"] - 100) <= 2 and abs(counts["GCA"] - 100) <= 2
+
+
+def test_harmonized_draws_count_occurrences_per_protein():
+    aa = np.array([0, 1, 0, 0, 0, 1])
+    draws = harmonized_draws(aa, np.array([4, 2]))
+    golden = (5 ** 0.5 - 1) / 2
+    occurrence = [1, 1, 2, 3, 1, 1]
+    assert np.allclose(draws, [(k * golden) % 1.0 for k in occurrence])
+
+
+def test_invalid_residues_and_strategy_are_rejected():
+    table = CodonUsageTable("Testus organismus", {})
+    engine = CodonTableEngine([table])
+    with pytest.raises(ValueError, match="B, X"):
+        engine.optimize(["MKXB"], table)
+    with pytest.raises(ValueError, match="Unknown strategy"):
+        engine.optimize(["MKV"], table, "fastest")
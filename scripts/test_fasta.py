@@ -0,0 +1,39 @@
+import asyncio
+import json
+
+import pytest
+
+from fasta import MAX_JSON_ELEMENT_CHARS, aiter_json_list
+
+
+async def _chunks(body: bytes, size: int):
+    for i in range(0, len(body), size):
+        yield body[i:i + size]
+
+
+def read_json_list(body: bytes, size: int):
+    async def collect():
+        return [item async for item in aiter_json_list(_chunks(body, size))]
+
+    return asyncio.run(collect())
+
+
+@pytest.mark.parametrize("size", [1, 3, 64, 1 << 20])
+def test_json_list_elements_across_chunks(size):
+    items = [{"id": "é1", "protein": "MKV"}, {"nested": [1, {"b": "],"}]}, -3.5e10, 12, "x,y", None, True]
+    body = (" \n" + json.dumps(items, ensure_ascii=False, indent=2) + "\n").encode()
+    assert read_json_list(body, size) == items
+    assert read_json_list(b"[ ]", size) == []
+
+
+@pytest.mark.parametrize("body", [b'{"protein": "MKV"}', b"[1, 2", b"[1 2]", b"[1,]", b"[1] x", b"", b"[1.]"])
+def test_json_list_rejects_malformed_bodies(body):
+    for size in (1, 1000):
+        with pytest.raises(ValueError):
+            read_json_list(body, size)
+
+
+def test_json_list_limits_element_size():
+    body = b'[{"protein": "' + b"M" * 2 * MAX_JSON_ELEMENT_CHARS + b'"}]'
+    with pytest.raises(ValueError, match="longer than"):
+        read_json_list(body, 1 << 16)